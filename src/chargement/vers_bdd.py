@@ -3,6 +3,9 @@
 
 import json
 import getpass
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from postgrest import APIError
 import pandas as pd
@@ -10,18 +13,28 @@ from supabase import create_client, Client
 
 # --- Configuration Standard ---
 try:
-    from src.outils.chemins import dossier_datalake_processed, dossier_config
+    from src.outils.chemins import dossier_datalake_processed, dossier_config, chemin_registre_cles
+    from src.outils.stockage_lac import chemin_table, lire_table
+    from src.transformation.registre_cles import RegistreCles
+    from src.transformation.historisation import COLONNES_VALIDITE
+    from src.transformation.dimensions import ID_INCONNU
+    from src.outils.partitions import PARTITION_INCONNUE, bornes_partition, dossier_partitions, lire_index_partitions
 except ImportError:
     projet_root = Path(__file__).resolve().parents[2]
-    import sys
     sys.path.insert(0, str(projet_root))
-    from src.outils.chemins import dossier_datalake_processed, dossier_config
+    from src.outils.chemins import dossier_datalake_processed, dossier_config, chemin_registre_cles
+    from src.outils.stockage_lac import chemin_table, lire_table
+    from src.transformation.registre_cles import RegistreCles
+    from src.transformation.historisation import COLONNES_VALIDITE
+    from src.transformation.dimensions import ID_INCONNU
+    from src.outils.partitions import PARTITION_INCONNUE, bornes_partition, dossier_partitions, lire_index_partitions
 
 # --- DÉFINITION CENTRALE DE LA "TRADUCTION" CSV -> BDD ---
 TABLE_CONFIGS = {
     # === Schéma Ventes ===
     'dim_client': {
         'schema': 'ventes', 'natural_key_db': 'code_client',
+        'historisee': True,
         'rename_map': None,
         # CORRIGÉ : Ajout de 'dim_client_id'
         'final_db_columns': ['dim_client_id', 'code_client', 'raison_sociale', 'famille_client', 'responsable_dossier', 'representant']
@@ -34,6 +47,7 @@ TABLE_CONFIGS = {
     },
     'dim_article_ventes': {
         'table_name': 'dim_article', 'schema': 'ventes', 'natural_key_db': 'code_article',
+        'historisee': True,
         'rename_map': None,
         # CORRECT : 'dim_article_id' était déjà présent
         'final_db_columns': ['dim_article_id', 'code_article', 'numero_plan', 'ref_article_client', 'designation', 'id_famille']
@@ -48,12 +62,15 @@ TABLE_CONFIGS = {
         'schema': 'ventes', 'natural_key_db': 'dl_no', # Assurez-vous que 'dl_no' est unique par ligne ou envisagez une clé composite.
         'rename_map': None,
         # CORRECT : Les tables de faits n'ont pas leur propre ID, seulement des clés étrangères (qui étaient déjà présentes)
+        # Partitions (FAITS_PARTITIONNES=1) : lignes d'un mois repérées par date_bl
+        'partition': {'colonne_date': 'date_bl'},
         'final_db_columns': ['dl_no', 'num_cde', 'date_bl', 'num_bl', 'condition_livraison', 'date_demandee_client', 'date_accusee_amco', 'num_facture', 'date_facture', 'qte_vendue', 'prix_unitaire', 'montant_ht', 'dim_client_id', 'dim_article_id', 'dim_temps_id']
     },
     
     # === Schéma Achats ===
     'dim_fournisseur': {
         'schema': 'achats', 'natural_key_db': 'ct_numpayeur',
+        'historisee': True,
         'rename_map': {'code_fournisseur': 'ct_numpayeur'},
         # CORRIGÉ : Ajout de 'fournisseur_id'
         'final_db_columns': ['fournisseur_id', 'ct_numpayeur', 'raison_sociale', 'contact', 'adresse', 'complement', 'code_postal', 'ville', 'telephone', 'fax']
@@ -69,6 +86,7 @@ TABLE_CONFIGS = {
         'table_name': 'dim_article', 
         'schema': 'achats', 
         'natural_key_db': 'ar_ref',
+        'historisee': True,
         'rename_map': {
             # On ne mappe QUE les colonnes qui existent dans le CSV et la table de destination
             'ar_ref': 'ar_ref', 
@@ -109,6 +127,10 @@ TABLE_CONFIGS = {
         # Clave de conflicto que coincide con la nueva PRIMARY KEY de la tabla normal
         'natural_key_db': 'date_id,bon_de_commande', 
         'rename_map': None,
+        # Partitions (FAITS_PARTITIONNES=1) : lignes d'un mois repérées par les date_id de dim_date
+        'partition': {'dimension_date': 'dim_date'},
+        # Chargée par INSERT simple (sans ON CONFLICT)
+        'insertion_simple': True,
         # La lista completa de columnas que tu script intentará cargar
         'final_db_columns': [
             'date_id', 
@@ -127,6 +149,29 @@ TABLE_CONFIGS = {
     }
 }
 
+# --- Clés de substitution reprises dans le registre des clés (src.transformation.registre_cles) ---
+# config -> (colonne de la clé naturelle, colonne de l'ID, clé de type date)
+REGISTRE_DIMENSIONS = {
+    'dim_client': ('code_client', 'dim_client_id', False),
+    'dim_famillesarticles': ('code_famille', 'id_famille', False),
+    'dim_article_ventes': ('code_article', 'dim_article_id', False),
+    'dim_temps': ('date_cle', 'dim_temps_id', True),
+    'dim_fournisseur': ('ct_numpayeur', 'fournisseur_id', False),
+    'dim_famille_article': ('fa_codef', 'famille_id', False),
+    'dim_article_achats': ('ar_ref', 'article_id', False),
+    'dim_date': ('date_full', 'date_id', True),
+    # La dimension est construite sur le libellé (code_expedit en est dérivé)
+    'dim_mode_expedition': ('libelle', 'mode_id', False),
+}
+TAILLE_PAGE_LECTURE = 1000
+
+# Dimensions historisées (DIMENSIONS_HISTORISEES=1, voir src.transformation.historisation) :
+# seules leurs versions créées ou closes (<table>_delta) sont chargées, par ID de version
+historiser_dimensions = os.environ.get("DIMENSIONS_HISTORISEES", "0") == "1"
+
+# Partitions d'une table de faits chargées en parallèle
+nb_threads_chargement = max(1, int(os.environ.get("CHARGEMENT_NB_THREADS", "4")))
+
 def load_supabase_config() -> dict:
     cfg_file = dossier_config / "supabase_config.json"
     if cfg_file.exists():
@@ -147,26 +192,44 @@ def load_supabase_config() -> dict:
 def connect_supabase(conf: dict) -> Client:
     return create_client(conf["url"], conf["key"])
 
-def upload_table(supabase: Client, config_key: str):
-    """Charge une table en utilisant sa configuration définie dans TABLE_CONFIGS."""
+def config_chargement(config_key: str) -> dict:
+    """
+    Configuration de chargement d'une table (None si config_key est inconnue) :
+    une dimension historisée est chargée par ID de version, avec ses dates
+    de validité.
+    """
     config = TABLE_CONFIGS.get(config_key)
-    if not config:
-        print(f"AVERTISSESEMENT: Clé de configuration '{config_key}' non trouvée. Ignorée.")
-        return
+    if config and historiser_dimensions and config.get('historisee', False):
+        config = dict(config, natural_key_db=config['final_db_columns'][0],
+                      final_db_columns=config['final_db_columns'] + COLONNES_VALIDITE)
+    return config
+
+def colonnes_cle(config: dict) -> list:
+    """Colonnes de la clé naturelle d'une table ('col1,col2' pour une clé composite)."""
+    return config['natural_key_db'].split(',')
 
+def preparer_table(config_key: str, chemin_fichier: Path = None):
+    """
+    Lit une table (depuis chemin_fichier s'il est donné, par exemple une
+    partition) et renvoie les lignes à charger : colonnes de la base, sans
+    clé manquante ni doublon de clé. Renvoie None si le fichier est absent.
+    """
+    config = config_chargement(config_key)
     table_name = config.get('table_name', config_key)
     schema = config['schema']
-    
+    historisee = historiser_dimensions and config.get('historisee', False)
+
     # --- Carga de datos y preparación ---
     subfolder = schema
-    csv_path = dossier_datalake_processed / subfolder / f"{table_name}.csv"
+    if chemin_fichier is None:
+        chemin_fichier = chemin_table(dossier_datalake_processed / subfolder, f"{table_name}_delta" if historisee else table_name)
     
-    print(f"Traitement de {csv_path} vers la table {schema}.{table_name}...")
-    if not csv_path.exists():
+    print(f"Traitement de {chemin_fichier} vers la table {schema}.{table_name}...")
+    if not chemin_fichier.exists():
         print(f"  AVERTISSEMENT : Fichier non trouvé. Étape ignorée.")
-        return
+        return None
 
-    df = pd.read_csv(csv_path, dtype=str, encoding="utf-8-sig").replace('', pd.NA).where(pd.notnull, None)
+    df = lire_table(chemin_fichier, texte=True).replace('', pd.NA).where(pd.notnull, None)
 
     if 'rename_map' in config and config['rename_map']:
         df.rename(columns=config['rename_map'], inplace=True)
@@ -178,8 +241,7 @@ def upload_table(supabase: Client, config_key: str):
     # --- Limpieza de duplicados ANTES de la carga ---
     # Esto es crucial ahora que no usaremos ON CONFLICT
     if 'natural_key_db' in config:
-        key_cols_config = config['natural_key_db']
-        key_cols_for_cleaning = key_cols_config.split(',') if isinstance(key_cols_config, str) and ',' in key_cols_config else [key_cols_config]
+        key_cols_for_cleaning = colonnes_cle(config)
         
         print(f"  Nettoyage des doublons basé sur la clé : {key_cols_for_cleaning}")
         original_rows = len(df_to_upload)
@@ -188,6 +250,13 @@ def upload_table(supabase: Client, config_key: str):
         rows_after_cleaning = len(df_to_upload)
         if original_rows > rows_after_cleaning:
             print(f"  INFO : {original_rows - rows_after_cleaning} doublons ont été supprimés.")
+    return df_to_upload
+
+def envoyer_table(supabase: Client, config_key: str, df_to_upload: pd.DataFrame):
+    """Envoie dans la base les lignes préparées (preparer_table) d'une table."""
+    config = config_chargement(config_key)
+    table_name = config.get('table_name', config_key)
+    schema = config['schema']
 
     if df_to_upload.empty:
         print(f"  INFO : Aucune donnée valide à charger pour {table_name}.")
@@ -198,7 +267,7 @@ def upload_table(supabase: Client, config_key: str):
     try:
         # --- CAMBIO DE ESTRATEGIA ---
         # Si es fact_achats, hacemos un INSERT simple. Para las demás, un UPSERT.
-        if config_key == 'fact_achats':
+        if config.get('insertion_simple', False):
             print("  → Stratégie : INSERT simple (sans ON CONFLICT).")
             supabase.schema(schema).table(table_name).insert(records).execute()
         else:
@@ -214,12 +283,226 @@ def upload_table(supabase: Client, config_key: str):
         if records: 
             print(f"  Exemple de ligne: {records[0]}")
         raise e
+
+def upload_table(supabase: Client, config_key: str, chemin_fichier: Path = None):
+    """
+    Charge une table en utilisant sa configuration définie dans TABLE_CONFIGS
+    (depuis chemin_fichier s'il est donné, par exemple une partition).
+    """
+    if config_key not in TABLE_CONFIGS:
+        print(f"AVERTISSESEMENT: Clé de configuration '{config_key}' non trouvée. Ignorée.")
+        return
+    df_to_upload = preparer_table(config_key, chemin_fichier)
+    if df_to_upload is None:
+        return
+    envoyer_table(supabase, config_key, df_to_upload)
+
+    config = TABLE_CONFIGS[config_key]
+    if historiser_dimensions and config.get('historisee', False):
+        # Versions envoyées : elles ne figureront plus dans les prochains <table>_delta
+        RegistreCles(chemin_registre_cles).marquer_chargees(
+            f"{config['schema']}.{config.get('table_name', config_key)}",
+            df_to_upload[config['final_db_columns'][0]]
+        )
         
+def lire_colonnes(supabase: Client, schema: str, table_name: str, colonnes: list,
+                  filtrer=None) -> pd.DataFrame:
+    """
+    Lit, page par page, les colonnes d'une table de la base (seulement les
+    lignes retenues par filtrer, fonction appliquée à la requête, s'il est donné).
+    """
+    lignes = []
+    debut = 0
+    while True:
+        requete = supabase.schema(schema).table(table_name).select(','.join(colonnes))
+        if filtrer is not None:
+            requete = filtrer(requete)
+        page = requete.range(debut, debut + TAILLE_PAGE_LECTURE - 1).execute().data
+        lignes.extend(page)
+        if len(page) < TAILLE_PAGE_LECTURE:
+            break
+        debut += TAILLE_PAGE_LECTURE
+    return pd.DataFrame(lignes, columns=colonnes)
+
+def amorcer_registre_cles(supabase: Client):
+    """
+    Enregistre dans le registre des clés les IDs des dimensions déjà
+    présentes dans la base : les prochaines générations du modèle en étoile
+    les reprennent, au lieu de renuméroter les membres.
+    """
+    registre = RegistreCles(chemin_registre_cles)
+    for config_key, (colonne_cle, colonne_id, cle_date) in REGISTRE_DIMENSIONS.items():
+        config = TABLE_CONFIGS[config_key]
+        table_name = config.get('table_name', config_key)
+        schema = config['schema']
+        print(f"Lecture des IDs de {schema}.{table_name}...")
+        try:
+            df = lire_colonnes(supabase, schema, table_name, [colonne_cle, colonne_id])
+        except APIError as e:
+            print(f"  AVERTISSEMENT : lecture impossible ({e}). Dimension ignorée.")
+            continue
+        cles = pd.to_datetime(df[colonne_cle], errors='coerce') if cle_date else df[colonne_cle]
+        nb = registre.amorcer(f"{schema}.{table_name}", cles, df[colonne_id])
+        print(f"  → {nb} correspondances enregistrées.")
+    print(f"\n→ Registre des clés amorcé : {chemin_registre_cles}")
+
+def lire_partitions(config_key: str, index: dict) -> dict:
+    """
+    Lignes à charger de chaque partition d'une table de faits, dédoublonnées
+    sur la clé naturelle de toute la table et non de chaque partition : une
+    clé présente dans plusieurs partitions n'est gardée que dans la première
+    (dans l'ordre des mois). Renvoie {nom de la partition: lignes}.
+    """
+    config = TABLE_CONFIGS[config_key]
+    racine = dossier_partitions(dossier_datalake_processed / config['schema'], config.get('table_name', config_key))
+    cles = colonnes_cle(config)
+    lignes = {}
+    for nom, partition in index['partitions'].items():
+        df = preparer_table(config_key, racine / partition['chemin'])
+        if df is not None:
+            lignes[nom] = df
+    if not lignes:
+        return lignes
+
+    doublons = pd.concat(lignes.values(), ignore_index=True).duplicated(subset=cles, keep='first').to_numpy()
+    if doublons.any():
+        print(f"  INFO : {int(doublons.sum())} doublons entre partitions ont été supprimés.")
+        debut = 0
+        for nom, df in lignes.items():
+            lignes[nom] = df[~doublons[debut:debut + len(df)]]
+            debut += len(df)
+    return lignes
+
+def charger_faits(supabase: Client, config_key: str):
+    """
+    Charge une table de faits : ses partitions en parallèle si elle est
+    partitionnée (index _partitions.json), son fichier unique sinon.
+    """
+    config = TABLE_CONFIGS[config_key]
+    table_name = config.get('table_name', config_key)
+    dossier = dossier_datalake_processed / config['schema']
+    index = lire_index_partitions(dossier, table_name)
+    if index is None:
+        upload_table(supabase, config_key)
+        return
+
+    lignes = lire_partitions(config_key, index)
+    print(f"{table_name} : {len(lignes)} partitions chargées sur {nb_threads_chargement} threads.")
+    with ThreadPoolExecutor(max_workers=nb_threads_chargement) as executeur:
+        futurs = [executeur.submit(envoyer_table, supabase, config_key, df) for df in lignes.values()]
+    erreurs = [f.exception() for f in futurs if f.exception() is not None]
+    if erreurs:
+        print(f"  ERREUR : {len(erreurs)} partitions de {table_name} non chargées.")
+        raise erreurs[0]
+
+def filtre_partition(config_key: str, partition: str):
+    """
+    Fonction restreignant une requête (lecture ou suppression) aux lignes
+    d'une partition (AAAA-MM ou « inconnue ») d'une table de faits.
+    """
+    reperage = TABLE_CONFIGS[config_key]['partition']
+    if 'colonne_date' in reperage:
+        colonne = reperage['colonne_date']
+        if partition == PARTITION_INCONNUE:
+            return lambda requete: requete.is_(colonne, 'null')
+        debut, fin = bornes_partition(partition)
+        return lambda requete: requete.gte(colonne, debut.strftime('%Y-%m-%d')).lt(colonne, fin.strftime('%Y-%m-%d'))
+
+    # Faits sans colonne de date : IDs des dates du mois dans la dimension
+    config_dates = TABLE_CONFIGS[reperage['dimension_date']]
+    colonne_date, colonne_id, _ = REGISTRE_DIMENSIONS[reperage['dimension_date']]
+    if partition == PARTITION_INCONNUE:
+        ids = [ID_INCONNU]
+    else:
+        dates = lire_table(chemin_table(dossier_datalake_processed / config_dates['schema'],
+                                        config_dates.get('table_name', reperage['dimension_date'])),
+                           colonnes=[colonne_date, colonne_id])
+        jours = pd.to_datetime(dates[colonne_date], errors='coerce')
+        debut, fin = bornes_partition(partition)
+        ids = [int(i) for i in dates.loc[(jours >= debut) & (jours < fin), colonne_id]]
+    return lambda requete: requete.in_(colonne_id, ids)
+
+def supprimer_lignes(supabase: Client, config_key: str, cles: pd.DataFrame):
+    """Supprime de la base les lignes d'une table dont les clés naturelles sont données."""
+    config = TABLE_CONFIGS[config_key]
+    table = supabase.schema(config['schema']).table(config.get('table_name', config_key))
+    colonnes = list(cles.columns)
+    if len(colonnes) == 1:
+        valeurs = cles[colonnes[0]].tolist()
+        for debut in range(0, len(valeurs), TAILLE_PAGE_LECTURE):
+            table.delete().in_(colonnes[0], valeurs[debut:debut + TAILLE_PAGE_LECTURE]).execute()
+        return
+    for ligne in cles.itertuples(index=False):
+        requete = table.delete()
+        for colonne, valeur in zip(colonnes, ligne):
+            requete = requete.eq(colonne, valeur)
+        requete.execute()
+
+def remplacer_partition(supabase: Client, config_key: str, partition: str):
+    """
+    Remplace dans la base les lignes d'une partition (AAAA-MM ou « inconnue »)
+    d'une table de faits partitionnée. La partition est d'abord chargée
+    (UPSERT), puis seules les lignes du mois qui n'y figurent plus sont
+    supprimées : un chargement en échec laisse le mois intact.
+
+    Une table chargée par INSERT simple ne peut pas être chargée avant la
+    suppression de ses lignes : si le chargement échoue, la partition est
+    signalée comme perdue et l'erreur est propagée.
+    """
+    config = TABLE_CONFIGS[config_key]
+    table_name = config.get('table_name', config_key)
+    schema = config['schema']
+    dossier = dossier_datalake_processed / schema
+    index = lire_index_partitions(dossier, table_name)
+    if index is None or partition not in index['partitions']:
+        print(f"AVERTISSEMENT : partition {partition} de {table_name} non trouvée. Ignorée.")
+        return
+
+    df = lire_partitions(config_key, index).get(partition)
+    if df is None:
+        return
+    filtrer = filtre_partition(config_key, partition)
+    cles = colonnes_cle(config)
+
+    if config.get('insertion_simple', False):
+        print(f"Suppression des lignes de la partition {partition} de {schema}.{table_name}...")
+        filtrer(supabase.schema(schema).table(table_name).delete()).execute()
+        try:
+            envoyer_table(supabase, config_key, df)
+        except Exception:
+            print(f"  ERREUR : partition {partition} de {schema}.{table_name} supprimée mais non "
+                  f"rechargée (partition perdue) : relancer --partition {config_key}:{partition}.")
+            raise
+        return
+
+    anciennes = lire_colonnes(supabase, schema, table_name, cles, filtrer)
+    envoyer_table(supabase, config_key, df)
+    presentes = pd.MultiIndex.from_frame(df[cles].astype(str))
+    perimees = anciennes[~pd.MultiIndex.from_frame(anciennes.astype(str)).isin(presentes)]
+    if not perimees.empty:
+        print(f"Suppression de {len(perimees)} lignes de la partition {partition} "
+              f"de {schema}.{table_name} qui n'y figurent plus...")
+        supprimer_lignes(supabase, config_key, perimees)
+
 def main():
     """Fonction principale pour orchestrer le chargement des données."""
     conf = load_supabase_config()
     supabase = connect_supabase(conf)
 
+    if "--amorcer-registre" in sys.argv[1:]:
+        amorcer_registre_cles(supabase)
+        return
+
+    # --partition fact_ventes:2024-03 : ne remplacer que cette partition
+    arguments = sys.argv[1:]
+    partitions = [arguments[i + 1] for i, a in enumerate(arguments[:-1]) if a == "--partition"]
+    if partitions:
+        for demande in partitions:
+            config_key, _, partition = demande.partition(':')
+            remplacer_partition(supabase, config_key, partition)
+        print("\n→ Remplacement des partitions terminé.")
+        return
+
     # Ordre de chargement explicite pour gérer les dépendances de clés étrangères
     ordre_chargement_ventes = [
         "dim_client", "dim_temps", "dim_famillesarticles", 
@@ -235,11 +518,17 @@ def main():
 
     print("\n--- DÉBUT DU CHARGEMENT DU SCHÉMA 'VENTES' ---")
     for config_key in ordre_chargement_ventes:
-        upload_table(supabase, config_key)
+        if 'partition' in TABLE_CONFIGS[config_key]:
+            charger_faits(supabase, config_key)
+        else:
+            upload_table(supabase, config_key)
 
     print("\n--- DÉBUT DU CHARGEMENT DU SCHÉMA 'ACHATS' ---")
     for config_key in ordre_chargement_achats:
-        upload_table(supabase, config_key)
+        if 'partition' in TABLE_CONFIGS[config_key]:
+            charger_faits(supabase, config_key)
+        else:
+            upload_table(supabase, config_key)
 
     print("\n→ Chargement en modèle étoile terminé avec succès !")
 
@@ -247,4 +536,5 @@ if __name__ == "__main__":
     try:
         main()
     except Exception as e:
-        print(f"\nL'OPÉRATION A ÉCHOUÉ. Erreur non capturée : {e}")
\ No newline at end of file
+        print(f"\nL'OPÉRATION A ÉCHOUÉ. Erreur non capturée : {e}")
+        sys.exit(1)
\ No newline at end of file
@@ -7,40 +7,131 @@ from pathlib import Path
 import pandas as pd
 
 try:
-    from src.outils.chemins import dossier_datalake_staging_sage, dossier_datalake_processed
+    from src.outils.chemins import (
+        dossier_datalake_staging_sage, dossier_datalake_processed,
+        chemin_etat_staging_sage, chemin_etat_tables_generales
+    )
     from src.outils.logger import get_logger
+    from src.outils.fichiers_bruts import COLONNE_SOURCE_BASE
+    from src.outils.manifeste import SuiviEmpreintes, empreintes_etape
+    from src.models.types_lecture import schema_fichier
+    from src.outils.besoins_colonnes import besoin_consommateur, colonnes_consommateurs
+    from src.outils.stockage_lac import chemin_table, ecrire_table, lire_table
+    from src.outils.cache_tables import CacheTables
+    from src.outils.enrichissement import IndexDimension
 except ImportError:
     projet_root = Path(__file__).resolve().parents[2]
     sys.path.insert(0, str(projet_root / "src"))
-    from outils.chemins import dossier_datalake_staging_sage, dossier_datalake_processed
+    sys.path.insert(0, str(projet_root))
+    from outils.chemins import (
+        dossier_datalake_staging_sage, dossier_datalake_processed,
+        chemin_etat_staging_sage, chemin_etat_tables_generales
+    )
     from outils.logger import get_logger
+    from src.outils.fichiers_bruts import COLONNE_SOURCE_BASE
+    from src.outils.manifeste import SuiviEmpreintes, empreintes_etape
+    from src.models.types_lecture import schema_fichier
+    from src.outils.besoins_colonnes import besoin_consommateur, colonnes_consommateurs
+    from src.outils.stockage_lac import chemin_table, ecrire_table, lire_table
+    from src.outils.cache_tables import CacheTables
+    from src.outils.enrichissement import IndexDimension
 
 logger = get_logger(__name__)
 
-def _load_staging(table_name: str) -> pd.DataFrame:
-    """Charge une table de staging en CSV et renvoie un DataFrame Pandas."""
-    filename = f"F_{table_name}_staging.csv"
-    path = dossier_datalake_staging_sage / filename
-    if not path.exists():
-        raise FileNotFoundError(f"{path} non trouvé")
-    df = pd.read_csv(path, dtype=str, encoding="utf-8-sig").fillna('')
+# Tables de staging gardées en mémoire entre les tables générales : chaque
+# table n'est lue qu'une fois (F_DOCLIGNE sert aux ventes et aux achats),
+# dans la limite de TABLES_GENERALES_CACHE_OCTETS, et les tables sont
+# préchargées sur TABLES_GENERALES_NB_THREADS threads
+cache_staging = CacheTables(
+    int(os.environ.get("TABLES_GENERALES_CACHE_OCTETS", str(2 * 1024 ** 3))),
+    int(os.environ.get("TABLES_GENERALES_NB_THREADS", "4")),
+)
+
+# Tables de staging utilisées par chaque table générale : une table générale
+# n'est régénérée que si l'une d'elles a été re-nettoyée depuis
+tables_sources_generales = {
+    "tabla_generale_ventes": ["F_DOCLIGNE", "F_ARTICLE", "F_FAMILLE", "F_COMPTET"],
+    "tabla_generale_achats": ["F_DOCENTETE", "F_COMPTET", "F_DOCLIGNE", "F_ARTICLE", "F_FAMILLE"],
+}
+
+def _cles(df: pd.DataFrame, *colonnes) -> list:
+    """
+    Colonnes de jointure : après une extraction multi-bases, la base
+    d'origine (SOURCE_BASE) s'ajoute aux clés, un même code pouvant désigner
+    des clients ou articles différents d'une société à l'autre.
+    """
+    return list(colonnes) + ([COLONNE_SOURCE_BASE] if COLONNE_SOURCE_BASE in df.columns else [])
+
+def _chemin_staging(nom_table: str) -> Path:
+    return chemin_table(dossier_datalake_staging_sage, f"{nom_table}_staging")
+
+def _lire_staging(nom_table: str) -> pd.DataFrame:
+    """
+    Lit une table de staging (CSV ou Parquet, voir src/outils/stockage_lac.py)
+    avec les colonnes dont l'ensemble des tables générales a besoin (voir
+    src/outils/besoins_colonnes.py). Les colonnes déclarées dans
+    src/models/tables.py sont lues directement dans leur type (entiers,
+    montants, dates) ; les autres en texte, les valeurs manquantes du texte
+    étant remplacées par ''.
+    """
+    colonnes = {c.lower() for c in colonnes_consommateurs(nom_table) + (COLONNE_SOURCE_BASE,)}
+    df = lire_table(_chemin_staging(nom_table),
+                    colonnes=lambda colonne: colonne.strip().lower() in colonnes,
+                    schema=schema_fichier(nom_table), texte_par_defaut=True)
     df.columns = df.columns.str.strip() # Normalisation des noms de colonnes
+    texte = [c for c in df.columns if pd.api.types.is_string_dtype(df[c])]
+    df[texte] = df[texte].fillna('')
     return df
 
-def generer_ventes_simplifie():
-    """Génère le CSV de la table générale des ventes simplifiées, incluant le code famille."""
+def _load_staging(table_name: str, consommateur: str) -> pd.DataFrame:
+    """
+    Renvoie une table de staging réduite aux colonnes que consommateur
+    (table générale) déclare dans src/outils/besoins_colonnes.py. La table
+    n'est lue qu'une fois pour toutes les tables générales (cache_staging) ;
+    chaque appel reçoit sa propre copie des colonnes demandées.
+    """
+    nom_table = f"F_{table_name}"
+    path = _chemin_staging(nom_table)
+    if not path.exists():
+        raise FileNotFoundError(f"{path} non trouvé")
+    df = cache_staging.obtenir(path, lambda: _lire_staging(nom_table))
+    besoin = besoin_consommateur(consommateur, nom_table)
+    colonnes = {c.lower() for c in besoin.colonnes + (COLONNE_SOURCE_BASE,)}
+    return df[[c for c in df.columns if c.lower() in colonnes]].copy()
+
+def _index_dimension(table_name: str, cle: str, attributs) -> IndexDimension:
+    """
+    Index clé → attributs d'une table de staging servant de dimension (voir
+    src/outils/enrichissement.py), sur cle et, après une extraction
+    multi-bases, SOURCE_BASE. L'index est construit une fois pour les ventes
+    et les achats (cache_staging), et reconstruit si la table a changé.
+    """
+    nom_table = f"F_{table_name}"
+    path = _chemin_staging(nom_table)
+    if not path.exists():
+        raise FileNotFoundError(f"{path} non trouvé")
+
+    def construire():
+        df = cache_staging.obtenir(path, lambda: _lire_staging(nom_table))
+        index = IndexDimension(df, _cles(df, cle), list(attributs))
+        if index.doublons:
+            logger.warning("%s : %d ligne(s) en double sur %s, première occurrence retenue",
+                           nom_table, index.doublons, cle)
+        return index
+
+    return cache_staging.obtenir(path, construire, variante=("index", cle, tuple(attributs)))
+
+def construire_ventes_simplifie() -> pd.DataFrame:
+    """Construit la table générale des ventes simplifiées, incluant le code famille."""
     logger.info("Début de la génération de la table générale des VENTES...")
-    d = _load_staging("DOCLIGNE")
-    a = _load_staging("ARTICLE")
-    f = _load_staging("FAMILLE")
-    c = _load_staging("COMPTET")
-
-    df = (
-        d
-        .merge(a[["AR_REF","FA_CODEFAMILLE"]], on="AR_REF", how="left")
-        .merge(f[["FA_CODEFAMILLE","FA_CENTRAL","FA_INTITULE"]], on="FA_CODEFAMILLE", how="left")
-        .merge(c[["CT_NUM","CT_INTITULE"]], on="CT_NUM", how="left")
-    )
+    df = _load_staging("DOCLIGNE", "tabla_generale_ventes")
+
+    # Enrichissement par index : seules les colonnes utiles des dimensions
+    # sont ajoutées aux lignes, sans jointure ni recopie de la table
+    _index_dimension("ARTICLE", "AR_REF", ["FA_CODEFAMILLE"]).enrichir(df, cles=_cles(df, "AR_REF"))
+    _index_dimension("FAMILLE", "FA_CODEFAMILLE", ["FA_CENTRAL", "FA_INTITULE"]).enrichir(
+        df, cles=_cles(df, "FA_CODEFAMILLE"))
+    _index_dimension("COMPTET", "CT_NUM", ["CT_INTITULE"]).enrichir(df, cles=_cles(df, "CT_NUM"))
 
     logger.info("Enrichissement des familles d'articles manquantes...")
     
@@ -80,16 +171,16 @@ def generer_ventes_simplifie():
     data = {}
     for name in champs:
         if name == "N° Ligne doc":
-            data[name] = pd.to_numeric(df.get("DL_NO"), errors='coerce').astype('Int64')
+            data[name] = df.get("DL_NO")
         elif name == "N° Cde":
             data[name] = df.get("DO_PIECE")
         elif name in ("Qté fact", "Prix Unitaire", "Tot HT"):
             clé = {"Qté fact": "DL_QTE", "Prix Unitaire": "DL_PRIXUNITAIRE", "Tot HT": "DL_MONTANTHT"}[name]
-            data[name] = pd.to_numeric(df.get(clé), errors="coerce")
+            data[name] = df.get(clé)
         elif name == "Année":
-            data[name] = pd.to_datetime(df.get("DO_DATE"), errors="coerce").dt.year.astype("Int64")
+            data[name] = df.get("DO_DATE").dt.year.astype("Int64")
         elif name == "Mois":
-            data[name] = pd.to_datetime(df.get("DO_DATE"), errors="coerce").dt.month.astype("Int64")
+            data[name] = df.get("DO_DATE").dt.month.astype("Int64")
         else:
             mapping = {
                 "Famille du client": "FA_CODEFAMILLE", 
@@ -108,51 +199,84 @@ def generer_ventes_simplifie():
                 data[name] = df.get(mapping[name])
             else:
                  data[name] = pd.NA
+    if COLONNE_SOURCE_BASE in df.columns:
+        data["Source base"] = df[COLONNE_SOURCE_BASE]
 
-    df_out = pd.DataFrame(data)
-    os.makedirs(dossier_datalake_processed, exist_ok=True)
-    sortie = dossier_datalake_processed / "tabla_generale_ventes.csv"
-    df_out.to_csv(sortie, index=False, encoding="utf-8-sig")
-    logger.info("CSV Ventes écrit : %s (%d lignes × %d colonnes)", sortie, *df_out.shape)
+    return pd.DataFrame(data)
 
 
-def generer_achats_simplifie():
+def ecrire_ventes_simplifie(df_out: pd.DataFrame):
+    sortie = ecrire_table(df_out, chemin_table(dossier_datalake_processed, "tabla_generale_ventes"))
+    logger.info("Ventes écrit : %s (%d lignes × %d colonnes)", sortie, *df_out.shape)
+
+
+def generer_ventes_simplifie():
+    """Génère le fichier de la table générale des ventes simplifiées."""
+    ecrire_ventes_simplifie(construire_ventes_simplifie())
+
+
+def _entetes_achats() -> pd.DataFrame:
     """
-    Génère la table générale des achats, incluant le code famille.
-    Chaque ligne représente un en-tête de document d'achat (DO_PIECE),
-    enrichi avec les informations de la première ligne d'article trouvée.
+    Étape 1 des achats : en-têtes de catégorie comptable « Achats », un par
+    pièce (DO_PIECE), puis enrichis des informations du fournisseur.
     """
-    logger.info("Début de la génération de la table générale des ACHATS...")
-
-    d_entete = _load_staging("DOCENTETE")
-    c = _load_staging("COMPTET")
+    d_entete = _load_staging("DOCENTETE", "tabla_generale_achats")
     
     mask_achats = d_entete["INT_CATCOMPTA"].astype(str).str.match(r"^Achats\b", case=False, na=False)
     d_achats = d_entete.loc[mask_achats].copy()
     d_achats['DO_PIECE'] = d_achats['DO_PIECE'].str.strip()
-    
-    df_entete = d_achats.merge(c.drop_duplicates(subset=["CT_NUMPAYEUR"]), on="CT_NUMPAYEUR", how="left")
-    df_entete_unique = df_entete.drop_duplicates(subset=['DO_PIECE'], keep='first').copy()
+    df_entete_unique = d_achats.drop_duplicates(subset=_cles(d_achats, 'DO_PIECE'), keep='first').copy()
     logger.info("En-têtes d'achat uniques à traiter : %d lignes", len(df_entete_unique))
 
-    d_ligne = _load_staging("DOCLIGNE")
-    a = _load_staging("ARTICLE")
-    f = _load_staging("FAMILLE")
-    
-    d_ligne_enrichie = d_ligne.merge(
-        a[["AR_REF","FA_CODEFAMILLE"]], on="AR_REF", how="left"
-    ).merge(
-        f[["FA_CODEFAMILLE","FA_CENTRAL","FA_INTITULE"]], on="FA_CODEFAMILLE", how="left"
-    )
-    d_ligne_enrichie['DO_PIECE'] = d_ligne_enrichie['DO_PIECE'].str.strip()
-    
-    df_ligne_premier = d_ligne_enrichie.drop_duplicates(subset=['DO_PIECE'], keep='first')
+    attributs_tiers = [col for col in besoin_consommateur("tabla_generale_achats", "F_COMPTET").colonnes
+                       if col != "CT_NUMPAYEUR"]
+    return _index_dimension("COMPTET", "CT_NUMPAYEUR", attributs_tiers).enrichir(
+        df_entete_unique, cles=_cles(df_entete_unique, "CT_NUMPAYEUR"))
+
+def _premieres_lignes_achats(df_entete_unique: pd.DataFrame) -> pd.DataFrame:
+    """
+    Étape 2 des achats : première ligne de détail de chaque pièce d'achat.
+    Les lignes sont d'abord restreintes aux pièces des en-têtes retenus (les
+    lignes de vente sont écartées avant tout traitement), puis réduites à la
+    première ligne par pièce ; seules ces lignes sont enrichies de l'article
+    et de sa famille.
+    """
+    d_ligne = _load_staging("DOCLIGNE", "tabla_generale_achats")
+    d_ligne['DO_PIECE'] = d_ligne['DO_PIECE'].str.strip()
+
+    # Index sans attribut : ensemble des pièces d'achat
+    pieces_achats = IndexDimension(df_entete_unique, _cles(df_entete_unique, 'DO_PIECE'), [])
+    d_ligne_achats = d_ligne.loc[pieces_achats.positions(d_ligne) >= 0]
+    logger.info("Lignes de détail des pièces d'achat : %d sur %d", len(d_ligne_achats), len(d_ligne))
+
+    df_ligne_premier = d_ligne_achats.drop_duplicates(subset=_cles(d_ligne_achats, 'DO_PIECE'), keep='first').copy()
     logger.info("Première ligne de détail extraite pour %d pièces uniques", len(df_ligne_premier))
+
+    _index_dimension("ARTICLE", "AR_REF", ["FA_CODEFAMILLE"]).enrichir(
+        df_ligne_premier, cles=_cles(df_ligne_premier, "AR_REF"))
+    _index_dimension("FAMILLE", "FA_CODEFAMILLE", ["FA_CENTRAL", "FA_INTITULE"]).enrichir(
+        df_ligne_premier, cles=_cles(df_ligne_premier, "FA_CODEFAMILLE"))
+    return df_ligne_premier
+
+def construire_achats_simplifie() -> pd.DataFrame:
+    """
+    Construit la table générale des achats, incluant le code famille.
+    Chaque ligne représente un en-tête de document d'achat (DO_PIECE),
+    enrichi avec les informations de la première ligne d'article trouvée.
+
+    Les filtres passent avant les enrichissements : en-têtes d'achat
+    (étape 1), lignes de ces pièces puis première ligne par pièce (étape 2),
+    et enfin jointure des deux (étape 3).
+    """
+    logger.info("Début de la génération de la table générale des ACHATS...")
+
+    df_entete_unique = _entetes_achats()
+    df_ligne_premier = _premieres_lignes_achats(df_entete_unique)
     
     # --- CORRECTION: Utilisation de suffixes pour gérer les colonnes dupliquées ---
     df_final = df_entete_unique.merge(
         df_ligne_premier,
-        on='DO_PIECE',
+        on=_cles(df_entete_unique, 'DO_PIECE'),
         how='left',
         suffixes=('_entete', '_ligne')
     )
@@ -160,6 +284,8 @@ def generer_achats_simplifie():
 
     # --- CORRECTION: Utiliser les noms de colonnes avec suffixes ---
     # La date de l'achat vient de l'en-tête, donc on utilise 'DO_DATE_entete'
+    # (F_DOCENTETE n'est pas décrite dans src/models/tables.py : ses colonnes
+    # sont lues en texte et converties ici)
     df_final["Année"] = pd.to_datetime(df_final.get("DO_DATE_entete"), errors="coerce").dt.year.astype("Int64")
     df_final["Mois"] = pd.to_datetime(df_final.get("DO_DATE_entete"), errors="coerce").dt.month.astype("Int64")
 
@@ -168,7 +294,7 @@ def generer_achats_simplifie():
         "Code fournisseur": df_final.get("CT_NUMPAYEUR"),
         "date achat": df_final.get("DO_DATE_entete"),
         "Bon de commande": df_final.get("DO_PIECE"),
-        "Qté fact": pd.to_numeric(df_final.get("DL_QTE"), errors="coerce"),
+        "Qté fact": df_final.get("DL_QTE"),
         "Total TVA": pd.to_numeric(df_final.get("FNT_MONTANTTOTALTAXES"), errors="coerce"),
         "Total HT": pd.to_numeric(df_final.get("FNT_TOTALHTNET"), errors="coerce"),
         "Total TTC": pd.to_numeric(df_final.get("FNT_TOTALTTC"), errors="coerce"),
@@ -191,22 +317,63 @@ def generer_achats_simplifie():
         "Année": df_final.get("Année"),
         "Mois": df_final.get("Mois")
     }
+    if COLONNE_SOURCE_BASE in df_final.columns:
+        data_export["Source base"] = df_final[COLONNE_SOURCE_BASE]
 
-    df_export = pd.DataFrame(data_export)
-    
-    os.makedirs(dossier_datalake_processed, exist_ok=True)
-    sortie = dossier_datalake_processed / "tabla_generale_achats.csv"
-    df_export.to_csv(sortie, index=False, encoding="utf-8-sig")
-    logger.info("CSV Achats (avec première ligne) écrit : %s (%d lignes × %d colonnes)", sortie, *df_export.shape)
+    return pd.DataFrame(data_export)
 
 
-if __name__ == "__main__":
-    try:
-        generer_ventes_simplifie()
-    except Exception as e:
-        logger.error(f"Erreur lors de la génération des ventes : {e}", exc_info=True)
-    
+def ecrire_achats_simplifie(df_export: pd.DataFrame):
+    sortie = ecrire_table(df_export, chemin_table(dossier_datalake_processed, "tabla_generale_achats"))
+    logger.info("Achats (avec première ligne) écrit : %s (%d lignes × %d colonnes)", sortie, *df_export.shape)
+
+
+def generer_achats_simplifie():
+    """Génère le fichier de la table générale des achats."""
+    ecrire_achats_simplifie(construire_achats_simplifie())
+
+
+def precharger_staging(cles) -> list:
+    """
+    Lance la lecture en parallèle des tables de staging des tables générales
+    cles ; renvoie les noms de ces tables.
+    """
+    tables = list(dict.fromkeys(t for cle in cles for t in tables_sources_generales[cle]))
+    cache_staging.precharger(
+        [(_chemin_staging(t), lambda t=t: _lire_staging(t)) for t in tables]
+    )
+    return tables
+
+
+def main():
+    suivi = SuiviEmpreintes(chemin_etat_tables_generales, empreintes_etape(chemin_etat_staging_sage))
+    generations = [
+        ("tabla_generale_ventes", "ventes", generer_ventes_simplifie),
+        ("tabla_generale_achats", "achats", generer_achats_simplifie),
+    ]
+    a_generer = []
+    for cle, libelle, generer in generations:
+        if suivi.inchange(cle, tables_sources_generales[cle], [chemin_table(dossier_datalake_processed, cle)]):
+            logger.info("Table générale des %s inchangée (tables sources identiques), génération sautée", libelle)
+        else:
+            a_generer.append((cle, libelle, generer))
+
+    tables = precharger_staging([cle for cle, _, _ in a_generer])
     try:
-        generer_achats_simplifie()
-    except Exception as e:
-        logger.error(f"Erreur lors de la génération des achats : {e}", exc_info=True)
\ No newline at end of file
+        for cle, libelle, generer in a_generer:
+            try:
+                generer()
+                suivi.enregistrer(cle, tables_sources_generales[cle])
+            except Exception as e:
+                logger.error(f"Erreur lors de la génération des {libelle} : {e}", exc_info=True)
+    finally:
+        cache_staging.fermer()
+        cache_staging.vider()
+    if tables:
+        logger.info("Tables de staging : %d lecture(s), %d reprise(s) du cache",
+                    cache_staging.lectures, cache_staging.reprises)
+    suivi.sauver()
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
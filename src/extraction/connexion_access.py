@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Connexions ODBC vers la base Access Sage.
+
+Le pilote Access passe l'essentiel de son temps à attendre des entrées/sorties :
+plusieurs connexions ouvertes en parallèle permettent d'exporter plusieurs
+tables à la fois. PoolConnexions borne le nombre de connexions ouvertes
+simultanément sur le même fichier .accdb. Le pool accepte aussi toute autre
+fabrique de connexions (voir src.extraction.lecteurs_access).
+"""
+
+import queue
+import threading
+from contextlib import contextmanager
+
+try:
+    import pyodbc
+except ImportError:  # le lecteur mdbtools fonctionne sans pyodbc
+    pyodbc = None
+
+# Erreurs pyodbc après lesquelles une connexion n'est plus réutilisée
+ERREURS_ODBC = (pyodbc.Error,) if pyodbc is not None else ()
+
+# --------------------------------------------------------------------
+# Chaîne de connexion au pilote Microsoft Access
+# --------------------------------------------------------------------
+PILOTE_ACCESS = "Microsoft Access Driver (*.mdb, *.accdb)"
+
+
+def ouvrir_connexion(chemin_fichier_access):
+    """
+    Ouvre une connexion pyodbc vers le fichier Access indiqué.
+    """
+    if pyodbc is None:
+        raise ImportError("pyodbc est requis pour le lecteur Access odbc")
+    return pyodbc.connect(
+        fr"Driver={{{PILOTE_ACCESS}}};DBQ={chemin_fichier_access};"
+    )
+
+
+# --------------------------------------------------------------------
+# Pool borné de connexions
+# --------------------------------------------------------------------
+class PoolConnexions:
+    """
+    Pool de connexions Access de taille bornée.
+
+    Les connexions sont créées à la demande par fabrique(chemin), jusqu'à
+    taille_max ; au-delà, un appelant attend qu'une connexion soit rendue au
+    pool. Une connexion ayant levé l'une des erreurs_fatales est écartée.
+    """
+
+    def __init__(self, chemin_fichier_access, taille_max=4,
+                 fabrique=ouvrir_connexion, erreurs_fatales=ERREURS_ODBC):
+        if taille_max < 1:
+            raise ValueError("La taille du pool doit être au moins égale à 1")
+        self.chemin_fichier_access = chemin_fichier_access
+        self.taille_max = taille_max
+        self.fabrique = fabrique
+        self.erreurs_fatales = erreurs_fatales
+        self._libres = queue.Queue()
+        self._toutes = []
+        self._verrou = threading.Lock()
+
+    def _prendre(self):
+        try:
+            return self._libres.get_nowait()
+        except queue.Empty:
+            pass
+        with self._verrou:
+            if len(self._toutes) < self.taille_max:
+                connexion = self.fabrique(self.chemin_fichier_access)
+                self._toutes.append(connexion)
+                return connexion
+        return self._libres.get()
+
+    def _rendre(self, connexion, valide=True):
+        if valide:
+            self._libres.put(connexion)
+            return
+        # Connexion inutilisable : on la retire du pool pour libérer une place
+        with self._verrou:
+            if connexion in self._toutes:
+                self._toutes.remove(connexion)
+        try:
+            connexion.close()
+        except self.erreurs_fatales:
+            pass
+
+    @contextmanager
+    def connexion(self):
+        """
+        Emprunte une connexion au pool le temps du bloc with.
+        Une connexion ayant levé une erreur fatale est fermée et remplacée.
+        """
+        connexion = self._prendre()
+        valide = True
+        try:
+            yield connexion
+        except self.erreurs_fatales:
+            valide = False
+            raise
+        finally:
+            self._rendre(connexion, valide)
+
+    def fermer(self):
+        """Ferme toutes les connexions ouvertes par le pool."""
+        with self._verrou:
+            connexions, self._toutes = self._toutes, []
+        for connexion in connexions:
+            try:
+                connexion.close()
+            except self.erreurs_fatales:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Export typé des résultats pyodbc vers des fichiers colonnaires (Parquet ou Arrow IPC).
+
+Le schéma Arrow est déduit de curseur.description : les entiers, décimaux
+(avec leur précision et leur échelle), dates et booléens gardent leur type
+au lieu d'être convertis en texte par csv.writer puis ré-interprétés par
+pd.read_csv. Chaque lot fetchmany est transposé en colonnes et converti par
+pyarrow en une seule opération par colonne (pas de conversion ligne à ligne
+en Python).
+"""
+
+import datetime
+import decimal
+
+# pyarrow est une dépendance optionnelle, importée (ou None) par stockage_lac
+from src.outils.stockage_lac import compression_parquet, pa, pq, verifier_pyarrow
+
+# Formats colonnaires disponibles et extension des fichiers produits
+EXTENSIONS_COLONNAIRES = {"parquet": ".parquet", "arrow": ".arrow"}
+
+# Précision maximale d'un decimal128 Arrow
+PRECISION_DECIMAL_MAX = 38
+
+
+# Usage de pyarrow indiqué si la dépendance manque
+USAGE_PYARROW = "l'extraction au format Parquet/Arrow"
+
+
+def type_arrow(colonne_description):
+    """
+    Renvoie le type Arrow correspondant à une entrée de curseur.description :
+    (nom, type_code, display_size, internal_size, precision, scale, null_ok).
+    """
+    type_code = colonne_description[1]
+    if type_code is bool:
+        return pa.bool_()
+    if type_code is int:
+        return pa.int64()
+    if type_code is float:
+        return pa.float64()
+    if type_code is decimal.Decimal:
+        precision = colonne_description[4] or PRECISION_DECIMAL_MAX
+        echelle = colonne_description[5] or 0
+        precision = min(max(precision, echelle, 1), PRECISION_DECIMAL_MAX)
+        return pa.decimal128(precision, echelle)
+    if type_code is datetime.datetime:
+        return pa.timestamp("us")
+    if type_code is datetime.date:
+        return pa.date32()
+    if type_code in (bytes, bytearray):
+        return pa.binary()
+    return pa.string()
+
+
+def schema_arrow(description):
+    """Construit le schéma Arrow d'un résultat pyodbc."""
+    verifier_pyarrow(USAGE_PYARROW)
+    return pa.schema([pa.field(col[0], type_arrow(col)) for col in description])
+
+
+def lot_vers_record_batch(lot, schema):
+    """
+    Convertit un lot de lignes pyodbc en RecordBatch typé : le lot est
+    transposé en colonnes, puis chaque colonne est convertie par pyarrow.
+    """
+    if lot:
+        colonnes = list(zip(*lot))
+    else:
+        colonnes = [()] * len(schema)
+    tableaux = [
+        pa.array(valeurs, type=champ.type)
+        for valeurs, champ in zip(colonnes, schema)
+    ]
+    return pa.RecordBatch.from_arrays(tableaux, schema=schema)
+
+
+class EcrivainColonnaire:
+    """
+    Écrit des RecordBatch successifs dans un fichier Parquet (compressé)
+    ou Arrow IPC, selon le format demandé.
+    """
+
+    def __init__(self, chemin, schema, format_sortie="parquet"):
+        verifier_pyarrow(USAGE_PYARROW)
+        self.schema = schema
+        if format_sortie == "parquet":
+            self._ecrivain = pq.ParquetWriter(str(chemin), schema, compression=compression_parquet)
+        elif format_sortie == "arrow":
+            self._sink = pa.OSFile(str(chemin), "wb")
+            self._ecrivain = pa.ipc.new_file(self._sink, schema)
+        else:
+            raise ValueError(f"Format colonnaire inconnu : {format_sortie}")
+        self.format_sortie = format_sortie
+
+    def ecrire_batch(self, batch):
+        if self.format_sortie == "parquet":
+            self._ecrivain.write_table(pa.Table.from_batches([batch]))
+        else:
+            self._ecrivain.write_batch(batch)
+
+    def ecrire_lot(self, lot):
+        """Écrit un lot de lignes pyodbc et renvoie le RecordBatch produit."""
+        batch = lot_vers_record_batch(lot, self.schema)
+        self.ecrire_batch(batch)
+        return batch
+
+    def fermer(self):
+        self._ecrivain.close()
+        if self.format_sortie == "arrow":
+            self._sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+
+
+def lire_schema(chemin):
+    """Renvoie le schéma Arrow d'un fichier Parquet ou Arrow IPC."""
+    verifier_pyarrow(USAGE_PYARROW)
+    if chemin.suffix == EXTENSIONS_COLONNAIRES["parquet"]:
+        return pq.read_schema(str(chemin))
+    with pa.memory_map(str(chemin)) as source:
+        return pa.ipc.open_file(source).schema
+
+
+def lire_batches(chemin):
+    """Itère sur les RecordBatch d'un fichier Parquet ou Arrow IPC."""
+    verifier_pyarrow(USAGE_PYARROW)
+    if chemin.suffix == EXTENSIONS_COLONNAIRES["parquet"]:
+        yield from pq.ParquetFile(str(chemin)).iter_batches()
+    else:
+        with pa.memory_map(str(chemin)) as source:
+            lecteur = pa.ipc.open_file(source)
+            for i in range(lecteur.num_record_batches):
+                yield lecteur.get_batch(i)
+
+
+def assembler_fichiers_colonnaires(parties, chemin_sortie, format_sortie):
+    """Concatène, lot par lot, des parties colonnaires de même schéma en un seul fichier."""
+    with EcrivainColonnaire(chemin_sortie, lire_schema(parties[0]), format_sortie) as ecrivain:
+        for partie in parties:
+            for batch in lire_batches(partie):
+                ecrivain.ecrire_batch(batch)
@@ -2,7 +2,11 @@
 # -*- coding: utf-8 -*-
 
 import csv
-import pyodbc
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
 from pathlib import Path
 import os
 
@@ -10,12 +14,77 @@ import os
 # Importation des chemins absolus depuis outils.chemins
 # --------------------------------------------------------------------
 from src.outils.chemins import racine_projet, dossier_datalake_raw_sage
+from src.extraction.lecteurs_access import classe_lecteur, pool_lecteurs
+from src.extraction.partitionnement import trouver_cle_partition, assembler_parties
+from src.extraction.incremental import (
+    EtatIncremental, choisir_colonne_filigrane, nouveau_chemin_delta, supprimer_deltas
+)
+from src.extraction.export_arrow import (
+    EXTENSIONS_COLONNAIRES, USAGE_PYARROW, EcrivainColonnaire, schema_arrow
+)
+from src.extraction.reprise import (
+    CLE_UNITE_DELTA, CLE_UNITE_TABLE, PlanTable, RepriseExtraction, cle_unite_plage
+)
+from src.outils.ecriture_atomique import (
+    SUFFIXE_TEMPORAIRE, ecrire_json_atomique, ecriture_atomique, supprimer_fichiers_temporaires
+)
+from src.outils.fichiers_bruts import (
+    COLONNE_IDENTIFIANT, fichiers_instantane, supprimer_instantane
+)
+from src.outils.manifeste import ecrire_manifeste, lire_schema_brut, NOM_MANIFESTE
+from src.outils.besoins_colonnes import (
+    besoin_table, colonnes_projetees, filtre_table, projection_active
+)
+from src.outils.statistiques_colonnes import StatistiquesColonnes
+from src.outils.stockage_lac import format_lac, verifier_pyarrow
 
 # --------------------------------------------------------------------
 # Paramètres utilisateur basés sur des chemins absolus
 # --------------------------------------------------------------------
-chemin_fichier_access = racine_projet / "db_sage_access" / "tables_sage_hyperix.accdb"
-dossier_sortie_csv   = dossier_datalake_raw_sage
+# Le fichier Access peut être imposé par src.main via la variable ACCESS_FILE
+chemin_fichier_access = Path(
+    os.environ.get("ACCESS_FILE", racine_projet / "db_sage_access" / "tables_sage_hyperix.accdb")
+)
+# Dossier des fichiers bruts : imposé par l'extraction multi-bases
+# (data_lake/raw/sage/base=<nom>) via EXTRACTION_DOSSIER_SORTIE
+dossier_sortie_csv   = Path(os.environ.get("EXTRACTION_DOSSIER_SORTIE", dossier_datalake_raw_sage))
+
+# Lecteur de la base : odbc (pilote Microsoft Access) ou mdbtools (Linux, sans
+# pilote ; les tables sont alors toujours exportées en entier)
+lecteur_access = os.environ.get("EXTRACTION_LECTEUR", "odbc").lower()
+classe_lecteur(lecteur_access)
+
+# Nombre de lignes récupérées par appel à fetchmany : borne la mémoire utilisée
+# par l'export, quelle que soit la taille de la table
+taille_lot_fetchmany = int(os.environ.get("EXTRACTION_TAILLE_LOT", "10000"))
+
+# Format des fichiers bruts : csv (texte), parquet ou arrow (colonnaires typés) ;
+# par défaut celui du data lake (LAC_FORMAT)
+format_sortie = os.environ.get("EXTRACTION_FORMAT", format_lac).lower()
+if format_sortie != "csv" and format_sortie not in EXTENSIONS_COLONNAIRES:
+    raise ValueError(f"EXTRACTION_FORMAT inconnu : {format_sortie} (csv, parquet ou arrow)")
+extension_sortie = EXTENSIONS_COLONNAIRES.get(format_sortie, ".csv")
+
+# Nombre de tables exportées simultanément (une connexion du pool par tâche)
+nb_workers = int(os.environ.get("EXTRACTION_NB_WORKERS", "4"))
+
+# Au-delà de ce nombre de lignes, une table est lue par plages de clé en parallèle
+seuil_partition = int(os.environ.get("EXTRACTION_SEUIL_PARTITION", "500000"))
+nb_partitions = int(os.environ.get("EXTRACTION_NB_PARTITIONS", str(nb_workers)))
+
+# 1 : les parties d'une table partitionnée sont réassemblées en un seul fichier
+assembler_partitions = os.environ.get("EXTRACTION_ASSEMBLER_PARTIES", "0") == "1"
+
+# 1 : n'exporter que les lignes nouvelles ou modifiées depuis la dernière extraction
+extraction_incrementale = os.environ.get("EXTRACTION_INCREMENTALE", "0") == "1"
+chemin_etat_incremental = dossier_sortie_csv / "_etat_incremental.json"
+
+# Résumé de la dernière extraction (résultat et erreur éventuelle par table)
+chemin_resume_extraction = dossier_sortie_csv / "_resume_extraction.json"
+
+# Plans et unités terminées de l'extraction en cours : une extraction
+# interrompue reprend là où elle s'est arrêtée (voir src.extraction.reprise)
+chemin_reprise_extraction = dossier_sortie_csv / "_reprise_extraction.json"
 
 # --------------------------------------------------------------------
 # Création du dossier de sortie s'il n'existe pas
@@ -23,56 +92,467 @@ dossier_sortie_csv   = dossier_datalake_raw_sage
 dossier_sortie_csv.mkdir(parents=True, exist_ok=True)
 
 # --------------------------------------------------------------------
-# Connexion à la base Access
+# Lecture par lots d'un résultat
 # --------------------------------------------------------------------
-connexion = pyodbc.connect(
-    fr"Driver={{Microsoft Access Driver (*.mdb, *.accdb)}};DBQ={chemin_fichier_access};"
-)
-curseur = connexion.cursor()
+def iterer_lots(resultat, taille_lot=taille_lot_fetchmany):
+    """
+    Renvoie les lignes du résultat (curseur pyodbc ou lecture mdb-export)
+    par lots de taille_lot (fetchmany), sans jamais charger l'ensemble du
+    résultat en mémoire.
+    """
+    while True:
+        lot = resultat.fetchmany(taille_lot)
+        if not lot:
+            break
+        yield lot
 
 # --------------------------------------------------------------------
-# Récupération de toutes les tables utilisateur
+# Fonctions d'exportation vers un fichier CSV ou colonnaire
 # --------------------------------------------------------------------
-tables = curseur.tables(tableType='TABLE')
-noms_tables = [table.table_name for table in tables]
+def exporter_resultat_vers_csv(resultat, chemin_csv, taille_lot=taille_lot_fetchmany):
+    """
+    Écrit le résultat d'une lecture dans chemin_csv.
+    Les lignes sont lues par lots de taille_lot et écrites au fil de l'eau :
+    la mémoire consommée reste constante quelle que soit la taille du résultat.
+    Renvoie les statistiques de l'export (lignes, nulls / min / max par
+    colonne) ; les erreurs sont propagées à l'appelant.
+    """
+    colonnes = [col[0] for col in resultat.description]
+    stats = StatistiquesColonnes.depuis_description(resultat.description)
 
-print(f"Nombre total de tables détectées : {len(noms_tables)}")
+    # Écriture dans le CSV avec BOM pour l'encodage UTF-8
+    with open(chemin_csv, "w", newline="", encoding="utf-8-sig") as f_csv:
+        writer = csv.writer(f_csv)
+        writer.writerow(colonnes)
+        for lot in iterer_lots(resultat, taille_lot):
+            writer.writerows(lot)
+            stats.ajouter_lot(lot)
 
-# --------------------------------------------------------------------
-# Fonction d'exportation d'une table vers un fichier CSV
-# --------------------------------------------------------------------
-def exporter_table_vers_csv(nom_table):
+    return stats
+
+def exporter_resultat_vers_colonnaire(resultat, chemin, taille_lot=taille_lot_fetchmany,
+                                      format_colonnaire="parquet"):
     """
-    Exporte la table Access nom_table dans un fichier CSV dans dossier_sortie_csv.
+    Écrit le résultat d'une lecture dans un fichier Parquet ou Arrow IPC
+    typé d'après resultat.description (entiers, décimaux, dates conservent
+    leur type). Chaque lot fetchmany devient un RecordBatch, sur lequel les
+    statistiques de colonnes sont calculées. Renvoie ces statistiques.
     """
-    chemin_csv = dossier_sortie_csv / f"{nom_table}.csv"
+    schema = schema_arrow(resultat.description)
+    stats = StatistiquesColonnes.depuis_description(resultat.description)
+
+    with EcrivainColonnaire(chemin, schema, format_colonnaire) as ecrivain:
+        for lot in iterer_lots(resultat, taille_lot):
+            stats.ajouter_batch(ecrivain.ecrire_lot(lot))
+
+    return stats
 
+def exporter_lecture(lecteur, nom_table, chemin, taille_lot=taille_lot_fetchmany,
+                     clause=None, parametres=(), format_fichier=None, colonnes=None):
+    """
+    Lit nom_table (éventuellement filtrée par clause, limitée à colonnes)
+    avec le lecteur et l'exporte dans chemin au format d'extraction
+    configuré. Le fichier est écrit sous un nom temporaire et ne prend son
+    nom qu'une fois complet. Renvoie les statistiques de l'export
+    (StatistiquesColonnes).
+    """
+    format_fichier = format_fichier or format_sortie
+    resultat = lecteur.executer(nom_table, clause, parametres, taille_lot, colonnes)
     try:
-        # Exécuter la requête pour récupérer toutes les lignes
-        curseur.execute(f"SELECT * FROM [{nom_table}]")
-        colonnes = [col[0] for col in curseur.description]
-        donnees = curseur.fetchall()
+        with ecriture_atomique(chemin) as temporaire:
+            if format_fichier == "csv":
+                return exporter_resultat_vers_csv(resultat, temporaire, taille_lot)
+            return exporter_resultat_vers_colonnaire(resultat, temporaire, taille_lot, format_fichier)
+    finally:
+        resultat.close()
+
+def exporter_table(lecteur, nom_table, taille_lot=taille_lot_fetchmany, colonnes=None,
+                   filtre=None):
+    """
+    Exporte la table Access nom_table dans dossier_sortie_csv
+    (<nom_table>.csv, .parquet ou .arrow), limitée à colonnes et aux lignes
+    de filtre (FiltrePrefixe) s'ils sont donnés. Renvoie les statistiques de
+    l'export.
+    """
+    chemin = dossier_sortie_csv / f"{nom_table}{extension_sortie}"
+    clause, parametres = filtre.clause_sql() if filtre else (None, ())
+    return exporter_lecture(lecteur, nom_table, chemin, taille_lot, clause, parametres,
+                            colonnes=colonnes)
 
-        # Écriture dans le CSV avec BOM pour l'encodage UTF-8
-        with open(chemin_csv, "w", newline="", encoding="utf-8-sig") as f_csv:
-            writer = csv.writer(f_csv)
-            writer.writerow(colonnes)
-            writer.writerows(donnees)
+def dossier_parties_en_cours(nom_table):
+    """Dossier des parties d'une table découpée en plages, tant qu'elle n'est pas finalisée."""
+    return dossier_sortie_csv / f"{nom_table}{SUFFIXE_TEMPORAIRE}"
 
-        print(f"Exporté : {nom_table} ({len(donnees)} lignes)")
-    except Exception as e:
-        print(f"Erreur lors de l’exportation de la table {nom_table} : {e}")
+def exporter_plage(lecteur, nom_table, plage, taille_lot=taille_lot_fetchmany, colonnes=None,
+                   filtre=None):
+    """
+    Exporte une plage de clé de nom_table dans le fichier de partie
+    dossier_sortie_csv/<nom_table>.tmp/part-NNNN.<ext> (voir finaliser_table).
+    Renvoie les statistiques de la plage.
+    """
+    clause, parametres = plage.clause_where()
+    if filtre:
+        clause_filtre, parametres_filtre = filtre.clause_sql()
+        clause = f"{clause} AND {clause_filtre}"
+        parametres = parametres + parametres_filtre
+    chemin = dossier_parties_en_cours(nom_table) / plage.nom_fichier(extension_sortie)
+    return exporter_lecture(lecteur, nom_table, chemin, taille_lot, clause, parametres,
+                            colonnes=colonnes)
+
+def exporter_delta(lecteur, nom_table, colonne, filigrane,
+                   taille_lot=taille_lot_fetchmany, colonnes=None):
+    """
+    Exporte les lignes de nom_table dont la colonne de suivi atteint ou
+    dépasse le filigrane dans un nouveau fichier delta : les lignes déjà
+    exportées qui sont relues sont dédoublonnées par cbMarq à la lecture.
+    Un delta vide n'est pas conservé.
+    Le filtre de lignes de l'instantané n'est pas appliqué : une ligne qui
+    en sort doit remplacer son ancienne version (le staging la filtre).
+    Renvoie les statistiques du delta.
+    """
+    chemin = nouveau_chemin_delta(dossier_sortie_csv, nom_table, extension_sortie)
+    stats = exporter_lecture(
+        lecteur, nom_table, chemin, taille_lot, f"[{colonne}] >= ?", [filigrane],
+        colonnes=colonnes
+    )
+    if stats.lignes == 0:
+        chemin.unlink()
+    return stats
 
 # --------------------------------------------------------------------
-# Exportation de toutes les tables détectées
+# Moteur d'extraction parallèle
 # --------------------------------------------------------------------
-for table in noms_tables:
-    exporter_table_vers_csv(table)
+@dataclass
+class UniteExtraction:
+    """
+    Unité de travail confiée à un worker : une table entière, une plage
+    de clé d'une grande table, ou les lignes postérieures à un filigrane.
+    """
+    nom_table: str
+    estimation: int
+    plage: object = None
+    colonne_filigrane: str = None
+    filigrane: object = None
+    colonnes: list = None
+    filtre: object = None
+
+    @property
+    def est_delta(self):
+        return self.filigrane is not None
+
+    @property
+    def cle(self):
+        """Identifiant de l'unité dans les points de reprise."""
+        if self.est_delta:
+            return CLE_UNITE_DELTA
+        if self.plage is not None:
+            return cle_unite_plage(self.plage)
+        return CLE_UNITE_TABLE
+
+def _exporter_avec_pool(pool, unite, taille_lot):
+    """
+    Tâche exécutée par un worker : emprunte un lecteur et exporte l'unité.
+    """
+    debut = time.perf_counter()
+    with pool.connexion() as lecteur:
+        if unite.est_delta:
+            stats = exporter_delta(
+                lecteur, unite.nom_table, unite.colonne_filigrane,
+                unite.filigrane, taille_lot, unite.colonnes
+            )
+        elif unite.plage is None:
+            stats = exporter_table(lecteur, unite.nom_table, taille_lot,
+                                   unite.colonnes, unite.filtre)
+        else:
+            stats = exporter_plage(lecteur, unite.nom_table, unite.plage, taille_lot,
+                                   unite.colonnes, unite.filtre)
+    return stats, time.perf_counter() - debut
+
+
+def ordonner_tables(pool, noms_tables):
+    """
+    Renvoie les tables triées de la plus volumineuse à la plus petite,
+    afin que les longues extractions démarrent en premier.
+    Les tables dont le comptage échoue sont placées en fin de liste.
+    """
+    tailles = {}
+    with pool.connexion() as lecteur:
+        for nom_table in noms_tables:
+            try:
+                tailles[nom_table] = lecteur.compter_lignes(nom_table)
+            except Exception:
+                tailles[nom_table] = -1
+    return sorted(noms_tables, key=lambda t: tailles[t], reverse=True), tailles
+
+def planifier_table(lecteur, nom_table, taille, etat=None, seuil=seuil_partition,
+                    nb_parts=nb_partitions):
+    """
+    Décide comment extraire une table et renvoie son PlanTable.
+
+    - Si etat (EtatIncremental) est fourni et que la table possède un
+      filigrane et un instantané, seul un delta est planifié.
+    - Sinon, une table au-delà du seuil et disposant d'une clé entière est
+      découpée en plages ; les autres sont exportées en un fichier. Les
+      sorties laissées par une extraction précédente (autre forme, deltas)
+      restent en place jusqu'à ce que la table soit exportée sans erreur
+      (voir finaliser_table).
+
+    Un lecteur sans filtres (mdbtools) n'autorise ni delta ni plages.
+
+    Avec PROJECTION_COLONNES=1, seules les colonnes dont les étapes
+    suivantes ont besoin sont exportées (plus la clé de partition et la
+    colonne de suivi), et le filtre de lignes de la table est ajouté à la
+    clause WHERE si le lecteur le permet. Un delta n'est planifié que si
+    l'instantané a été exporté avec les mêmes colonnes et le même filtre.
+    Un instantané d'un autre format que EXTRACTION_FORMAT est réexporté en
+    entier, ses deltas ne pouvant pas lui être ajoutés.
+    """
+    colonnes = lecteur.lire_colonnes(nom_table)
+    colonne = choisir_colonne_filigrane(colonnes)
+    cle = trouver_cle_partition(colonnes)
+
+    projection, filtre = None, None
+    if projection_active and besoin_table(nom_table) is not None:
+        projection = colonnes_projetees(nom_table, colonnes, [colonne, cle, COLONNE_IDENTIFIANT])
+        filtre = filtre_table(nom_table) if lecteur.supporte_filtres else None
+
+    filigrane = None
+    if colonne is not None and lecteur.supporte_filtres:
+        filigrane = (colonne, lecteur.lire_filigrane(nom_table, colonne))
+        ancien = etat.filigrane(nom_table, colonne, filtre) if etat is not None else None
+        instantane = fichiers_instantane(dossier_sortie_csv, nom_table)
+        if (ancien is not None and instantane
+                and all(f.suffix.lower() == extension_sortie for f in instantane)
+                and [c["nom"] for c in lire_schema_brut(instantane[0])] == (projection or colonnes)):
+            return PlanTable(delta=(colonne, ancien), filigrane=filigrane,
+                             colonnes=projection, filtre=filtre)
+
+    plages = []
+    if lecteur.supporte_filtres and nb_parts > 1 and taille > seuil and cle is not None:
+        plages = lecteur.calculer_plages(nom_table, cle, nb_parts)
+
+    if len(plages) > 1:
+        dossier_parties = dossier_parties_en_cours(nom_table)
+        if dossier_parties.is_dir():
+            shutil.rmtree(dossier_parties)
+        dossier_parties.mkdir()
+        print(f"{nom_table} : {taille} lignes, découpée en "
+              f"{len(plages)} plages de {plages[0].cle}")
+        return PlanTable(plages=plages, filigrane=filigrane, colonnes=projection, filtre=filtre)
+    return PlanTable(filigrane=filigrane, colonnes=projection, filtre=filtre)
+
+def finaliser_table(nom_table, plan):
+    """
+    Remplace la sortie précédente d'une table exportée sans erreur par la
+    nouvelle : les parties d'une table découpée en plages, écrites dans
+    <nom_table>.tmp/, prennent la place de l'ancien instantané (ou y sont
+    assemblées), et les anciens deltas et instantanés d'une autre forme sont
+    supprimés. Tant qu'une plage est en erreur, l'instantané précédent reste
+    lisible. Sans effet pour un delta ou une table déjà finalisée.
+    """
+    if plan.delta is not None:
+        return
+    dossier_parties = dossier_parties_en_cours(nom_table)
+    if plan.plages and not dossier_parties.is_dir():
+        return
+    fichier = dossier_sortie_csv / f"{nom_table}{extension_sortie}"
+    conserve = fichier if not plan.plages or assembler_partitions else None
+    supprimer_deltas(dossier_sortie_csv, nom_table)
+    supprimer_instantane(dossier_sortie_csv, nom_table, sauf=conserve)
+    if not plan.plages:
+        return
+    if assembler_partitions:
+        assembler_parties(dossier_parties, fichier)
+    else:
+        dossier_parties.rename(dossier_sortie_csv / nom_table)
+
+def unites_du_plan(nom_table, plan, taille):
+    """Unités d'extraction correspondant au plan d'une table."""
+    if plan.delta is not None:
+        colonne, ancien = plan.delta
+        return [UniteExtraction(nom_table, taille, colonne_filigrane=colonne, filigrane=ancien,
+                                colonnes=plan.colonnes)]
+    if plan.plages:
+        return [UniteExtraction(nom_table, taille // len(plan.plages), plage=plage,
+                                colonnes=plan.colonnes, filtre=plan.filtre)
+                for plage in plan.plages]
+    return [UniteExtraction(nom_table, taille, colonnes=plan.colonnes, filtre=plan.filtre)]
+
+def planifier_unites(pool, noms_tables, tailles, etat=None, seuil=seuil_partition,
+                     nb_parts=nb_partitions, reprise=None):
+    """
+    Découpe le travail en unités d'extraction, triées de la plus grande à
+    la plus petite (voir planifier_table).
+
+    Si reprise (RepriseExtraction) est fourni, le plan de chaque table y est
+    enregistré avant tout export ; une table déjà planifiée par une
+    extraction interrompue garde son plan, ses sorties ne sont pas
+    supprimées et seules ses unités non terminées sont renvoyées.
+
+    Renvoie (unites, plans) où plans donne le PlanTable de chaque table.
+    """
+    unites = []
+    plans = {}
+    with pool.connexion() as lecteur:
+        for nom_table in noms_tables:
+            plan = reprise.plan(nom_table) if reprise is not None else None
+            terminees = {}
+            if plan is None:
+                plan = planifier_table(lecteur, nom_table, tailles[nom_table], etat, seuil, nb_parts)
+                if reprise is not None:
+                    reprise.planifier(nom_table, plan)
+            else:
+                terminees = reprise.unites_terminees(nom_table)
+            plans[nom_table] = plan
+            unites.extend(
+                u for u in unites_du_plan(nom_table, plan, tailles[nom_table])
+                if u.cle not in terminees
+            )
+    return sorted(unites, key=lambda u: u.estimation, reverse=True), plans
+
+def _nouvelle_entree_resume(plan, lignes_source):
+    entree = {
+        "statut": "ok", "mode": plan.mode, "lignes": 0, "lignes_source": lignes_source,
+        "duree_s": 0.0, "erreur": None
+    }
+    if plan.plages:
+        entree["partitions"] = 0
+    return entree
+
+def _cumuler(entree, statistiques, nom_table, stats, duree):
+    """Ajoute une unité réussie au résumé et aux statistiques de sa table."""
+    if entree["statut"] != "ok":
+        return
+    entree["lignes"] += stats.lignes
+    entree["duree_s"] = round(entree["duree_s"] + duree, 3)
+    if "partitions" in entree:
+        entree["partitions"] += 1
+    if nom_table in statistiques:
+        statistiques[nom_table].fusionner(stats)
+    else:
+        statistiques[nom_table] = stats
+
+def extraire_tables_en_parallele(pool, noms_tables, nb_workers=nb_workers,
+                                 taille_lot=taille_lot_fetchmany, etat=None, reprise=None):
+    """
+    Exporte les tables indiquées avec nb_workers tâches simultanées,
+    les plus grandes en premier (les grandes tables étant découpées en plages).
+    En mode incrémental (etat fourni), seules les lignes postérieures au
+    filigrane de chaque table sont exportées. Avec reprise (RepriseExtraction),
+    chaque unité terminée est enregistrée, et celles d'une extraction
+    interrompue ne sont pas ré-exportées. Renvoie (resume, filigranes, statistiques) :
+    resume = {nom_table: {"statut", "mode", "lignes", "lignes_source", "duree_s",
+    "erreur"[, "partitions"]}}, lignes_source étant le comptage avant export ;
+    filigranes = {nom_table: (colonne, valeur, filtre)} relevés avant l'export,
+    avec le filtre de lignes de l'instantané ;
+    statistiques = {nom_table: StatistiquesColonnes} pour les tables exportées.
+    """
+    noms_tries, tailles = ordonner_tables(pool, noms_tables)
+    unites, plans = planifier_unites(pool, noms_tries, tailles, etat, reprise=reprise)
+    filigranes = {t: (*p.filigrane, p.filtre) for t, p in plans.items() if p.filigrane is not None}
+    resume = {
+        nom_table: _nouvelle_entree_resume(plan, tailles.get(nom_table))
+        for nom_table, plan in plans.items()
+    }
+    statistiques = {}
+
+    # Unités terminées lors d'une extraction interrompue
+    if reprise is not None:
+        for nom_table in plans:
+            for unite in reprise.unites_terminees(nom_table).values():
+                _cumuler(resume[nom_table], statistiques, nom_table,
+                         reprise.statistiques(unite), unite["duree_s"])
+
+    with ThreadPoolExecutor(max_workers=nb_workers) as executeur:
+        futures = {
+            executeur.submit(_exporter_avec_pool, pool, unite, taille_lot): unite
+            for unite in unites
+        }
+        for future in as_completed(futures):
+            unite = futures[future]
+            nom_table = unite.nom_table
+            entree = resume[nom_table]
+            try:
+                stats, duree = future.result()
+                if reprise is not None:
+                    reprise.terminer_unite(nom_table, unite.cle, stats, duree)
+                _cumuler(entree, statistiques, nom_table, stats, duree)
+            except Exception as e:
+                statistiques.pop(nom_table, None)
+                entree.update({
+                    "statut": "erreur", "lignes": None,
+                    "duree_s": None, "erreur": str(e)
+                })
+                print(f"Erreur lors de l’exportation de la table {nom_table} : {e}")
+
+    for nom_table, entree in resume.items():
+        if entree["statut"] != "ok":
+            continue
+        finaliser_table(nom_table, plans[nom_table])
+        if entree["mode"] == "delta":
+            print(f"Exporté : {nom_table} ({entree['lignes']} ligne(s) nouvelle(s) ou modifiée(s))")
+        else:
+            print(f"Exporté : {nom_table} ({entree['lignes']} lignes)")
+
+    return resume, filigranes, statistiques
+
+def ecrire_resume(resume, chemin=chemin_resume_extraction):
+    """Écrit le résumé de l'extraction au format JSON."""
+    ecrire_json_atomique(chemin, resume)
 
 # --------------------------------------------------------------------
-# Fermeture de la connexion Access
+# Exportation de toutes les tables détectées
 # --------------------------------------------------------------------
-curseur.close()
-connexion.close()
+def main():
+    if format_sortie != "csv":
+        verifier_pyarrow(USAGE_PYARROW)
+    debut = time.perf_counter()
+    # Fichiers partiels d'une extraction interrompue : jamais pris pour des sorties
+    if supprimer_fichiers_temporaires(dossier_sortie_csv):
+        print("Fichiers temporaires d'une extraction interrompue supprimés.")
+    reprise = RepriseExtraction(chemin_reprise_extraction, {
+        "fichier_access": str(chemin_fichier_access),
+        "format": format_sortie,
+        "incrementale": extraction_incrementale,
+        "projection": projection_active,
+    })
+    if reprise.en_reprise:
+        print(f"Reprise de l'extraction interrompue démarrée le {reprise.demarree_le}")
+
+    with pool_lecteurs(chemin_fichier_access, nb_workers, lecteur_access) as pool:
+        with pool.connexion() as lecteur:
+            noms_tables = lecteur.lister_tables()
+
+        print(f"Nombre total de tables détectées : {len(noms_tables)}")
+        # Les filigranes sont toujours tenus à jour, afin qu'une extraction
+        # incrémentale puisse prendre le relais d'un export complet
+        etat = EtatIncremental(chemin_etat_incremental)
+        resume, filigranes, statistiques = extraire_tables_en_parallele(
+            pool, noms_tables, etat=etat if extraction_incrementale else None,
+            reprise=reprise
+        )
+
+    for nom_table, entree in resume.items():
+        if entree["statut"] != "ok":
+            continue
+        if nom_table in filigranes:
+            etat.mettre_a_jour(nom_table, *filigranes[nom_table])
+        else:
+            # Export sans filigrane relevé : un ancien filigrane ne vaut plus
+            etat.oublier(nom_table)
+    etat.sauver()
+    ecrire_resume(resume)
+    ecrire_manifeste(dossier_sortie_csv, resume, statistiques, nb_workers)
+    nb_erreurs = sum(1 for r in resume.values() if r["statut"] != "ok")
+    print(f"\nExtraction complète terminée en {time.perf_counter() - debut:.1f} s "
+          f"({len(resume) - nb_erreurs} table(s) exportée(s), {nb_erreurs} erreur(s)).")
+    print(f"Résumé écrit dans : {chemin_resume_extraction}")
+    print(f"Manifeste écrit dans : {dossier_sortie_csv / NOM_MANIFESTE}")
+    if nb_erreurs:
+        print(f"Relancer l'extraction pour reprendre les tables en erreur "
+              f"(points de reprise : {chemin_reprise_extraction})")
+        sys.exit(1)
+    reprise.supprimer()
 
-print("\nExtraction complète terminée.")
+if __name__ == "__main__":
+    main()
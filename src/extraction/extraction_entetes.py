@@ -1,14 +1,15 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import csv
 from pathlib import Path
 import os
 
 # --------------------------------------------------------------------
 # Importation des chemins absolus depuis chemins.py
 # --------------------------------------------------------------------
-from outils.chemins import dossier_datalake_raw_sage, dossier_datalake_staging_sage, racine_projet
+from src.outils.chemins import dossier_datalake_raw_sage, dossier_datalake_staging_sage, racine_projet
+from src.outils.fichiers_bruts import dossiers_bases, lister_tables_par_base
+from src.outils.manifeste import lire_manifeste, lire_schema_brut
 
 # --------------------------------------------------------------------
 # Définition des dossiers source et sortie en chemins absolus
@@ -22,26 +23,31 @@ dossier_sortie_txt = racine_projet / "extraits" / "entetes_csv"
 dossier_sortie_txt.mkdir(parents=True, exist_ok=True)
 
 # --------------------------------------------------------------------
-# Parcourir tous les fichiers CSV du dossier source
+# Parcourir toutes les tables brutes du dossier source
+# Les en-têtes viennent du manifeste de l'extraction ; à défaut, de la
+# première ligne du fichier (pour une table par plages, la première partie).
+# Après une extraction multi-bases, la première base contenant la table fait foi
 # --------------------------------------------------------------------
-for fichier in os.listdir(dossier_source_csv):
-    if fichier.lower().endswith(".csv"):
-        chemin_csv = dossier_source_csv / fichier
-        nom_table = Path(fichier).stem
-        chemin_txt = dossier_sortie_txt / f"{nom_table}_entetes.txt"
+manifestes = {
+    nom_base: lire_manifeste(dossier_base).get("tables", {})
+    for nom_base, dossier_base in dossiers_bases(dossier_source_csv).items()
+}
 
-        try:
-            # Lecture de la première ligne pour obtenir les en-têtes
-            with open(chemin_csv, "r", encoding="utf-8-sig") as f:
-                lecteur = csv.reader(f)
-                entetes = next(lecteur)  # Première ligne : en-têtes
+for nom_table, chemins_par_base in lister_tables_par_base(dossier_source_csv).items():
+    chemin_txt = dossier_sortie_txt / f"{nom_table}_entetes.txt"
+    nom_base, chemins = next(iter(chemins_par_base.items()))
 
-            # Écriture des en-têtes dans le fichier .txt
-            with open(chemin_txt, "w", encoding="utf-8") as f_txt:
-                for colonne in entetes:
-                    f_txt.write(colonne + "\n")
+    try:
+        colonnes = (manifestes[nom_base].get(nom_table, {}).get("colonnes")
+                    or lire_schema_brut(chemins[0]))
+        entetes = [colonne["nom"] for colonne in colonnes]
 
-            print(f"En-têtes extraites : {nom_table} ({len(entetes)} colonnes)")
+        # Écriture des en-têtes dans le fichier .txt
+        with open(chemin_txt, "w", encoding="utf-8") as f_txt:
+            for colonne in entetes:
+                f_txt.write(colonne + "\n")
 
-        except Exception as e:
-            print(f"Erreur pour {nom_table} : {e}")
+        print(f"En-têtes extraites : {nom_table} ({len(entetes)} colonnes)")
+
+    except Exception as e:
+        print(f"Erreur pour {nom_table} : {e}")
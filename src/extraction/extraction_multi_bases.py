@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Extraction de plusieurs bases Access (sociétés, exercices) en une seule passe.
+
+Chaque fichier .accdb du dossier db_sage_access est extrait par son propre
+processus (python -m src.extraction.extraction_complete_access), avec
+ACCESS_FILE pointant sur la base et EXTRACTION_DOSSIER_SORTIE sur son
+sous-dossier data_lake/raw/sage/base=<nom du fichier>/. Chaque base garde
+ainsi ses fichiers bruts, son état incrémental et son manifeste ; le staging
+réunit ensuite les tables de même nom avec une colonne SOURCE_BASE.
+
+La sortie de chaque processus est écrite dans base=<nom>/_extraction.log, et
+le résultat de chaque base dans data_lake/raw/sage/_resume_bases.json.
+"""
+
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from src.outils.chemins import racine_projet, dossier_db_access, dossier_datalake_raw_sage
+from src.outils.ecriture_atomique import ecrire_json_atomique
+from src.outils.fichiers_bruts import PREFIXE_BASE
+
+# Nombre de bases extraites simultanément ; chaque extraction ouvre en plus
+# EXTRACTION_NB_WORKERS connexions sur sa propre base
+nb_bases_paralleles = int(os.environ.get("EXTRACTION_NB_BASES", "2"))
+
+# Dossier contenant les bases à extraire
+dossier_bases = Path(os.environ.get("EXTRACTION_DOSSIER_BASES", dossier_db_access))
+
+chemin_resume_bases = dossier_datalake_raw_sage / "_resume_bases.json"
+NOM_JOURNAL = "_extraction.log"
+
+
+def lister_bases(dossier: Path = dossier_bases) -> list:
+    """Renvoie les fichiers .accdb du dossier, triés par nom."""
+    return sorted(dossier.glob("*.accdb"))
+
+
+def dossier_base(chemin_base: Path) -> Path:
+    """Sous-dossier brut d'une base : data_lake/raw/sage/base=<nom>."""
+    return dossier_datalake_raw_sage / f"{PREFIXE_BASE}{chemin_base.stem}"
+
+
+def extraire_base(chemin_base: Path) -> dict:
+    """
+    Extrait une base dans son sous-dossier, par un processus dédié dont la
+    sortie est écrite dans le journal de la base. Renvoie son résultat.
+    """
+    dossier = dossier_base(chemin_base)
+    dossier.mkdir(parents=True, exist_ok=True)
+    env = dict(os.environ,
+               ACCESS_FILE=str(chemin_base.resolve()),
+               EXTRACTION_DOSSIER_SORTIE=str(dossier))
+    debut = time.perf_counter()
+    with open(dossier / NOM_JOURNAL, "w", encoding="utf-8") as journal:
+        processus = subprocess.run(
+            [sys.executable, "-m", "src.extraction.extraction_complete_access"],
+            cwd=racine_projet, env=env, stdout=journal, stderr=subprocess.STDOUT,
+        )
+    return {
+        "fichier": str(chemin_base),
+        "dossier": str(dossier),
+        "statut": "ok" if processus.returncode == 0 else "erreur",
+        "code_retour": processus.returncode,
+        "duree_s": round(time.perf_counter() - debut, 3),
+    }
+
+
+def extraire_bases_en_parallele(bases: list, nb_paralleles: int = nb_bases_paralleles) -> dict:
+    """Extrait les bases en parallèle et renvoie {nom_base: résultat}."""
+    resume = {}
+    with ThreadPoolExecutor(max_workers=max(1, nb_paralleles)) as executeur:
+        futures = {executeur.submit(extraire_base, base): base for base in bases}
+        for future in as_completed(futures):
+            base = futures[future]
+            resume[base.stem] = entree = future.result()
+            if entree["statut"] == "ok":
+                print(f"Base extraite : {base.name} ({entree['duree_s']:.1f} s)")
+            else:
+                print(f"Erreur sur la base {base.name} (code {entree['code_retour']}), "
+                      f"voir {Path(entree['dossier']) / NOM_JOURNAL}")
+    return dict(sorted(resume.items()))
+
+
+def main():
+    bases = lister_bases()
+    if not bases:
+        print(f"Aucun .accdb dans {dossier_bases}.")
+        sys.exit(1)
+
+    print(f"Nombre de bases Access détectées : {len(bases)}")
+    debut = time.perf_counter()
+    resume = extraire_bases_en_parallele(bases)
+    dossier_datalake_raw_sage.mkdir(parents=True, exist_ok=True)
+    ecrire_json_atomique(chemin_resume_bases, resume)
+
+    nb_erreurs = sum(1 for r in resume.values() if r["statut"] != "ok")
+    print(f"\nExtraction multi-bases terminée en {time.perf_counter() - debut:.1f} s "
+          f"({len(resume) - nb_erreurs} base(s) extraite(s), {nb_erreurs} erreur(s)).")
+    print(f"Résumé écrit dans : {chemin_resume_bases}")
+    if nb_erreurs:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Extraction incrémentale par filigrane (watermark).
+
+Pour chaque table, on conserve dans un fichier d'état la valeur maximale
+d'une colonne de suivi Sage lors de la dernière extraction :
+
+- cbModification : date de dernière modification (lignes nouvelles ET modifiées) ;
+- cbMarq : compteur interne croissant (lignes nouvelles uniquement).
+
+À l'exécution suivante, seules les lignes dont la colonne atteint ou dépasse ce
+filigrane sont lues et écrites dans un fichier delta à côté de l'instantané brut
+(une ligne modifiée au même instant que le filigrane n'est pas perdue ; les
+lignes relues sont dédoublonnées par cbMarq à la lecture) :
+
+    data_lake/raw/sage/F_DOCLIGNE.csv                      (instantané complet)
+    data_lake/raw/sage/F_DOCLIGNE.deltas/delta-<horodatage>.csv
+
+Seules les tables ayant une colonne cbMarq, qui identifie les lignes à
+remplacer, sont extraites par deltas ; les autres sont toujours exportées en
+entier. Les suppressions faites dans Sage ne sont pas détectées : un export complet
+(sans mode incrémental) remet l'instantané à plat.
+
+Un instantané exporté avec un filtre de lignes (PROJECTION_COLONNES=1, voir
+src.outils.besoins_colonnes) garde ce filtre dans l'état : il n'est complété
+par des deltas que tant que le filtre reste le même.
+"""
+
+import json
+import shutil
+from datetime import datetime
+
+from src.outils.ecriture_atomique import ecrire_json_atomique
+from src.outils.fichiers_bruts import COLONNE_IDENTIFIANT, PREFIXE_DELTA, SUFFIXE_DOSSIER_DELTAS
+
+# --------------------------------------------------------------------
+# Colonnes de suivi, par ordre de préférence
+# --------------------------------------------------------------------
+colonnes_filigrane = ["cbModification", "cbMarq"]
+
+
+def choisir_colonne_filigrane(colonnes):
+    """
+    Renvoie le nom exact de la première colonne de suivi présente dans la
+    table (comparaison insensible à la casse), ou None si la table n'en a pas
+    ou n'a pas de colonne cbMarq (ses deltas ne pourraient pas remplacer les
+    lignes de l'instantané).
+    """
+    par_nom = {c.lower(): c for c in colonnes}
+    if COLONNE_IDENTIFIANT.lower() not in par_nom:
+        return None
+    for candidate in colonnes_filigrane:
+        if candidate.lower() in par_nom:
+            return par_nom[candidate.lower()]
+    return None
+
+
+def lire_filigrane(curseur, nom_table, colonne):
+    """Renvoie MAX(colonne) pour la table, ou None si la table est vide."""
+    curseur.execute(f"SELECT MAX([{colonne}]) FROM [{nom_table}]")
+    return curseur.fetchone()[0]
+
+
+def serialiser_filigrane(valeur):
+    """Représentation JSON du filigrane, ou None si son type n'est pas exploitable."""
+    if isinstance(valeur, datetime):
+        return {"type": "datetime", "valeur": valeur.isoformat()}
+    if isinstance(valeur, int) and not isinstance(valeur, bool):
+        return {"type": "int", "valeur": valeur}
+    return None
+
+
+def deserialiser_filigrane(entree):
+    if entree["type"] == "datetime":
+        return datetime.fromisoformat(entree["valeur"])
+    return int(entree["valeur"])
+
+
+def dossier_deltas(dossier_sortie, nom_table):
+    """Dossier des fichiers delta d'une table."""
+    return dossier_sortie / f"{nom_table}{SUFFIXE_DOSSIER_DELTAS}"
+
+
+def nouveau_chemin_delta(dossier_sortie, nom_table, extension=".csv"):
+    """Chemin du fichier delta de l'extraction en cours (horodaté)."""
+    horodatage = datetime.now().strftime("%Y%m%dT%H%M%S")
+    dossier = dossier_deltas(dossier_sortie, nom_table)
+    dossier.mkdir(exist_ok=True)
+    chemin = dossier / f"{PREFIXE_DELTA}{horodatage}{extension}"
+    numero = 1
+    while chemin.exists():
+        chemin = dossier / f"{PREFIXE_DELTA}{horodatage}-{numero}{extension}"
+        numero += 1
+    return chemin
+
+
+def supprimer_deltas(dossier_sortie, nom_table):
+    """Supprime les deltas d'une table, devenus inutiles après un export complet."""
+    dossier = dossier_deltas(dossier_sortie, nom_table)
+    if dossier.is_dir():
+        shutil.rmtree(dossier)
+
+
+# --------------------------------------------------------------------
+# Fichier d'état des filigranes
+# --------------------------------------------------------------------
+class EtatIncremental:
+    """
+    Filigranes par table, persistés dans un fichier JSON :
+    {nom_table: {"colonne": ..., "type": "int"|"datetime", "valeur": ...,
+                 "filtre": ..., "mis_a_jour": ...}}
+    "filtre" décrit le filtre de lignes de l'instantané (None sans filtre).
+    """
+
+    def __init__(self, chemin):
+        self.chemin = chemin
+        self.tables = {}
+        if chemin.exists():
+            with open(chemin, "r", encoding="utf-8") as f:
+                self.tables = json.load(f)
+
+    def filigrane(self, nom_table, colonne, filtre=None):
+        """
+        Renvoie la valeur du filigrane de la table pour cette colonne et ce
+        filtre de lignes, ou None si aucun filigrane exploitable n'est
+        enregistré.
+        """
+        entree = self.tables.get(nom_table)
+        if not entree or entree.get("colonne") != colonne:
+            return None
+        if entree.get("filtre") != (filtre.description() if filtre else None):
+            return None
+        return deserialiser_filigrane(entree)
+
+    def mettre_a_jour(self, nom_table, colonne, valeur, filtre=None):
+        """
+        Enregistre un nouveau filigrane (et le filtre de lignes de
+        l'instantané). Une valeur absente ou d'un type inexploitable efface
+        le filigrane : la table sera exportée en entier.
+        """
+        serialise = serialiser_filigrane(valeur)
+        if serialise is None:
+            self.oublier(nom_table)
+            return
+        entree = {"colonne": colonne, **serialise}
+        if filtre is not None:
+            entree["filtre"] = filtre.description()
+        entree["mis_a_jour"] = datetime.now().isoformat(timespec="seconds")
+        self.tables[nom_table] = entree
+
+    def oublier(self, nom_table):
+        self.tables.pop(nom_table, None)
+
+    def sauver(self):
+        ecrire_json_atomique(self.chemin, self.tables)
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Lecteurs de base Access interchangeables pour l'extraction.
+
+Le moteur d'extraction ne dialogue qu'avec un lecteur : il liste les tables,
+compte leurs lignes, lit leurs colonnes et ouvre des résultats qui exposent,
+comme un curseur pyodbc, description et fetchmany. Deux lecteurs existent :
+
+- odbc     : pyodbc et le pilote Microsoft Access (Windows). Il accepte les
+             filtres SQL, donc le découpage en plages et les deltas.
+- mdbtools : les outils mdb-tables / mdb-schema / mdb-export / mdb-count
+             (paquet mdbtools, Linux, sans pilote ODBC). La lecture se fait
+             en flux depuis mdb-export ; sans clause WHERE, chaque table est
+             exportée en entier, sans plages ni deltas.
+
+Les deux lecteurs peuvent ne lire qu'une partie des colonnes (colonnes de
+executer) : SELECT [a], [b] pour odbc, colonnes écartées à la lecture du flux
+de mdb-export pour mdbtools.
+
+Les valeurs sont converties vers les mêmes types Python que pyodbc, de sorte
+que les fichiers bruts (CSV, Parquet, Arrow) sont identiques d'un lecteur à
+l'autre.
+"""
+
+import csv
+import datetime
+import decimal
+import io
+import re
+import subprocess
+import tempfile
+from abc import ABC, abstractmethod
+
+from src.extraction.connexion_access import ERREURS_ODBC, PoolConnexions, ouvrir_connexion
+from src.extraction.incremental import lire_filigrane
+from src.extraction.partitionnement import calculer_plages, lire_colonnes
+
+
+class LecteurAccess(ABC):
+    """
+    Interface commune des lecteurs. supporte_filtres indique si executer()
+    accepte une clause WHERE (plages de clé, deltas incrémentaux) ; un
+    lecteur qui ne l'accepte pas refuse ces opérations (ValueError).
+    """
+
+    supporte_filtres = False
+    # Erreurs après lesquelles le lecteur n'est plus réutilisé par le pool
+    erreurs_connexion = ()
+
+    def _verifier_filtres(self, operation):
+        """Lève ValueError si le lecteur ne peut pas filtrer les lignes pour operation."""
+        if not self.supporte_filtres:
+            raise ValueError(
+                f"Le lecteur {type(self).__name__} ne filtre pas les lignes (pas de clause WHERE) : "
+                f"{operation} impossible ; utiliser EXTRACTION_LECTEUR=odbc"
+            )
+
+    @abstractmethod
+    def lister_tables(self):
+        """Noms des tables de la base."""
+
+    @abstractmethod
+    def compter_lignes(self, nom_table):
+        """Nombre de lignes de la table."""
+
+    @abstractmethod
+    def lire_colonnes(self, nom_table):
+        """Noms des colonnes de la table, dans leur ordre."""
+
+    @abstractmethod
+    def lire_filigrane(self, nom_table, colonne):
+        """Valeur maximale de la colonne de suivi (extraction incrémentale)."""
+
+    @abstractmethod
+    def calculer_plages(self, nom_table, cle, nb_parts):
+        """Plages de la clé découpant la table en nb_parts parties."""
+
+    @abstractmethod
+    def executer(self, nom_table, clause=None, parametres=(), taille_lot=10000, colonnes=None):
+        """
+        Lance la lecture de la table (filtrée par clause si le lecteur le
+        permet, limitée aux colonnes demandées s'il y en a) et renvoie un
+        résultat exposant description, fetchmany et close ; l'appelant le
+        ferme une fois lu.
+        """
+
+    def close(self):
+        pass
+
+
+# --------------------------------------------------------------------
+# Lecteur pyodbc (pilote Microsoft Access)
+# --------------------------------------------------------------------
+class LecteurODBC(LecteurAccess):
+    """Lecteur SQL sur une connexion pyodbc ; un curseur par lecture."""
+
+    supporte_filtres = True
+    erreurs_connexion = ERREURS_ODBC
+
+    def __init__(self, chemin_fichier_access):
+        self.connexion = ouvrir_connexion(chemin_fichier_access)
+        self.curseur = self.connexion.cursor()
+
+    def lister_tables(self):
+        return [table.table_name for table in self.curseur.tables(tableType='TABLE')]
+
+    def compter_lignes(self, nom_table):
+        self.curseur.execute(f"SELECT COUNT(*) FROM [{nom_table}]")
+        return self.curseur.fetchone()[0]
+
+    def lire_colonnes(self, nom_table):
+        return lire_colonnes(self.curseur, nom_table)
+
+    def lire_filigrane(self, nom_table, colonne):
+        return lire_filigrane(self.curseur, nom_table, colonne)
+
+    def calculer_plages(self, nom_table, cle, nb_parts):
+        return calculer_plages(self.curseur, nom_table, cle, nb_parts)
+
+    def executer(self, nom_table, clause=None, parametres=(), taille_lot=10000, colonnes=None):
+        selection = ", ".join(f"[{c}]" for c in colonnes) if colonnes else "*"
+        requete = f"SELECT {selection} FROM [{nom_table}]"
+        if clause:
+            requete += f" WHERE {clause}"
+        curseur = self.connexion.cursor()
+        curseur.arraysize = taille_lot
+        curseur.execute(requete, list(parametres))
+        return curseur
+
+    def close(self):
+        try:
+            self.curseur.close()
+        finally:
+            self.connexion.close()
+
+
+# --------------------------------------------------------------------
+# Lecteur mdbtools (Linux, sans pilote ODBC)
+# --------------------------------------------------------------------
+FORMAT_DATE_MDB = "%Y-%m-%d"
+FORMAT_DATE_HEURE_MDB = "%Y-%m-%d %H:%M:%S"
+
+# Ligne de colonne dans la sortie « access » de mdb-schema :
+#     [AR_Ref]            Text (18),
+motif_colonne_schema = re.compile(r"^\s*\[(?P<nom>[^\]]+)\]\s+(?P<type>[^,]+?)\s*,?\s*$")
+motif_precision = re.compile(r"\((\d+)\s*,\s*(\d+)\)")
+
+
+def _booleen(texte):
+    return texte.strip().lower() in ("1", "-1", "true")
+
+
+def _date_heure(texte):
+    return datetime.datetime.fromisoformat(texte)
+
+
+def type_python_access(type_access):
+    """
+    Renvoie (type Python, précision, échelle) pour un type de colonne Access
+    tel qu'affiché par mdb-schema, comme pyodbc le ferait dans description.
+    """
+    type_access = type_access.lower()
+    if type_access.startswith("boolean"):
+        return bool, None, None
+    if type_access.startswith(("byte", "integer", "long integer")):
+        return int, None, None
+    if type_access.startswith(("single", "double")):
+        return float, None, None
+    if type_access.startswith("currency"):
+        return decimal.Decimal, 19, 4
+    if type_access.startswith(("numeric", "decimal")):
+        precision = motif_precision.search(type_access)
+        if precision:
+            return decimal.Decimal, int(precision.group(1)), int(precision.group(2))
+        return decimal.Decimal, None, None
+    if type_access.startswith("datetime"):
+        return datetime.datetime, None, None
+    if type_access.startswith(("ole", "binary")):
+        return bytes, None, None
+    return str, None, None
+
+
+# Conversion du texte produit par mdb-export vers le type Python de la colonne
+convertisseurs_mdb = {
+    bool: _booleen,
+    int: int,
+    float: float,
+    decimal.Decimal: decimal.Decimal,
+    datetime.datetime: _date_heure,
+    bytes: bytes.fromhex,
+    str: str,
+}
+
+
+class ResultatMdbExport:
+    """
+    Résultat d'un mdb-export lu en flux : description au format pyodbc et
+    fetchmany renvoyant des lignes typées. Un champ vide est lu comme NULL.
+    Avec indices, seuls les champs à ces positions sont gardés.
+
+    Les messages de mdb-export sont écrits dans un fichier temporaire plutôt
+    que dans un tube : un tube plein (avertissements nombreux) bloquerait
+    mdb-export, et donc la lecture de sa sortie.
+    """
+
+    def __init__(self, commande, description, indices=None):
+        self.description = description
+        self._indices = indices
+        self._convertisseurs = [convertisseurs_mdb[col[1]] for col in description]
+        self._erreurs = tempfile.TemporaryFile()
+        self._processus = subprocess.Popen(
+            commande, stdout=subprocess.PIPE, stderr=self._erreurs
+        )
+        flux = io.TextIOWrapper(self._processus.stdout, encoding="utf-8",
+                                errors="replace", newline="")
+        self._lecteur = csv.reader(flux)
+        next(self._lecteur, None)  # ligne d'en-tête
+
+    def _convertir(self, ligne):
+        if self._indices is not None:
+            ligne = [ligne[i] for i in self._indices]
+        return tuple(
+            conv(valeur) if valeur != "" else None
+            for conv, valeur in zip(self._convertisseurs, ligne)
+        )
+
+    def fetchmany(self, taille):
+        lot = []
+        for ligne in self._lecteur:
+            lot.append(self._convertir(ligne))
+            if len(lot) >= taille:
+                return lot
+        self._terminer()
+        return lot
+
+    def _terminer(self):
+        if self._processus.poll() is None:
+            self._processus.wait()
+        if self._processus.returncode not in (0, None):
+            self._erreurs.seek(0)
+            message = self._erreurs.read().decode("utf-8", errors="replace")
+            raise RuntimeError(f"mdb-export a échoué ({self._processus.returncode}) : {message.strip()}")
+
+    def close(self):
+        if self._processus.poll() is None:
+            self._processus.kill()
+            self._processus.wait()
+        self._processus.stdout.close()
+        self._erreurs.close()
+
+
+class LecteurMdbTools(LecteurAccess):
+    """
+    Lecteur s'appuyant sur les commandes mdbtools (version 1.0 ou ultérieure).
+    Chaque lecture lance son propre processus : le lecteur est sans état et
+    plusieurs lecteurs peuvent lire le même fichier en parallèle.
+    """
+
+    def __init__(self, chemin_fichier_access):
+        self.chemin_fichier_access = str(chemin_fichier_access)
+        self._descriptions = {}
+
+    def _lancer(self, *arguments):
+        resultat = subprocess.run(
+            list(arguments), capture_output=True, check=True,
+            encoding="utf-8", errors="replace"
+        )
+        return resultat.stdout
+
+    def lister_tables(self):
+        sortie = self._lancer("mdb-tables", "-1", self.chemin_fichier_access)
+        return [ligne.strip() for ligne in sortie.splitlines() if ligne.strip()]
+
+    def compter_lignes(self, nom_table):
+        return int(self._lancer("mdb-count", self.chemin_fichier_access, nom_table).strip())
+
+    def description(self, nom_table):
+        """Description au format pyodbc, déduite de mdb-schema."""
+        if nom_table not in self._descriptions:
+            sortie = self._lancer(
+                "mdb-schema", "--no-relations", "-T", nom_table,
+                self.chemin_fichier_access, "access"
+            )
+            description = []
+            for ligne in sortie.splitlines():
+                correspondance = motif_colonne_schema.match(ligne)
+                if correspondance is None:
+                    continue
+                type_code, precision, echelle = type_python_access(correspondance["type"])
+                description.append((correspondance["nom"], type_code, None, None,
+                                    precision, echelle, True))
+            self._descriptions[nom_table] = description
+        return self._descriptions[nom_table]
+
+    def lire_colonnes(self, nom_table):
+        return [col[0] for col in self.description(nom_table)]
+
+    def lire_filigrane(self, nom_table, colonne):
+        self._verifier_filtres("extraction incrémentale")
+
+    def calculer_plages(self, nom_table, cle, nb_parts):
+        self._verifier_filtres("découpage en plages de clé")
+
+    def executer(self, nom_table, clause=None, parametres=(), taille_lot=10000, colonnes=None):
+        if clause:
+            self._verifier_filtres(f"lecture filtrée ({clause})")
+        commande = [
+            "mdb-export", "-D", FORMAT_DATE_MDB, "-T", FORMAT_DATE_HEURE_MDB,
+            "-b", "hex", self.chemin_fichier_access, nom_table
+        ]
+        description = self.description(nom_table)
+        if not colonnes:
+            return ResultatMdbExport(commande, description)
+        # mdb-export sort toujours toutes les colonnes : les autres sont
+        # écartées ligne à ligne, avant toute conversion
+        positions = {col[0]: i for i, col in enumerate(description)}
+        indices = [positions[c] for c in colonnes]
+        return ResultatMdbExport(commande, [description[i] for i in indices], indices)
+
+
+# --------------------------------------------------------------------
+# Choix du lecteur
+# --------------------------------------------------------------------
+LECTEURS = {"odbc": LecteurODBC, "mdbtools": LecteurMdbTools}
+
+
+def classe_lecteur(type_lecteur):
+    try:
+        return LECTEURS[type_lecteur]
+    except KeyError:
+        raise ValueError(
+            f"Lecteur Access inconnu : {type_lecteur} ({', '.join(LECTEURS)})"
+        ) from None
+
+
+def pool_lecteurs(chemin_fichier_access, taille_max=4, type_lecteur="odbc"):
+    """Pool borné de lecteurs du type demandé sur le fichier Access."""
+    classe = classe_lecteur(type_lecteur)
+    return PoolConnexions(chemin_fichier_access, taille_max,
+                          fabrique=classe, erreurs_fatales=classe.erreurs_connexion)
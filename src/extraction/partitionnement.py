@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Découpage des grandes tables Access en plages de clé.
+
+Une table dont le nombre de lignes dépasse le seuil configuré est lue en
+plusieurs requêtes SELECT ... WHERE cle >= ? AND cle < ?, exécutées en
+parallèle. Chaque plage est écrite dans un fichier numéroté :
+
+    data_lake/raw/sage/F_DOCLIGNE/part-0000.csv
+    data_lake/raw/sage/F_DOCLIGNE/part-0001.csv
+    ...
+
+ou, si demandé, les parties sont ensuite assemblées en un seul F_DOCLIGNE.csv.
+Les parties prennent l'extension du format d'extraction (.csv, .parquet, .arrow).
+"""
+
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+
+from src.outils.ecriture_atomique import ecriture_atomique
+from src.outils.fichiers_bruts import PREFIXE_PARTIE
+
+# --------------------------------------------------------------------
+# Colonnes candidates pour le découpage, par ordre de préférence.
+# cbMarq est le compteur interne présent dans toutes les tables Sage ;
+# DL_NO sert de repli pour F_DOCLIGNE.
+# --------------------------------------------------------------------
+colonnes_cle_partition = ["cbMarq", "DL_NO"]
+
+
+@dataclass
+class Plage:
+    """Intervalle [borne_inf, borne_sup[ de la clé de partition (borne_sup incluse pour la dernière)."""
+    numero: int
+    cle: str
+    borne_inf: int
+    borne_sup: int
+    derniere: bool = False
+
+    def clause_where(self):
+        """
+        Renvoie la clause WHERE et ses paramètres. La première plage récupère
+        aussi les lignes dont la clé est nulle, pour n'en perdre aucune.
+        """
+        operateur_sup = "<=" if self.derniere else "<"
+        clause = f"([{self.cle}] >= ? AND [{self.cle}] {operateur_sup} ?)"
+        if self.numero == 0:
+            clause = f"({clause} OR [{self.cle}] IS NULL)"
+        return clause, [self.borne_inf, self.borne_sup]
+
+    def nom_fichier(self, extension=".csv"):
+        return f"{PREFIXE_PARTIE}{self.numero:04d}{extension}"
+
+
+def lire_colonnes(curseur, nom_table):
+    """Renvoie les noms de colonnes de la table sans lire de ligne."""
+    curseur.execute(f"SELECT * FROM [{nom_table}] WHERE 1 = 0")
+    colonnes = [col[0] for col in curseur.description]
+    curseur.fetchall()
+    return colonnes
+
+
+def trouver_cle_partition(colonnes):
+    """
+    Renvoie le nom exact de la première colonne candidate présente
+    (comparaison insensible à la casse), ou None.
+    """
+    par_nom = {c.lower(): c for c in colonnes}
+    for candidate in colonnes_cle_partition:
+        if candidate.lower() in par_nom:
+            return par_nom[candidate.lower()]
+    return None
+
+
+def calculer_plages(curseur, nom_table, cle, nb_partitions):
+    """
+    Découpe [MIN(cle), MAX(cle)] en nb_partitions intervalles de même largeur.
+    Renvoie une liste vide si la clé n'est pas un entier exploitable.
+    """
+    curseur.execute(f"SELECT MIN([{cle}]), MAX([{cle}]) FROM [{nom_table}]")
+    minimum, maximum = curseur.fetchone()
+    if not isinstance(minimum, int) or not isinstance(maximum, int):
+        return []
+
+    nb_partitions = max(1, min(nb_partitions, maximum - minimum + 1))
+    largeur = -(-(maximum - minimum + 1) // nb_partitions)  # division arrondie au supérieur
+    plages = []
+    borne = minimum
+    for numero in range(nb_partitions):
+        borne_sup = min(borne + largeur, maximum)
+        derniere = borne_sup >= maximum
+        plages.append(Plage(numero, cle, borne, borne_sup, derniere))
+        if derniere:
+            break
+        borne = borne_sup
+    return plages
+
+
+def assembler_parties(dossier_parties, chemin_sortie):
+    """
+    Concatène les parties (dans l'ordre des numéros) en un seul fichier du
+    même format, puis supprime le dossier des parties. Pour le CSV, seule la
+    ligne d'en-tête de la première partie est conservée. Le fichier assemblé
+    n'apparaît sous son nom qu'une fois complet.
+    """
+    extension = Path(chemin_sortie).suffix
+    parties = sorted(dossier_parties.glob(f"{PREFIXE_PARTIE}*{extension}"))
+    with ecriture_atomique(chemin_sortie) as temporaire:
+        if extension != ".csv":
+            from src.extraction.export_arrow import assembler_fichiers_colonnaires
+            assembler_fichiers_colonnaires(parties, temporaire, extension.lstrip("."))
+        else:
+            with open(temporaire, "w", newline="", encoding="utf-8-sig") as f_sortie:
+                for i, partie in enumerate(parties):
+                    with open(partie, "r", newline="", encoding="utf-8-sig") as f_partie:
+                        entete = f_partie.readline()
+                        if i == 0:
+                            f_sortie.write(entete)
+                        shutil.copyfileobj(f_partie, f_sortie)
+    shutil.rmtree(dossier_parties)
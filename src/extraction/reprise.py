@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Points de reprise de l'extraction.
+
+Pendant une extraction, data_lake/raw/sage/_reprise_extraction.json retient :
+
+- le plan de chaque table, décidé avant d'écrire quoi que ce soit : export
+  complet, plages de clé ou delta, et le filigrane relevé ;
+- chaque unité terminée (table entière, plage ou delta), avec ses lignes et
+  ses statistiques de colonnes, enregistrée dès que son fichier est renommé
+  sous son nom définitif (voir src.outils.ecriture_atomique).
+
+Si l'extraction s'interrompt (connexion ODBC perdue, erreurs sur certaines
+tables), la relance reprend les mêmes plans et n'exporte que les unités
+manquantes. Le fichier est supprimé à la fin d'une extraction sans erreur,
+et ignoré s'il a été produit avec d'autres paramètres (base, format, mode).
+"""
+
+import json
+from dataclasses import asdict
+from datetime import datetime
+
+from src.extraction.incremental import deserialiser_filigrane, serialiser_filigrane
+from src.extraction.partitionnement import Plage
+from src.outils.besoins_colonnes import FiltrePrefixe
+from src.outils.ecriture_atomique import ecrire_json_atomique
+from src.outils.statistiques_colonnes import StatistiquesColonnes
+
+CLE_UNITE_TABLE = "table"
+CLE_UNITE_DELTA = "delta"
+
+
+def cle_unite_plage(plage):
+    return f"plage-{plage.numero:04d}"
+
+
+def _filigrane_vers_json(filigrane):
+    if filigrane is None:
+        return None
+    colonne, valeur = filigrane
+    return {"colonne": colonne, "valeur": serialiser_filigrane(valeur)}
+
+
+def _filigrane_depuis_json(entree):
+    if entree is None:
+        return None
+    valeur = entree["valeur"]
+    return entree["colonne"], deserialiser_filigrane(valeur) if valeur is not None else None
+
+
+class PlanTable:
+    """
+    Plan d'extraction d'une table : plages de clé (export partitionné), ou
+    delta depuis un filigrane, ou à défaut un export complet en un fichier.
+    filigrane est le couple (colonne, valeur) relevé avant l'export, à
+    enregistrer comme nouveau filigrane si l'extraction réussit.
+    colonnes limite les colonnes exportées (None : toutes) ; filtre
+    (FiltrePrefixe) est le filtre de lignes de l'instantané, appliqué par
+    les exports complets ou par plages mais jamais par un delta.
+    """
+
+    def __init__(self, plages=None, delta=None, filigrane=None, colonnes=None, filtre=None):
+        self.plages = plages or []
+        self.delta = delta
+        self.filigrane = filigrane
+        self.colonnes = colonnes
+        self.filtre = filtre
+
+    @property
+    def mode(self):
+        return "delta" if self.delta is not None else "complet"
+
+    def vers_json(self):
+        return {
+            "plages": [asdict(p) for p in self.plages],
+            "delta": _filigrane_vers_json(self.delta),
+            "filigrane": _filigrane_vers_json(self.filigrane),
+            "colonnes": self.colonnes,
+            "filtre": asdict(self.filtre) if self.filtre else None,
+        }
+
+    @classmethod
+    def depuis_json(cls, entree):
+        return cls(
+            plages=[Plage(**p) for p in entree["plages"]],
+            delta=_filigrane_depuis_json(entree["delta"]),
+            filigrane=_filigrane_depuis_json(entree["filigrane"]),
+            colonnes=entree.get("colonnes"),
+            filtre=FiltrePrefixe(**entree["filtre"]) if entree.get("filtre") else None,
+        )
+
+
+class RepriseExtraction:
+    """
+    Plans et unités terminées de l'extraction en cours, persistés après
+    chaque changement par écriture atomique :
+    {"parametres": {...}, "demarree_le": ...,
+     "tables": {nom_table: {"plan": {...}, "unites": {cle: {"lignes", "duree_s", "colonnes"}}}}}
+    """
+
+    def __init__(self, chemin, parametres):
+        self.chemin = chemin
+        self.parametres = parametres
+        self.tables = {}
+        self.demarree_le = datetime.now().isoformat(timespec="seconds")
+        if chemin.exists():
+            with open(chemin, "r", encoding="utf-8") as f:
+                contenu = json.load(f)
+            if contenu.get("parametres") == parametres:
+                self.tables = contenu.get("tables", {})
+                self.demarree_le = contenu.get("demarree_le", self.demarree_le)
+
+    @property
+    def en_reprise(self):
+        """Vrai si une extraction interrompue avec les mêmes paramètres est reprise."""
+        return bool(self.tables)
+
+    def plan(self, nom_table):
+        """Plan enregistré pour la table (PlanTable), ou None."""
+        entree = self.tables.get(nom_table)
+        return PlanTable.depuis_json(entree["plan"]) if entree else None
+
+    def planifier(self, nom_table, plan):
+        """Enregistre le plan d'une table, avant tout export."""
+        self.tables[nom_table] = {"plan": plan.vers_json(), "unites": {}}
+        self.sauver()
+
+    def unites_terminees(self, nom_table):
+        """Renvoie {cle_unite: {"lignes", "duree_s", "colonnes"}} pour la table."""
+        return self.tables.get(nom_table, {}).get("unites", {})
+
+    def terminer_unite(self, nom_table, cle, stats, duree):
+        """Enregistre une unité dont le fichier est écrit sous son nom définitif."""
+        self.tables[nom_table]["unites"][cle] = {
+            "lignes": stats.lignes, "duree_s": round(duree, 3), "colonnes": stats.vers_liste()
+        }
+        self.sauver()
+
+    @staticmethod
+    def statistiques(unite):
+        """StatistiquesColonnes d'une unité terminée."""
+        return StatistiquesColonnes.depuis_liste(unite["colonnes"], unite["lignes"])
+
+    def sauver(self):
+        ecrire_json_atomique(self.chemin, {
+            "parametres": self.parametres,
+            "demarree_le": self.demarree_le,
+            "tables": self.tables,
+        })
+
+    def supprimer(self):
+        """Fin d'une extraction sans erreur : plus rien à reprendre."""
+        if self.chemin.exists():
+            self.chemin.unlink()
@@ -128,16 +128,27 @@ def etl_complete():
 def extraction():
     print("=== Extraction ===")
     install_requirements(chemin_requirements_extraction)
-    accdb = check_access_file()
-    os.environ["ACCESS_FILE"] = str(accdb.resolve())
-    run_module("src.extraction.extraction_complete_access")
+    bases = sorted(dossier_db_access.glob("*.accdb"))
+    if len(bases) > 1:
+        # Plusieurs sociétés / exercices : une extraction par base, en parallèle,
+        # chacune dans data_lake/raw/sage/base=<nom>/
+        print(f"{len(bases)} bases Access trouvées : {', '.join(b.name for b in bases)}")
+        run_module("src.extraction.extraction_multi_bases")
+    else:
+        accdb = check_access_file()
+        os.environ["ACCESS_FILE"] = str(accdb.resolve())
+        run_module("src.extraction.extraction_complete_access")
     run_module("src.extraction.extraction_entetes")
 
 def transformation():
     print("=== Transformation ===")
     run_module("src.staging.nettoyage_fichiers_bruts_sage")
-    run_module("src.chargement.vers_csv")
-    run_module("src.transformation.structuration_etoile")
+    if os.environ.get("TRANSFORMATION_FUSIONNEE", "1") == "1":
+        # Tables générales passées en mémoire au modèle en étoile
+        run_module("src.transformation.pipeline_fusionne")
+    else:
+        run_module("src.chargement.vers_csv")
+        run_module("src.transformation.structuration_etoile")
 
 def chargement():
     print("=== Chargement en Supabase/PostgreSQL ===")
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Types de lecture des CSV, déduits des métadonnées SQLAlchemy de
+src/models/tables.py.
+
+Chaque colonne déclarée donne son type pandas :
+- Integer → Int64 (entier acceptant les valeurs manquantes) ;
+- Numeric → float64 ;
+- TIMESTAMP / DateTime / Date → colonne de dates (parse_dates) ;
+- VarCharOrText et autres textes → str, sans déduction de type par pandas.
+
+lire_csv_type lit alors un fichier en une seule passe, chaque colonne
+directement dans son type : plus de lecture en texte suivie de
+pd.to_numeric / pd.to_datetime. Les colonnes absentes du modèle gardent le
+comportement par défaut (texte si texte_par_defaut, sinon déduction).
+
+Les tables de staging (F_<TABLE>_staging.csv) prennent le schéma de la
+table du modèle de même nom ; les tables générales (tabla_generale_*.csv)
+celui des colonnes du modèle dont elles proviennent.
+"""
+
+from dataclasses import dataclass, field
+
+import pandas as pd
+from sqlalchemy import TIMESTAMP, Date, DateTime, Integer, Numeric
+
+from src.models.tables import metadata_achats
+
+TYPES_DATES = (TIMESTAMP, DateTime, Date)
+
+
+# --------------------------------------------------------------------
+# Schéma de lecture
+# --------------------------------------------------------------------
+@dataclass
+class SchemaLecture:
+    """
+    Types pandas des colonnes d'un fichier : dtype ({colonne: type}, pour
+    read_csv) et dates (colonnes à lire comme dates).
+    """
+    dtype: dict = field(default_factory=dict)
+    dates: list = field(default_factory=list)
+
+    @property
+    def colonnes_texte(self) -> list:
+        return [c for c, t in self.dtype.items() if t is str]
+
+
+def type_pandas(type_sa):
+    """Type pandas d'un type SQLAlchemy ("datetime" pour une date)."""
+    if isinstance(type_sa, type):
+        type_sa = type_sa()
+    if isinstance(type_sa, TYPES_DATES):
+        return "datetime"
+    if isinstance(type_sa, Integer):
+        return "Int64"
+    if isinstance(type_sa, Numeric):
+        return "float64"
+    return str
+
+
+def schema_colonnes(types: dict) -> SchemaLecture:
+    """
+    Schéma de lecture de {colonne du fichier: type SQLAlchemy ou Column du
+    modèle dont la colonne provient}.
+    """
+    schema = SchemaLecture()
+    for nom, type_sa in types.items():
+        type_cible = type_pandas(getattr(type_sa, "type", type_sa))
+        if type_cible == "datetime":
+            schema.dates.append(nom)
+        else:
+            schema.dtype[nom] = type_cible
+    return schema
+
+
+def schema_table(table) -> SchemaLecture:
+    """Schéma de lecture d'une table du modèle (Table SQLAlchemy)."""
+    return schema_colonnes({colonne.name: colonne.type for colonne in table.columns})
+
+
+# --------------------------------------------------------------------
+# Schémas des fichiers du pipeline
+# --------------------------------------------------------------------
+# Tables de staging : DOCLIGNE et ARTFOURNISS dans leur version achats, qui
+# ajoute AF_REFFOURNISS aux colonnes des ventes
+schemas_staging = {
+    f"F_{nom}": schema_table(table) for nom, table in metadata_achats.tables.items()
+}
+
+_docligne = metadata_achats.tables["DOCLIGNE"].c
+
+schemas_tables_generales = {
+    "tabla_generale_ventes": schema_colonnes({
+        "N° Ligne doc": _docligne.DL_NO,
+        "Date BL": _docligne.DL_DATEBL,
+        "Qté fact": _docligne.DL_QTE,
+        "Prix Unitaire": _docligne.DL_PRIXUNITAIRE,
+        "Tot HT": _docligne.DL_MONTANTHT,
+        "Année": Integer,
+        "Mois": Integer,
+        "date facture": TIMESTAMP,
+        "Famille du client": metadata_achats.tables["FAMILLE"].c.FA_CODEFAMILLE,
+        "Code client": _docligne.CT_NUM,
+        "Raison sociale": metadata_achats.tables["COMPTET"].c.CT_INTITULE,
+        "N° BL": _docligne.DL_PIECEBL,
+        "Ref cde client": _docligne.AC_REFCLIENT,
+        "code article": _docligne.AR_REF,
+        "Code Famille": metadata_achats.tables["FAMILLE"].c.FA_CODEFAMILLE,
+        "N° Cde": _docligne.DO_PIECE,
+        "Désignation": _docligne.DL_DESIGN,
+        "famille article libellé": metadata_achats.tables["FAMILLE"].c.FA_CENTRAL,
+        "sous-famille article libellé": metadata_achats.tables["FAMILLE"].c.FA_INTITULE,
+    }),
+    # Les montants et la date viennent de F_DOCENTETE, absente du modèle :
+    # ils prennent les types des colonnes équivalentes de DOCLIGNE
+    "tabla_generale_achats": schema_colonnes({
+        "date achat": _docligne.DO_DATE,
+        "Qté fact": _docligne.DL_QTE,
+        "Total TVA": _docligne.DL_MONTANTHT.type,
+        "Total HT": _docligne.DL_MONTANTHT.type,
+        "Total TTC": _docligne.DL_MONTANTHT.type,
+        "NET A PAYER": _docligne.DL_MONTANTHT.type,
+        "Année": Integer,
+        "Mois": Integer,
+        "Reference achat": _docligne.DO_REF,
+        "Code fournisseur": metadata_achats.tables["COMPTET"].c.CT_NUMPAYEUR,
+        "Bon de commande": _docligne.DO_PIECE,
+        "code article": _docligne.AR_REF,
+        "Désignation": _docligne.DL_DESIGN,
+        "Code Famille": metadata_achats.tables["FAMILLE"].c.FA_CODEFAMILLE,
+    }),
+}
+
+
+def schema_fichier(nom: str) -> SchemaLecture:
+    """
+    Schéma d'un fichier du pipeline : table de staging (F_DOCLIGNE) ou table
+    générale (tabla_generale_ventes) ; schéma vide si le modèle l'ignore.
+    """
+    if nom in schemas_tables_generales:
+        return schemas_tables_generales[nom]
+    return schemas_staging.get(nom, SchemaLecture())
+
+
+# --------------------------------------------------------------------
+# Lecture typée
+# --------------------------------------------------------------------
+def lire_csv_type(chemin, schema: SchemaLecture, texte_par_defaut: bool = False,
+                  **kwargs) -> pd.DataFrame:
+    """
+    Lit un CSV en une passe, chaque colonne du schéma dans son type. Seules
+    les colonnes présentes dans le fichier sont typées ; les autres sont lues
+    en texte si texte_par_defaut, sinon selon la déduction de pandas.
+
+    Un fichier dont une colonne numérique contient des valeurs invalides
+    (conversion restée en échec au staging) est relu avec ces colonnes en
+    texte, converties ensuite par pd.to_numeric (valeurs invalides → NaN).
+    De même, une colonne de dates que read_csv n'a pas pu convertir d'un
+    bloc est convertie ensuite, les valeurs invalides devenant NaT.
+    """
+    kwargs.setdefault("encoding", "utf-8-sig")
+    entetes = pd.read_csv(chemin, nrows=0, **kwargs).columns
+    colonnes = {str(c).strip(): c for c in entetes}
+    dtype = {colonnes[c]: t for c, t in schema.dtype.items() if c in colonnes}
+    dates = [colonnes[c] for c in schema.dates if c in colonnes]
+    if texte_par_defaut:
+        dtype = {**{c: str for c in entetes if c not in dates}, **dtype}
+    dtype.update(kwargs.pop("dtype", None) or {})
+
+    try:
+        df = pd.read_csv(chemin, dtype=dtype, parse_dates=dates or False, **kwargs)
+    except (ValueError, TypeError):
+        numeriques = {c: t for c, t in dtype.items() if t in ("Int64", "float64")}
+        df = pd.read_csv(chemin, dtype={**dtype, **dict.fromkeys(numeriques, object)},
+                         parse_dates=dates or False, **kwargs)
+        for colonne, type_cible in numeriques.items():
+            df[colonne] = pd.to_numeric(df[colonne], errors="coerce").astype(type_cible)
+    for colonne in dates:
+        if not pd.api.types.is_datetime64_any_dtype(df[colonne]):
+            df[colonne] = pd.to_datetime(df[colonne], errors="coerce",
+                                         dayfirst=kwargs.get("dayfirst", False))
+    return df
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Registre des colonnes et des lignes dont les étapes aval ont besoin.
+
+Chaque consommateur d'une table de staging (les tables générales de
+src.chargement.vers_csv) déclare ici les colonnes qu'il lit et, le cas
+échéant, le filtre de lignes qu'il applique. Le besoin d'une table réunit
+ceux de tous ses consommateurs, les colonnes de ses règles de nettoyage
+(src.staging.regles_sage) et l'identifiant cbMarq :
+
+- vers_csv ne lit dans les tables de staging que les colonnes déclarées ;
+- avec PROJECTION_COLONNES=1, le staging ne lit plus que ces colonnes dans
+  les fichiers bruts et écarte les lignes hors filtre, et l'extraction
+  n'exporte plus que ces colonnes (SELECT [a], [b] … au lieu de SELECT *),
+  avec le filtre dans la clause WHERE quand le lecteur le permet.
+
+Une table absente du registre est toujours lue en entier. Le filtre d'une
+table n'est appliqué que si tous ses consommateurs le partagent. Les outils
+d'analyse qui lisent toutes les colonnes des tables de staging
+(analyse_qualite_donnees, comparation_tables_achats) demandent de laisser
+PROJECTION_COLONNES à 0.
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass
+
+import pandas as pd
+
+from src.outils.fichiers_bruts import COLONNE_IDENTIFIANT, COLONNE_SOURCE_BASE
+from src.staging.regles_sage import regles_tables
+
+projection_active = os.environ.get("PROJECTION_COLONNES", "0") == "1"
+
+
+# --------------------------------------------------------------------
+# Déclaration des besoins
+# --------------------------------------------------------------------
+@dataclass(frozen=True)
+class FiltrePrefixe:
+    """Lignes dont colonne commence par prefixe (sans tenir compte de la casse)."""
+    colonne: str
+    prefixe: str
+
+    def clause_sql(self) -> tuple:
+        """Clause WHERE et paramètres (le LIKE d'Access ignore la casse)."""
+        return f"[{self.colonne}] LIKE ?", [f"{self.prefixe}%"]
+
+    def masque(self, df: pd.DataFrame) -> pd.Series:
+        return df[self.colonne].astype(str).str.lower().str.startswith(self.prefixe.lower())
+
+    def description(self) -> str:
+        return f"{self.colonne} LIKE '{self.prefixe}%'"
+
+
+@dataclass
+class Besoin:
+    """Colonnes lues par un consommateur dans une table, et filtre éventuel."""
+    colonnes: tuple
+    filtre: FiltrePrefixe = None
+
+
+_article = Besoin(("AR_REF", "FA_CODEFAMILLE"))
+_famille = Besoin(("FA_CODEFAMILLE", "FA_CENTRAL", "FA_INTITULE"))
+
+besoins_consommateurs = {
+    "tabla_generale_ventes": {
+        "F_DOCLIGNE": Besoin((
+            "DL_NO", "DO_PIECE", "DL_QTE", "DL_PRIXUNITAIRE", "DL_MONTANTHT", "DO_DATE",
+            "CT_NUM", "DL_PIECEBL", "DL_DATEBL", "AC_REFCLIENT", "AR_REF", "DL_DESIGN",
+        )),
+        "F_ARTICLE": _article,
+        "F_FAMILLE": _famille,
+        "F_COMPTET": Besoin(("CT_NUM", "CT_INTITULE")),
+    },
+    "tabla_generale_achats": {
+        "F_DOCENTETE": Besoin(
+            ("DO_PIECE", "CT_NUMPAYEUR", "INT_CATCOMPTA", "DO_DATE", "DO_REF",
+             "FNT_MONTANTTOTALTAXES", "FNT_TOTALHTNET", "FNT_TOTALTTC", "FNT_NETAPAYER",
+             "INT_EXPEDIT"),
+            filtre=FiltrePrefixe("INT_CATCOMPTA", "Achats"),
+        ),
+        "F_COMPTET": Besoin((
+            "CT_NUMPAYEUR", "CT_INTITULE", "CT_CONTACT", "CT_ADRESSE", "CT_COMPLEMENT",
+            "CT_CODEPOSTAL", "CT_VILLE", "CT_TELEPHONE", "CT_TELECOPIE",
+        )),
+        # DO_DATE et DO_REF ne servent qu'à suffixer (_entete / _ligne) les
+        # colonnes de même nom lors de la jointure avec les en-têtes
+        "F_DOCLIGNE": Besoin(("AR_REF", "DO_PIECE", "DL_QTE", "DL_DESIGN", "DO_DATE", "DO_REF")),
+        "F_ARTICLE": _article,
+        "F_FAMILLE": _famille,
+    },
+}
+
+
+# --------------------------------------------------------------------
+# Besoins par table
+# --------------------------------------------------------------------
+def besoin_consommateur(consommateur: str, nom_table: str) -> Besoin:
+    """Besoin déclaré par un consommateur pour une table (KeyError si absent)."""
+    return besoins_consommateurs[consommateur][nom_table]
+
+
+def colonnes_consommateurs(nom_table: str) -> tuple:
+    """Colonnes lues dans une table par l'ensemble de ses consommateurs."""
+    colonnes = {}
+    for besoins in besoins_consommateurs.values():
+        if nom_table in besoins:
+            colonnes.update(dict.fromkeys(besoins[nom_table].colonnes))
+    return tuple(colonnes)
+
+
+def besoin_table(nom_table: str):
+    """
+    Besoin de toutes les étapes aval pour une table de staging (Besoin), ou
+    None si aucun consommateur ne la déclare (la table est lue en entier).
+    """
+    besoins = [b[nom_table] for b in besoins_consommateurs.values() if nom_table in b]
+    if not besoins:
+        return None
+    colonnes = {}
+    for besoin in besoins:
+        colonnes.update(dict.fromkeys(besoin.colonnes))
+    if nom_table in regles_tables:
+        colonnes.update(dict.fromkeys(sorted(regles_tables[nom_table].colonnes())))
+    colonnes[COLONNE_IDENTIFIANT] = None
+    filtres = {b.filtre for b in besoins}
+    return Besoin(tuple(colonnes), filtres.pop() if len(filtres) == 1 else None)
+
+
+def _colonnes_voulues(nom_table: str, supplementaires=()):
+    """Noms en minuscules des colonnes à lire, ou None sans besoin déclaré."""
+    besoin = besoin_table(nom_table)
+    if besoin is None:
+        return None
+    voulues = {c.lower() for c in besoin.colonnes + tuple(c for c in supplementaires if c)}
+    voulues.add(COLONNE_SOURCE_BASE.lower())
+    return voulues
+
+
+def colonnes_projetees(nom_table: str, disponibles, supplementaires=()) -> list:
+    """
+    Colonnes de disponibles (dans leur ordre et sous leur nom exact) à lire
+    pour nom_table : celles du besoin de la table et supplementaires, la
+    comparaison ignorant la casse et les espaces. Sans besoin déclaré, toutes
+    les colonnes sont gardées.
+    """
+    voulues = _colonnes_voulues(nom_table, supplementaires)
+    if voulues is None:
+        return list(disponibles)
+    return [c for c in disponibles if str(c).strip().lower() in voulues]
+
+
+def selection_colonnes(nom_table: str, supplementaires=()):
+    """
+    Sélection de colonnes pour pd.read_csv (usecols appelable), ou None si
+    la table est lue en entier.
+    """
+    voulues = _colonnes_voulues(nom_table, supplementaires)
+    if voulues is None:
+        return None
+    return lambda colonne: str(colonne).strip().lower() in voulues
+
+
+def filtre_table(nom_table: str):
+    """Filtre de lignes de la table (FiltrePrefixe), ou None."""
+    besoin = besoin_table(nom_table)
+    return besoin.filtre if besoin is not None else None
+
+
+def signature_besoin(nom_table: str) -> str:
+    """
+    Empreinte du besoin d'une table : un changement de déclaration (ou
+    l'activation de la projection) fait retraiter la table.
+    """
+    besoin = besoin_table(nom_table) if projection_active else None
+    contenu = None if besoin is None else {
+        "colonnes": sorted(besoin.colonnes),
+        "filtre": asdict(besoin.filtre) if besoin.filtre else None,
+    }
+    return hashlib.sha256(json.dumps(contenu, sort_keys=True).encode("utf-8")).hexdigest()
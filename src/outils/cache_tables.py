@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Cache en mémoire des tables lues dans le data lake.
+
+Une table est identifiée par son fichier et la date de modification de
+celui-ci : un fichier réécrit depuis (nouveau nettoyage) est relu, l'ancienne
+version étant écartée. Le cache est borné en octets (taille mémoire des
+DataFrames) : au-delà, les tables les moins récemment demandées sont
+libérées, et une table plus grosse que la limite n'est pas conservée.
+
+Un même fichier peut aussi donner des objets dérivés (index d'une table de
+dimension, voir src.outils.enrichissement), rangés sous une variante et
+relus, comme la table, quand le fichier change.
+
+Les tables indépendantes peuvent être préchargées sur un pool de threads
+(la lecture CSV ou Parquet libère en grande partie le GIL) ; une table
+demandée pendant son chargement est attendue au lieu d'être lue une seconde
+fois.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+
+def taille_dataframe(df: pd.DataFrame) -> int:
+    """Mémoire occupée par df, chaînes comprises, en octets."""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def taille_objet(objet) -> int:
+    """Mémoire occupée par une table en cache ou par un objet dérivé (attribut octets)."""
+    if isinstance(objet, pd.DataFrame):
+        return taille_dataframe(objet)
+    return int(getattr(objet, "octets", 0))
+
+
+class CacheTables:
+    """
+    Cache LRU de DataFrames, indexé par (chemin, date de modification,
+    variante).
+
+    obtenir(chemin, charger) renvoie la table en cache ou la charge par
+    charger() ; les appelants ne doivent pas modifier le DataFrame renvoyé,
+    partagé par tous (en extraire une copie, par exemple une sélection de
+    colonnes, avant de la transformer).
+    """
+
+    def __init__(self, limite_octets: int, nb_threads: int = 4):
+        self.limite_octets = limite_octets
+        self.nb_threads = max(1, nb_threads)
+        self.octets = 0
+        self.lectures = 0
+        self.reprises = 0
+        self._entrees = OrderedDict()  # cle -> (objet, octets)
+        self._en_cours = {}            # cle -> Future
+        self._verrou = threading.Lock()
+        self._executeur = None
+
+    @staticmethod
+    def _cle(chemin, variante) -> tuple:
+        chemin = Path(chemin)
+        return str(chemin.resolve()), chemin.stat().st_mtime_ns, variante
+
+    def obtenir(self, chemin, charger, variante=None):
+        """
+        Table de chemin (ou objet qui en est dérivé, sous variante), produite
+        par charger() si elle n'est pas déjà en cache.
+        """
+        cle = self._cle(chemin, variante)
+        with self._verrou:
+            if cle in self._entrees:
+                self._entrees.move_to_end(cle)
+                self.reprises += 1
+                return self._entrees[cle][0]
+            futur = self._en_cours.get(cle)
+            proprietaire = futur is None
+            if proprietaire:
+                futur = self._en_cours[cle] = Future()
+            else:
+                self.reprises += 1
+        if not proprietaire:
+            return futur.result()
+
+        try:
+            df = charger()
+        except BaseException as e:
+            with self._verrou:
+                del self._en_cours[cle]
+            futur.set_exception(e)
+            raise
+        with self._verrou:
+            del self._en_cours[cle]
+            self.lectures += 1
+            self._ranger(cle, df)
+        futur.set_result(df)
+        return df
+
+    def _ranger(self, cle, df) -> None:
+        """Ajoute df au cache (verrou tenu), en libérant les tables les plus anciennes."""
+        chemin, modification, _ = cle
+        # versions précédentes du fichier, et objets qui en étaient dérivés
+        for ancienne in [c for c in self._entrees if c[0] == chemin and c[1] != modification]:
+            self.octets -= self._entrees.pop(ancienne)[1]
+        octets = taille_objet(df)
+        if octets > self.limite_octets:
+            return
+        self._entrees[cle] = (df, octets)
+        self.octets += octets
+        while self.octets > self.limite_octets:
+            self.octets -= self._entrees.popitem(last=False)[1][1]
+
+    def precharger(self, demandes) -> list:
+        """
+        Lance en arrière-plan le chargement de demandes ((chemin, charger)
+        pour chaque table) ; les fichiers absents sont ignorés, les erreurs
+        de lecture ne sont levées qu'à la demande de la table par obtenir.
+        """
+        with self._verrou:
+            if self._executeur is None:
+                self._executeur = ThreadPoolExecutor(max_workers=self.nb_threads)
+        return [self._executeur.submit(self.obtenir, chemin, charger)
+                for chemin, charger in demandes if os.path.exists(chemin)]
+
+    def vider(self) -> None:
+        """Libère toutes les tables en cache."""
+        with self._verrou:
+            self._entrees.clear()
+            self.octets = 0
+
+    def fermer(self) -> None:
+        """Attend la fin des préchargements et arrête le pool de threads."""
+        with self._verrou:
+            executeur, self._executeur = self._executeur, None
+        if executeur is not None:
+            executeur.shutdown(wait=True)
@@ -37,6 +37,15 @@ dossier_datalake_staging_sage = dossier_datalake_staging / "sage"  # pour les do
 dossier_datalake_staging_proalpha = dossier_datalake_staging / "proalpha"  # pour les données intermédiaires de ProAlpha
 dossier_datalake_processed = dossier_datalake / "processed"  # pour les données traitées
 
+# 3.3.0 Empreintes des sources lors du dernier passage réussi de chaque étape
+chemin_etat_staging_sage = dossier_datalake_staging_sage / "_etat_staging.json"
+chemin_rapport_staging_sage = dossier_datalake_staging_sage / "_rapport_staging.json"
+chemin_etat_tables_generales = dossier_datalake_processed / "_etat_tables_generales.json"
+chemin_etat_modele_etoile = dossier_datalake_processed / "_etat_modele_etoile.json"
+
+# 3.3.0.1 Registre des clés de substitution des dimensions (clé naturelle → ID)
+chemin_registre_cles = dossier_datalake_processed / "_registre_cles.sqlite"
+
 # 3.3.1 Dossier contenant les fichiers des bibliothèques requises pour l'environnement virtuel python 
 dossier_requirements = racine_projet / "requirements"
 
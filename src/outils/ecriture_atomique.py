@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Écriture atomique des fichiers produits par le pipeline.
+
+Un fichier est d'abord écrit sous un nom temporaire (<nom>.tmp), puis renommé
+par os.replace une fois complet : une interruption (connexion perdue,
+processus arrêté) ne laisse jamais un fichier partiel sous son nom définitif.
+Les fichiers .tmp ne sont reconnus ni comme tables brutes ni comme états, et
+ceux laissés par une exécution interrompue sont supprimés à la suivante.
+"""
+
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+SUFFIXE_TEMPORAIRE = ".tmp"
+
+
+def chemin_temporaire(chemin) -> Path:
+    """Nom temporaire sous lequel chemin est écrit avant d'être renommé."""
+    chemin = Path(chemin)
+    return chemin.with_name(chemin.name + SUFFIXE_TEMPORAIRE)
+
+
+@contextmanager
+def ecriture_atomique(chemin):
+    """
+    Fournit le chemin temporaire à écrire ; il remplace chemin à la sortie du
+    bloc, ou est supprimé si le bloc lève une exception.
+    """
+    temporaire = chemin_temporaire(chemin)
+    try:
+        yield temporaire
+    except BaseException:
+        if temporaire.exists():
+            temporaire.unlink()
+        raise
+    os.replace(temporaire, chemin)
+
+
+def ecrire_json_atomique(chemin, donnees) -> None:
+    """Écrit donnees au format JSON dans chemin, de façon atomique."""
+    with ecriture_atomique(chemin) as temporaire:
+        with open(temporaire, "w", encoding="utf-8") as f:
+            json.dump(donnees, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def supprimer_fichiers_temporaires(dossier: Path) -> int:
+    """Supprime les fichiers temporaires laissés dans dossier ; renvoie leur nombre."""
+    fichiers = [f for f in Path(dossier).rglob(f"*{SUFFIXE_TEMPORAIRE}") if f.is_file()]
+    for fichier in fichiers:
+        fichier.unlink()
+    return len(fichiers)
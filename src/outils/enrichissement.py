@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Enrichissement d'une table par des attributs de tables de dimension.
+
+Au lieu d'une jointure (merge) par dimension, qui recopie à chaque fois
+toutes les colonnes de la table enrichie, IndexDimension construit une fois
+l'index clé → position d'une table de dimension ; enrichir() cherche les
+clés de la table en une opération vectorisée (get_indexer) et ajoute à la
+table, en place, les seules colonnes d'attributs demandées.
+
+Comme pour une jointure à gauche, une clé absente de la dimension donne des
+attributs manquants, et une clé manquante est rapprochée d'une clé manquante
+de la dimension. Une dimension dont une clé apparaît plusieurs fois garde la
+première occurrence (une jointure dupliquerait les lignes enrichies).
+"""
+
+import pandas as pd
+
+
+def _cles_table(df: pd.DataFrame, cles: list):
+    """Clés des lignes de df : Index (une colonne) ou MultiIndex (plusieurs)."""
+    if len(cles) == 1:
+        return pd.Index(df[cles[0]])
+    return pd.MultiIndex.from_arrays([df[c] for c in cles], names=cles)
+
+
+class IndexDimension:
+    """
+    Index clé → attributs d'une table de dimension.
+
+    cles : colonnes de la clé dans la dimension ; attributs : colonnes
+    pouvant être ajoutées aux tables enrichies (par défaut, toutes les
+    autres colonnes de la dimension). Comme avec une jointure, un attribut
+    absent de la dimension n'est pas ajouté.
+    """
+
+    def __init__(self, dimension: pd.DataFrame, cles, attributs=None):
+        self.cles = list(cles)
+        if attributs is None:
+            attributs = [c for c in dimension.columns if c not in self.cles]
+        attributs = [a for a in attributs if a in dimension.columns]
+        unique = dimension.drop_duplicates(subset=self.cles, keep="first")
+        self.doublons = len(dimension) - len(unique)
+        self.index = _cles_table(unique, self.cles)
+        self.valeurs = {a: unique[a].array for a in attributs}
+        self.octets = int(self.index.memory_usage(deep=True)) + sum(
+            int(pd.Series(v).memory_usage(index=False, deep=True)) for v in self.valeurs.values()
+        )
+
+    @property
+    def attributs(self) -> list:
+        return list(self.valeurs)
+
+    def positions(self, df: pd.DataFrame, cles=None):
+        """Position dans la dimension de la clé de chaque ligne de df (-1 si absente)."""
+        return self.index.get_indexer(_cles_table(df, list(cles or self.cles)))
+
+    def enrichir(self, df: pd.DataFrame, attributs=None, cles=None) -> pd.DataFrame:
+        """
+        Ajoute à df (en place) les colonnes attributs de la dimension, d'après
+        les colonnes cles de df (par défaut, celles de la clé de la
+        dimension). Renvoie df.
+        """
+        positions = self.positions(df, cles)
+        for attribut in (self.attributs if attributs is None else attributs):
+            if attribut not in self.valeurs:
+                continue
+            df[attribut] = pd.Series(
+                pd.api.extensions.take(self.valeurs[attribut], positions, allow_fill=True),
+                index=df.index,
+            )
+        return df
@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+"""
+Inventaire et lecture des fichiers bruts du data lake (data_lake/raw/sage).
+
+Une table brute est soit un fichier unique <NOM_TABLE>.csv (ou .parquet /
+.arrow pour l'extraction typée), soit un dossier <NOM_TABLE>/ contenant des
+parties numérotées part-0000.csv, part-0001.csv, … produites par l'extraction
+partitionnée. L'extraction incrémentale ajoute des fichiers delta dans
+<NOM_TABLE>.deltas/delta-<horodatage>.csv : à la lecture, ils sont appliqués
+à l'instantané (la dernière version d'une ligne, identifiée par cbMarq,
+l'emporte). Les entrées dont le nom commence par « _ » (résumés, états) ne
+sont pas des tables, pas plus que les dossiers <NOM_TABLE>.tmp/ des parties
+d'une extraction en cours.
+
+Quand plusieurs bases Access sont extraites ensemble, chacune a son propre
+sous-dossier base=<nom>/ organisé comme ci-dessus ; les tables de même nom
+sont alors lues ensemble, avec une colonne SOURCE_BASE indiquant leur base.
+
+Une table peut aussi être lue par morceaux de taille fixe (iterer_table_bases),
+avec les mêmes lignes et les mêmes types de colonnes qu'une lecture complète.
+"""
+
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+import pandas as pd
+
+from src.outils.ecriture_atomique import SUFFIXE_TEMPORAIRE
+
+PREFIXE_PARTIE = "part-"
+PREFIXE_DELTA = "delta-"
+SUFFIXE_DOSSIER_DELTAS = ".deltas"
+
+# Formats de fichiers bruts reconnus
+EXTENSIONS_BRUTES = (".csv", ".parquet", ".arrow")
+
+# Identifiant de ligne Sage servant à appliquer les deltas
+COLONNE_IDENTIFIANT = "cbMarq"
+
+# Sous-dossiers par base Access (extraction multi-bases) et colonne d'origine
+PREFIXE_BASE = "base="
+COLONNE_SOURCE_BASE = "SOURCE_BASE"
+
+
+def _fichiers_bruts(dossier: Path, prefixe: str) -> list:
+    return sorted(
+        f for f in dossier.glob(f"{prefixe}*")
+        if f.is_file() and f.suffix.lower() in EXTENSIONS_BRUTES
+    )
+
+
+def lister_tables_brutes(dossier: Path) -> dict:
+    """
+    Renvoie {nom_table: [chemins des fichiers]} pour toutes les tables
+    brutes du dossier, qu'elles soient en un seul fichier ou en parties.
+    Les deltas éventuels suivent l'instantané, du plus ancien au plus récent.
+    """
+    tables = {}
+    for chemin in sorted(dossier.iterdir()):
+        if (chemin.name.startswith(("_", PREFIXE_BASE))
+                or chemin.name.endswith((SUFFIXE_DOSSIER_DELTAS, SUFFIXE_TEMPORAIRE))):
+            continue
+        if chemin.is_file() and chemin.suffix.lower() in EXTENSIONS_BRUTES:
+            tables[chemin.stem] = [chemin]
+        elif chemin.is_dir():
+            parties = _fichiers_bruts(chemin, PREFIXE_PARTIE)
+            if parties:
+                tables[chemin.name] = parties
+
+    for nom_table, chemins in tables.items():
+        dossier_deltas = dossier / f"{nom_table}{SUFFIXE_DOSSIER_DELTAS}"
+        if dossier_deltas.is_dir():
+            chemins.extend(_fichiers_bruts(dossier_deltas, PREFIXE_DELTA))
+    return tables
+
+
+def dossiers_bases(dossier: Path) -> dict:
+    """
+    Renvoie {nom_base: dossier} pour les sous-dossiers base=<nom> d'une
+    extraction multi-bases, ou {None: dossier} pour une base unique extraite
+    à plat. Si des sous-dossiers de bases existent, les fichiers éventuellement
+    restés à plat sont ignorés.
+    """
+    bases = {
+        chemin.name[len(PREFIXE_BASE):]: chemin
+        for chemin in sorted(dossier.iterdir())
+        if chemin.is_dir() and chemin.name.startswith(PREFIXE_BASE)
+    }
+    return bases or {None: dossier}
+
+
+def lister_tables_par_base(dossier: Path) -> dict:
+    """
+    Renvoie {nom_table: {nom_base: [chemins]}} pour toutes les bases du
+    dossier (nom_base vaut None pour une base unique extraite à plat).
+    """
+    tables = {}
+    for nom_base, dossier_base in dossiers_bases(dossier).items():
+        for nom_table, chemins in lister_tables_brutes(dossier_base).items():
+            tables.setdefault(nom_table, {})[nom_base] = chemins
+    return tables
+
+
+def chemins_instantane(dossier: Path, nom_table: str) -> list:
+    """Renvoie les fichiers et dossiers de l'instantané complet d'une table, quel que soit son format."""
+    chemins = [dossier / f"{nom_table}{ext}" for ext in EXTENSIONS_BRUTES]
+    chemins.append(dossier / nom_table)
+    return [c for c in chemins if c.exists()]
+
+
+def fichiers_instantane(dossier: Path, nom_table: str) -> list:
+    """Renvoie les fichiers de l'instantané complet d'une table (fichier unique ou parties), sans ses deltas."""
+    fichiers = []
+    for chemin in chemins_instantane(dossier, nom_table):
+        fichiers.extend(_fichiers_bruts(chemin, PREFIXE_PARTIE) if chemin.is_dir() else [chemin])
+    return fichiers
+
+
+def supprimer_instantane(dossier: Path, nom_table: str, sauf: Path = None) -> None:
+    """Supprime l'instantané d'une table ré-exportée, hormis le fichier sauf."""
+    for chemin in chemins_instantane(dossier, nom_table):
+        if chemin == sauf:
+            continue
+        if chemin.is_dir():
+            shutil.rmtree(chemin)
+        else:
+            chemin.unlink()
+
+
+def _appliquer_deltas(df: pd.DataFrame) -> pd.DataFrame:
+    """Ne garde que la dernière version de chaque ligne (par cbMarq)."""
+    par_nom = {str(c).lower(): c for c in df.columns}
+    colonne = par_nom.get(COLONNE_IDENTIFIANT.lower())
+    if colonne is None:
+        return df
+    return df.drop_duplicates(subset=[colonne], keep="last").reset_index(drop=True)
+
+
+def _colonnes_lues(noms, usecols):
+    """
+    Colonnes d'un fichier colonnaire retenues par usecols (liste de noms ou,
+    comme pour pd.read_csv, fonction appelée sur chaque nom), ou None.
+    """
+    if usecols is None:
+        return None
+    if callable(usecols):
+        return [nom for nom in noms if usecols(nom)]
+    return list(usecols)
+
+
+def _lire_fichier(chemin: Path, **kwargs) -> pd.DataFrame:
+    """
+    Lit un fichier brut selon son format. Les fichiers colonnaires portent
+    leurs propres types : seule la sélection de colonnes (usecols) leur
+    est transmise.
+    """
+    suffixe = chemin.suffix.lower()
+    if suffixe == ".csv":
+        kwargs.setdefault("encoding", "utf-8-sig")
+        return pd.read_csv(chemin, **kwargs)
+    usecols = kwargs.get("usecols")
+    import pyarrow as pa
+    if suffixe == ".parquet":
+        import pyarrow.parquet as pq
+        colonnes = _colonnes_lues(pq.read_schema(str(chemin)).names, usecols)
+        return pd.read_parquet(chemin, columns=colonnes)
+    with pa.memory_map(str(chemin)) as source:
+        table = pa.ipc.open_file(source).read_all()
+    colonnes = _colonnes_lues(table.column_names, usecols)
+    if colonnes is not None:
+        table = table.select(colonnes)
+    return table.to_pandas()
+
+
+def lire_table_brute(chemins, **kwargs) -> pd.DataFrame:
+    """
+    Lit une table brute (un chemin ou la liste de ses parties et deltas)
+    en un seul DataFrame. Les arguments nommés sont transmis à pd.read_csv
+    pour les fichiers CSV.
+    """
+    if isinstance(chemins, (str, Path)):
+        chemins = [chemins]
+    chemins = [Path(c) for c in chemins]
+    morceaux = [_lire_fichier(chemin, **kwargs) for chemin in chemins]
+    if len(morceaux) == 1:
+        return morceaux[0]
+    df = pd.concat(morceaux, ignore_index=True)
+    if any(c.name.startswith(PREFIXE_DELTA) for c in chemins):
+        df = _appliquer_deltas(df)
+    return df
+
+
+def _iterer_fichier(chemin: Path, taille_morceau: int, **kwargs):
+    """Lit un fichier brut par morceaux d'au plus taille_morceau lignes."""
+    suffixe = chemin.suffix.lower()
+    if suffixe == ".csv":
+        kwargs.setdefault("encoding", "utf-8-sig")
+        with pd.read_csv(chemin, chunksize=taille_morceau, **kwargs) as lecteur:
+            yield from lecteur
+        return
+    import pyarrow as pa
+    usecols = kwargs.get("usecols")
+    if suffixe == ".parquet":
+        import pyarrow.parquet as pq
+        fichier = pq.ParquetFile(str(chemin))
+        colonnes = _colonnes_lues(fichier.schema_arrow.names, usecols)
+        for batch in fichier.iter_batches(batch_size=taille_morceau, columns=colonnes):
+            yield batch.to_pandas()
+        return
+    with pa.memory_map(str(chemin)) as source:
+        lecteur = pa.ipc.open_file(source)
+        colonnes = _colonnes_lues(lecteur.schema.names, usecols)
+        for i in range(lecteur.num_record_batches):
+            batch = lecteur.get_batch(i)
+            if colonnes is not None:
+                batch = pa.Table.from_batches([batch]).select(colonnes)
+            for debut in range(0, batch.num_rows, taille_morceau):
+                yield batch.slice(debut, taille_morceau).to_pandas()
+
+
+def _fusionner_dtype(a, b):
+    """
+    Type d'une colonne réunissant des valeurs de types a et b, comme pour une
+    lecture complète ou pd.concat : entiers et flottants donnent des
+    flottants, tout autre mélange donne object.
+    """
+    if a is None or a == b:
+        return b
+    numeriques = [
+        pd.api.types.is_numeric_dtype(t) and not pd.api.types.is_bool_dtype(t) for t in (a, b)
+    ]
+    if all(numeriques):
+        return np.dtype("float64")
+    return np.dtype("object")
+
+
+def _dtypes_fichier(chemin: Path, taille_morceau: int, **kwargs) -> dict:
+    """
+    Premier passage sur un fichier : type de chaque colonne tel qu'une
+    lecture complète du fichier l'aurait déduit ({colonne: dtype}, dans
+    l'ordre des colonnes).
+    """
+    dtypes = {}
+    for morceau in _iterer_fichier(chemin, taille_morceau, **kwargs):
+        for colonne, dtype in morceau.dtypes.items():
+            dtypes[colonne] = _fusionner_dtype(dtypes.get(colonne), dtype)
+    if not dtypes and chemin.suffix.lower() == ".csv":
+        # Fichier sans ligne : seules les colonnes de l'en-tête
+        kwargs.setdefault("encoding", "utf-8-sig")
+        dtypes = dict(pd.read_csv(chemin, nrows=0, **kwargs).dtypes)
+    return dtypes
+
+
+def _lecture_typee(chemin: Path, dtypes: dict, kwargs: dict) -> dict:
+    """
+    Arguments de lecture d'un fichier au second passage. Pour un CSV, une
+    colonne de type object est lue en texte dans tous les morceaux, comme une
+    lecture complète (sinon un morceau purement numérique deviendrait numérique).
+    """
+    if chemin.suffix.lower() != ".csv":
+        return kwargs
+    forces = {c: object for c, t in dtypes.items() if t == np.dtype("object")}
+    forces.update(kwargs.get("dtype") or {})
+    return {**kwargs, "dtype": forces}
+
+
+def _colonne_identifiant(colonnes):
+    par_nom = {str(c).lower(): c for c in colonnes}
+    return par_nom.get(COLONNE_IDENTIFIANT.lower())
+
+
+def iterer_table_bases(chemins_par_base: dict, taille_morceau: int, **kwargs):
+    """
+    Lit une table ({nom_base: chemins}, voir lister_tables_par_base) par
+    morceaux d'au plus taille_morceau lignes : seul un morceau est en mémoire
+    à la fois. Les morceaux mis bout à bout donnent les mêmes lignes, dans le
+    même ordre et avec les mêmes types que lire_table_bases.
+
+    Un premier passage relève le type de chaque colonne sur toute la table
+    (une colonne entière dans un morceau peut être flottante ailleurs) ; les
+    morceaux sont ensuite convertis vers ces types. Les deltas d'une base
+    sont lus en entier (ils sont petits) : les lignes de l'instantané qu'ils
+    remplacent (même cbMarq) sont écartées au fil de la lecture, puis les
+    deltas sont ajoutés après l'instantané. cbMarq étant unique dans un
+    instantané, le résultat est celui de _appliquer_deltas.
+    """
+    multi_bases = list(chemins_par_base) != [None]
+
+    # Premier passage : types par fichier, puis pour la table entière
+    dtypes_fichiers = {}
+    colonnes_table = {}
+    dtypes_table = {}
+    for nom_base, chemins in chemins_par_base.items():
+        colonnes_base = {}
+        for chemin in map(Path, chemins):
+            dtypes_fichiers[chemin] = _dtypes_fichier(chemin, taille_morceau, **kwargs)
+            colonnes_base.update(dict.fromkeys(dtypes_fichiers[chemin]))
+        if multi_bases:
+            colonnes_base[COLONNE_SOURCE_BASE] = None
+        colonnes_table.update(colonnes_base)
+    colonnes_table = list(colonnes_table)
+    for dtypes in dtypes_fichiers.values():
+        for colonne in colonnes_table:
+            # Colonne absente d'un fichier : valeurs manquantes (flottantes)
+            dtypes_table[colonne] = _fusionner_dtype(
+                dtypes_table.get(colonne), dtypes.get(colonne, np.dtype("float64"))
+            )
+    if multi_bases:
+        dtypes_table[COLONNE_SOURCE_BASE] = np.dtype("object")
+
+    def convertir(morceau, dtypes):
+        for colonne, dtype in dtypes.items():
+            if (colonne in morceau.columns and morceau[colonne].dtype != dtype
+                    and dtype in (np.dtype("float64"), np.dtype("object"))):
+                morceau[colonne] = morceau[colonne].astype(dtype)
+        return morceau
+
+    def harmoniser(morceau, nom_base, dtypes_fichier):
+        # Types du fichier entier, puis de la table entière (comme pd.concat)
+        morceau = convertir(morceau, dtypes_fichier)
+        if multi_bases:
+            morceau = morceau.assign(**{COLONNE_SOURCE_BASE: nom_base})
+        return convertir(morceau.reindex(columns=colonnes_table), dtypes_table)
+
+    # Second passage : instantané par morceaux, puis deltas de chaque base
+    for nom_base, chemins in chemins_par_base.items():
+        chemins = [Path(c) for c in chemins]
+        instantane = [c for c in chemins if not c.name.startswith(PREFIXE_DELTA)]
+        deltas = [c for c in chemins if c.name.startswith(PREFIXE_DELTA)]
+        df_deltas, remplaces, identifiant = None, None, None
+        if deltas:
+            df_deltas = pd.concat(
+                [_lire_fichier(c, **_lecture_typee(c, dtypes_fichiers[c], kwargs)) for c in deltas],
+                ignore_index=True,
+            )
+            identifiant = _colonne_identifiant(df_deltas.columns)
+            if identifiant is not None:
+                df_deltas = _appliquer_deltas(df_deltas)
+                remplaces = df_deltas[identifiant]
+
+        for chemin in instantane:
+            lecture = _lecture_typee(chemin, dtypes_fichiers[chemin], kwargs)
+            for morceau in _iterer_fichier(chemin, taille_morceau, **lecture):
+                if remplaces is not None and identifiant in morceau.columns:
+                    morceau = morceau[~morceau[identifiant].isin(remplaces)]
+                yield harmoniser(morceau, nom_base, dtypes_fichiers[chemin])
+        if df_deltas is not None:
+            for debut in range(0, len(df_deltas), taille_morceau):
+                yield harmoniser(df_deltas.iloc[debut:debut + taille_morceau], nom_base, {})
+
+
+def lire_table_bases(chemins_par_base: dict, **kwargs) -> pd.DataFrame:
+    """
+    Lit une table présente dans une ou plusieurs bases ({nom_base: chemins},
+    voir lister_tables_par_base). Chaque base est lue séparément (les deltas
+    s'appliquent base par base, cbMarq n'étant unique que dans sa base), puis
+    les lignes sont réunies avec la colonne SOURCE_BASE. Une base unique
+    extraite à plat (nom_base None) est lue telle quelle.
+    """
+    if list(chemins_par_base) == [None]:
+        return lire_table_brute(chemins_par_base[None], **kwargs)
+    morceaux = [
+        lire_table_brute(chemins, **kwargs).assign(**{COLONNE_SOURCE_BASE: nom_base})
+        for nom_base, chemins in chemins_par_base.items()
+    ]
+    return pd.concat(morceaux, ignore_index=True)
@@ -1,11 +1,13 @@
+import csv
 import os
-import pandas as pd
 
 # === Dossiers ===
 from src.outils.chemins import (
     dossier_tables_statistiques,
     dossier_datalake_raw_sage
 ) 
+from src.outils.fichiers_bruts import dossiers_bases, lister_tables_brutes, lire_table_brute
+from src.outils.manifeste import cle_source, lire_manifeste
 
 # Création du dossier pour les statistiques
 os.makedirs(dossier_tables_statistiques, exist_ok=True)
@@ -16,17 +18,28 @@ tables_non_vides = []
 tables_plus_de_10 = []
 tables_plus_de_100 = []
 
-# Analyse brute sans nettoyage
-fichiers = [f for f in os.listdir(dossier_datalake_raw_sage) if f.endswith(".csv")]
-print(f"{len(fichiers)} fichier(s) détecté(s) dans le dossier : {dossier_datalake_raw_sage}\n")
-
-for fichier in fichiers:
-    nom_table = os.path.splitext(fichier)[0]
-    chemin_csv = os.path.join(dossier_datalake_raw_sage, fichier)
+# Analyse brute sans nettoyage : les nombres de lignes et les statistiques
+# de colonnes viennent du manifeste de l'extraction ; une table absente du
+# manifeste (ou en erreur lors de l'extraction) est relue en entier. Après
+# une extraction multi-bases, chaque table est nommée base=<nom>/<table>
+tables = {}
+manifeste = {}
+for nom_base, dossier_base in dossiers_bases(dossier_datalake_raw_sage).items():
+    for nom_table, chemins in lister_tables_brutes(dossier_base).items():
+        tables[cle_source(nom_table, nom_base)] = chemins
+    for nom_table, entree in lire_manifeste(dossier_base).get("tables", {}).items():
+        manifeste[cle_source(nom_table, nom_base)] = entree
+print(f"{len(tables)} table(s) détectée(s) dans le dossier : {dossier_datalake_raw_sage}\n")
 
+lignes_colonnes = []
+for nom_table, chemins in tables.items():
     try:
-        df = pd.read_csv(chemin_csv, encoding="utf-8-sig")
-        n_lignes = len(df)
+        entree = manifeste.get(nom_table, {})
+        n_lignes = entree.get("lignes")
+        if n_lignes is None:
+            n_lignes = len(lire_table_brute(chemins, encoding="utf-8-sig"))
+        for colonne in entree.get("colonnes", []):
+            lignes_colonnes.append({"table": nom_table, **colonne})
 
         if n_lignes == 0:
             tables_vides.append(nom_table)
@@ -53,4 +66,11 @@ enregistrer_liste("tables_non_vides.txt", tables_non_vides)
 enregistrer_liste("tables_plus_de_10_lignes.txt", tables_plus_de_10)
 enregistrer_liste("tables_plus_de_100_lignes.txt", tables_plus_de_100)
 
+# Nulls, minimum et maximum de chaque colonne, relevés pendant l'extraction
+with open(os.path.join(dossier_tables_statistiques, "statistiques_colonnes.csv"), "w",
+          newline="", encoding="utf-8-sig") as f:
+    writer = csv.DictWriter(f, fieldnames=["table", "nom", "type", "nulls", "min", "max"])
+    writer.writeheader()
+    writer.writerows(lignes_colonnes)
+
 print(f"\nStatistiques enregistrées dans : {dossier_tables_statistiques}")
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+Manifeste de l'extraction et suivi des empreintes par étape.
+
+À la fin de chaque extraction, data_lake/raw/sage/_manifest.json décrit
+chaque table brute : fichiers, nombre de lignes, taille en octets, colonnes
+(type, nulls, min, max, relevés pendant l'export) et empreinte SHA-256 du
+contenu. Une empreinte n'est recalculée que pour les tables dont un fichier a
+changé (taille ou date de modification). Les outils de statistiques et
+d'en-têtes s'appuient sur ce manifeste plutôt que de relire les fichiers.
+
+Les étapes suivantes (staging, tables générales, modèle en étoile) gardent
+l'empreinte de leurs sources lors de leur dernier passage réussi
+(SuiviEmpreintes) et sautent le traitement si rien n'a changé depuis. Le
+staging compare les empreintes du manifeste ; chaque étape suivante compare
+les empreintes de ce que l'étape précédente a effectivement traité, afin
+qu'un échec en amont ne soit jamais masqué en aval.
+La variable d'environnement FORCER_RETRAITEMENT=1 désactive ce saut.
+
+En extraction multi-bases, chaque sous-dossier base=<nom>/ a son propre
+manifeste ; ses tables sont alors désignées par « base=<nom>/<table> ».
+"""
+
+import csv
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from src.outils.ecriture_atomique import ecrire_json_atomique
+from src.outils.fichiers_bruts import PREFIXE_BASE, dossiers_bases, lister_tables_brutes
+from src.outils.statistiques_colonnes import StatistiquesColonnes
+
+NOM_MANIFESTE = "_manifest.json"
+TAILLE_BLOC_HACHAGE = 1 << 20
+
+forcer_retraitement = os.environ.get("FORCER_RETRAITEMENT", "0") == "1"
+
+
+# --------------------------------------------------------------------
+# Description d'une table brute
+# --------------------------------------------------------------------
+def _etat_fichiers(dossier: Path, chemins: list) -> list:
+    return [
+        {"nom": c.relative_to(dossier).as_posix(), "octets": c.stat().st_size,
+         "mtime_ns": c.stat().st_mtime_ns}
+        for c in chemins
+    ]
+
+
+def _hacher(chemins: list) -> str:
+    """Empreinte SHA-256 du contenu des fichiers, lus dans l'ordre par blocs."""
+    empreinte = hashlib.sha256()
+    for chemin in chemins:
+        with open(chemin, "rb") as f:
+            for bloc in iter(lambda: f.read(TAILLE_BLOC_HACHAGE), b""):
+                empreinte.update(bloc)
+    return empreinte.hexdigest()
+
+
+def lire_schema_brut(chemin: Path) -> list:
+    """
+    Schéma d'un fichier brut : [{"nom", "type"}], pour une table dont
+    l'extraction n'a pas relevé les colonnes. Le type n'est connu que pour
+    les fichiers Parquet / Arrow (None pour un CSV).
+    """
+    if chemin.suffix.lower() == ".csv":
+        with open(chemin, "r", encoding="utf-8-sig", newline="") as f:
+            entetes = next(csv.reader(f), [])
+        return [{"nom": nom, "type": None} for nom in entetes]
+
+    import pyarrow as pa
+    if chemin.suffix.lower() == ".parquet":
+        import pyarrow.parquet as pq
+        schema = pq.read_schema(str(chemin))
+    else:
+        with pa.memory_map(str(chemin)) as source:
+            schema = pa.ipc.open_file(source).schema
+    return [{"nom": champ.name, "type": str(champ.type)} for champ in schema]
+
+
+def decrire_table(dossier: Path, chemins: list, precedente: dict = None) -> dict:
+    """
+    Décrit les fichiers d'une table brute (fichiers, octets, empreinte).
+    L'empreinte de precedente est reprise si aucun fichier n'a changé.
+    """
+    fichiers = _etat_fichiers(dossier, chemins)
+    entree = {"fichiers": fichiers, "octets": sum(f["octets"] for f in fichiers)}
+    if precedente and precedente.get("fichiers") == fichiers and precedente.get("empreinte"):
+        entree["empreinte"] = precedente["empreinte"]
+    else:
+        entree["empreinte"] = _hacher(chemins)
+    return entree
+
+
+# --------------------------------------------------------------------
+# Lecture / écriture du manifeste
+# --------------------------------------------------------------------
+def lire_manifeste(dossier: Path) -> dict:
+    """Renvoie le manifeste du dossier brut ({} s'il n'existe pas)."""
+    chemin = dossier / NOM_MANIFESTE
+    if not chemin.exists():
+        return {}
+    with open(chemin, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _renseigner_colonnes(entree, extraction, stats, precedente, chemins):
+    """
+    Colonnes et statistiques d'une table pour le manifeste.
+
+    Un export complet fournit des statistiques exactes. Pour un delta, elles
+    sont fusionnées avec celles du manifeste précédent : les bornes restent
+    valables, mais les lignes modifiées sont comptées deux fois dans les nulls
+    (statistiques_exactes = False). Sans export réussi, les colonnes
+    précédentes sont conservées, ou à défaut lues dans l'en-tête du fichier.
+    """
+    if stats is not None and extraction["mode"] == "delta":
+        if precedente.get("colonnes"):
+            stats = StatistiquesColonnes.depuis_liste(
+                precedente["colonnes"], precedente.get("lignes")
+            ).fusionner(stats)
+        entree["colonnes"] = stats.vers_liste()
+        entree["statistiques_exactes"] = False
+    elif stats is not None:
+        entree["colonnes"] = stats.vers_liste()
+        entree["statistiques_exactes"] = True
+    elif precedente.get("colonnes"):
+        entree["colonnes"] = precedente["colonnes"]
+        entree["statistiques_exactes"] = precedente.get("statistiques_exactes", False)
+    else:
+        entree["colonnes"] = [
+            {"nom": c["nom"], "type": c["type"], "nulls": None, "min": None, "max": None}
+            for c in lire_schema_brut(chemins[0])
+        ]
+        entree["statistiques_exactes"] = False
+
+
+def ecrire_manifeste(dossier: Path, resume: dict, statistiques: dict = None,
+                     nb_workers: int = 4) -> dict:
+    """
+    Construit et écrit le manifeste de toutes les tables brutes du dossier.
+
+    resume est le résumé de l'extraction : le nombre de lignes d'une table
+    vient de son export complet, ou du comptage source pour un delta. Une
+    table en erreur n'a pas d'empreinte, afin d'être toujours retraitée.
+    statistiques donne, par table exportée, ses StatistiquesColonnes.
+    """
+    statistiques = statistiques or {}
+    precedent = lire_manifeste(dossier).get("tables", {})
+    tables = lister_tables_brutes(dossier)
+
+    def decrire(nom_table):
+        return decrire_table(dossier, tables[nom_table], precedent.get(nom_table))
+
+    with ThreadPoolExecutor(max_workers=nb_workers) as executeur:
+        descriptions = dict(zip(tables, executeur.map(decrire, tables)))
+
+    for nom_table, entree in descriptions.items():
+        extraction = resume.get(nom_table)
+        precedente = precedent.get(nom_table, {})
+        stats = None
+        if extraction is None:
+            entree["lignes"] = precedente.get("lignes")
+        elif extraction["statut"] != "ok":
+            entree["lignes"] = None
+            entree["empreinte"] = None
+        elif extraction["mode"] == "delta":
+            entree["lignes"] = extraction.get("lignes_source")
+            stats = statistiques.get(nom_table)
+        else:
+            entree["lignes"] = extraction["lignes"]
+            stats = statistiques.get(nom_table)
+        _renseigner_colonnes(entree, extraction, stats, precedente, tables[nom_table])
+
+    manifeste = {
+        "genere_le": datetime.now().isoformat(timespec="seconds"),
+        "tables": descriptions,
+    }
+    ecrire_json_atomique(dossier / NOM_MANIFESTE, manifeste)
+    return manifeste
+
+
+def empreintes_manifeste(manifeste: dict) -> dict:
+    """Renvoie {nom_table: empreinte} pour les tables du manifeste."""
+    return {t: e.get("empreinte") for t, e in manifeste.get("tables", {}).items()}
+
+
+def cle_source(nom_table: str, nom_base: str = None) -> str:
+    """Nom d'une table brute dans les empreintes : <table> ou base=<nom>/<table>."""
+    return nom_table if nom_base is None else f"{PREFIXE_BASE}{nom_base}/{nom_table}"
+
+
+def empreintes_bases(dossier: Path) -> dict:
+    """
+    Empreintes des tables brutes de toutes les bases du dossier, lues dans
+    leurs manifestes respectifs ({cle_source: empreinte}).
+    """
+    empreintes = {}
+    for nom_base, dossier_base in dossiers_bases(dossier).items():
+        for nom_table, empreinte in empreintes_manifeste(lire_manifeste(dossier_base)).items():
+            empreintes[cle_source(nom_table, nom_base)] = empreinte
+    return empreintes
+
+
+# --------------------------------------------------------------------
+# Suivi des empreintes traitées par une étape
+# --------------------------------------------------------------------
+class SuiviEmpreintes:
+    """
+    Empreintes des sources lors du dernier traitement réussi de chaque
+    élément d'une étape, persistées dans un fichier JSON :
+    {cle: {source: empreinte}}. empreintes_sources donne l'empreinte
+    actuelle de chaque source ({source: empreinte}).
+    """
+
+    def __init__(self, chemin: Path, empreintes_sources: dict):
+        self.chemin = chemin
+        self.empreintes_sources = empreintes_sources
+        self.elements = {}
+        if chemin.exists():
+            with open(chemin, "r", encoding="utf-8") as f:
+                self.elements = json.load(f)
+
+    def _empreintes(self, sources) -> dict:
+        return {s: self.empreintes_sources.get(s) for s in sources}
+
+    def inchange(self, cle: str, sources, sorties=()) -> bool:
+        """
+        Vrai si cle a déjà été traitée avec les mêmes empreintes de sources
+        et que ses sorties existent toujours.
+        """
+        if forcer_retraitement:
+            return False
+        empreintes = self._empreintes(sources)
+        if None in empreintes.values():
+            return False
+        if self.elements.get(cle) != empreintes:
+            return False
+        return all(Path(s).exists() for s in sorties)
+
+    def enregistrer(self, cle: str, sources) -> None:
+        """Retient les empreintes des sources après un traitement réussi."""
+        empreintes = self._empreintes(sources)
+        if None in empreintes.values():
+            self.elements.pop(cle, None)
+        else:
+            self.elements[cle] = empreintes
+
+    def empreintes_produites(self) -> dict:
+        """
+        Empreinte de chaque élément traité avec succès, déduite de celles de
+        ses sources : ce sont les sources de l'étape suivante.
+        """
+        return {
+            cle: hashlib.sha256(json.dumps(sources, sort_keys=True).encode("utf-8")).hexdigest()
+            for cle, sources in self.elements.items()
+        }
+
+    def sauver(self) -> None:
+        Path(self.chemin).parent.mkdir(parents=True, exist_ok=True)
+        ecrire_json_atomique(self.chemin, self.elements)
+
+
+def empreintes_etape(chemin_etat: Path) -> dict:
+    """Empreintes produites par une étape, lues depuis son fichier d'état."""
+    return SuiviEmpreintes(chemin_etat, {}).empreintes_produites()
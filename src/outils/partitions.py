@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Tables de faits partitionnées par année et par mois.
+
+Avec FAITS_PARTITIONNES=1, une table de faits n'est plus écrite en un seul
+fichier mais en une partition par mois de sa date (date_bl pour les ventes,
+date d'achat pour les achats) :
+
+    data_lake/processed/ventes/fact_ventes/annee=2024/mois=03/part-0.csv
+    data_lake/processed/ventes/fact_ventes/_partitions.json
+
+Les lignes sans date forment la partition « inconnue »
+(annee=inconnue/mois=inconnu). L'index _partitions.json décrit chaque
+partition (fichier, nombre de lignes, empreinte du contenu) : une partition
+dont le contenu n'a pas changé n'est pas réécrite, et src.chargement.vers_bdd
+peut charger les partitions en parallèle ou n'en remplacer qu'une.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.outils.ecriture_atomique import ecrire_json_atomique
+from src.outils.stockage_lac import chemin_table, ecrire_table
+
+NOM_INDEX = "_partitions.json"
+PARTITION_INCONNUE = "inconnue"
+
+faits_partitionnes = os.environ.get("FAITS_PARTITIONNES", "0") == "1"
+
+
+def dossier_partitions(dossier, nom: str) -> Path:
+    """Dossier des partitions de la table nom."""
+    return Path(dossier) / nom
+
+
+def chemin_index_partitions(dossier, nom: str) -> Path:
+    return dossier_partitions(dossier, nom) / NOM_INDEX
+
+
+def nom_partition(annee=None, mois=None) -> str:
+    """Nom d'une partition dans l'index : AAAA-MM, ou « inconnue » sans date."""
+    if annee is None:
+        return PARTITION_INCONNUE
+    return f"{annee:04d}-{mois:02d}"
+
+
+def bornes_partition(nom: str):
+    """Premier jour du mois de la partition nom et premier jour du mois suivant."""
+    debut = pd.Timestamp(f"{nom}-01")
+    return debut, debut + pd.offsets.MonthBegin(1)
+
+
+def lire_index_partitions(dossier, nom: str) -> dict:
+    """Index des partitions de la table nom (None si elle n'est pas partitionnée)."""
+    chemin = chemin_index_partitions(dossier, nom)
+    if not chemin.exists():
+        return None
+    with open(chemin, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _empreinte(df: pd.DataFrame) -> str:
+    valeurs = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.sha256(valeurs.tobytes()).hexdigest()
+
+
+def _supprimer_fichier(racine: Path, relatif: str) -> None:
+    """Supprime un fichier de partition et les dossiers devenus vides."""
+    chemin = racine / relatif
+    if chemin.exists():
+        chemin.unlink()
+    for parent in chemin.parents:
+        if parent == racine or not parent.exists() or any(parent.iterdir()):
+            break
+        parent.rmdir()
+
+
+def ecrire_partitions(df: pd.DataFrame, dates, dossier, nom: str) -> dict:
+    """
+    Écrit df en une partition par mois de dates (alignées sur les lignes de
+    df) et renvoie l'index des partitions. Les partitions inchangées ne sont
+    pas réécrites ; celles qui n'ont plus de lignes sont supprimées.
+    """
+    racine = dossier_partitions(dossier, nom)
+    precedent = lire_index_partitions(dossier, nom) or {"partitions": {}}
+    df = df.reset_index(drop=True)
+    dates = pd.to_datetime(pd.Series(dates).reset_index(drop=True), errors="coerce")
+    cles = (dates.dt.year * 100 + dates.dt.month).fillna(-1).astype(np.int64)
+
+    partitions = {}
+    for cle, lignes in sorted(cles.groupby(cles).indices.items()):
+        if cle < 0:
+            annee = mois = None
+            relatif = f"annee={PARTITION_INCONNUE}/mois=inconnu"
+        else:
+            annee, mois = int(cle // 100), int(cle % 100)
+            relatif = f"annee={annee:04d}/mois={mois:02d}"
+        partie = df.iloc[lignes]
+        relatif = chemin_table(Path(relatif), "part-0").as_posix()
+        empreinte = _empreinte(partie)
+        ancienne = precedent["partitions"].get(nom_partition(annee, mois), {})
+        if ancienne.get("empreinte") != empreinte or ancienne.get("chemin") != relatif \
+                or not (racine / relatif).exists():
+            ecrire_table(partie, racine / relatif)
+        partitions[nom_partition(annee, mois)] = {
+            "annee": annee, "mois": mois, "chemin": relatif,
+            "lignes": len(partie), "empreinte": empreinte,
+        }
+
+    fichiers = {p["chemin"] for p in partitions.values()}
+    for ancienne in precedent["partitions"].values():
+        if ancienne["chemin"] not in fichiers:
+            _supprimer_fichier(racine, ancienne["chemin"])
+
+    index = {"table": nom, "lignes": len(df), "partitions": partitions}
+    ecrire_json_atomique(chemin_index_partitions(dossier, nom), index)
+    return index
+
+
+def ecrire_faits(df: pd.DataFrame, dates, dossier, nom: str) -> Path:
+    """
+    Écrit la table de faits nom, partitionnée par mois de dates avec
+    FAITS_PARTITIONNES=1, en un seul fichier sinon ; la sortie de l'autre
+    mode est supprimée. Renvoie la sortie écrite (index ou fichier).
+    """
+    if faits_partitionnes:
+        ecrire_partitions(df, dates, dossier, nom)
+        fichier = chemin_table(dossier, nom)
+        if fichier.exists():
+            fichier.unlink()
+        return chemin_index_partitions(dossier, nom)
+    chemin = ecrire_table(df, chemin_table(dossier, nom))
+    if dossier_partitions(dossier, nom).is_dir():
+        shutil.rmtree(dossier_partitions(dossier, nom))
+    return chemin
+
+
+def sortie_faits(dossier, nom: str) -> Path:
+    """Sortie attendue de la table de faits nom (index des partitions ou fichier)."""
+    if faits_partitionnes:
+        return chemin_index_partitions(dossier, nom)
+    return chemin_table(dossier, nom)
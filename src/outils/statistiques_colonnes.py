@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Statistiques par colonne calculées au fil de l'extraction.
+
+Chaque lot lu depuis Access (ou chaque RecordBatch Arrow) met à jour, pour
+chaque colonne, le nombre de valeurs nulles ainsi que le minimum et le
+maximum. Les statistiques sont conservées sous forme sérialisable en JSON
+(dates en ISO 8601, décimaux en flottants) afin de pouvoir être fusionnées
+entre plages d'une même table, ou avec celles du manifeste précédent pour un
+delta incrémental.
+"""
+
+import datetime
+import decimal
+
+try:
+    import pyarrow.compute as pc
+except ImportError:  # seule l'extraction colonnaire utilise ajouter_batch
+    pc = None
+
+# Types dont le minimum et le maximum n'ont pas de sens
+TYPES_NON_COMPARABLES = ("bytes", "bytearray")
+
+
+def valeur_json(valeur):
+    """Représentation JSON d'une valeur, comparable à celles de même type."""
+    if valeur is None or isinstance(valeur, (bool, int, float, str)):
+        return valeur
+    if isinstance(valeur, decimal.Decimal):
+        return float(valeur)
+    if isinstance(valeur, (datetime.date, datetime.time)):
+        return valeur.isoformat()
+    return str(valeur)
+
+
+class StatistiquesColonnes:
+    """
+    Nombre de lignes, puis nulls / min / max de chaque colonne d'un résultat.
+    """
+
+    def __init__(self, noms, types):
+        self.noms = list(noms)
+        self.types = list(types)
+        self.lignes = 0
+        self.nulls = [0] * len(self.noms)
+        self.minimums = [None] * len(self.noms)
+        self.maximums = [None] * len(self.noms)
+        self._comparables = [t not in TYPES_NON_COMPARABLES for t in self.types]
+
+    @classmethod
+    def depuis_description(cls, description):
+        """Statistiques vides pour un résultat décrit comme curseur.description."""
+        return cls(
+            [col[0] for col in description],
+            [getattr(col[1], "__name__", str(col[1])) for col in description],
+        )
+
+    @classmethod
+    def depuis_liste(cls, colonnes, lignes):
+        """Reconstruit des statistiques depuis leur forme de manifeste (vers_liste)."""
+        stats = cls([c["nom"] for c in colonnes], [c.get("type") for c in colonnes])
+        stats.lignes = lignes or 0
+        for i, colonne in enumerate(colonnes):
+            stats.nulls[i] = colonne.get("nulls") or 0
+            stats.minimums[i] = colonne.get("min")
+            stats.maximums[i] = colonne.get("max")
+        return stats
+
+    def _borner(self, i, minimum, maximum):
+        if not self._comparables[i]:
+            return
+        try:
+            if minimum is not None and (self.minimums[i] is None or minimum < self.minimums[i]):
+                self.minimums[i] = minimum
+            if maximum is not None and (self.maximums[i] is None or maximum > self.maximums[i]):
+                self.maximums[i] = maximum
+        except TypeError:
+            # Valeurs de types incompatibles dans la colonne : pas de bornes
+            self._comparables[i] = False
+            self.minimums[i] = self.maximums[i] = None
+
+    def ajouter_lot(self, lot):
+        """Met à jour les statistiques avec un lot de lignes (fetchmany)."""
+        self.lignes += len(lot)
+        for i, valeurs in enumerate(zip(*lot)):
+            presentes = [v for v in valeurs if v is not None]
+            self.nulls[i] += len(valeurs) - len(presentes)
+            if presentes and self._comparables[i]:
+                try:
+                    self._borner(i, valeur_json(min(presentes)), valeur_json(max(presentes)))
+                except TypeError:
+                    self._comparables[i] = False
+                    self.minimums[i] = self.maximums[i] = None
+
+    def ajouter_batch(self, batch):
+        """Met à jour les statistiques avec un RecordBatch Arrow (calcul vectorisé)."""
+        self.lignes += batch.num_rows
+        for i, colonne in enumerate(batch.columns):
+            self.nulls[i] += colonne.null_count
+            if not self._comparables[i] or colonne.null_count == len(colonne):
+                continue
+            try:
+                bornes = pc.min_max(colonne)
+                minimum, maximum = bornes["min"].as_py(), bornes["max"].as_py()
+            except Exception:
+                presentes = [v for v in colonne.to_pylist() if v is not None]
+                minimum, maximum = min(presentes), max(presentes)
+            self._borner(i, valeur_json(minimum), valeur_json(maximum))
+
+    def fusionner(self, autre):
+        """Ajoute les statistiques d'une autre partie de la même table."""
+        self.lignes += autre.lignes
+        positions = {nom: i for i, nom in enumerate(self.noms)}
+        for j, nom in enumerate(autre.noms):
+            i = positions.get(nom)
+            if i is None:
+                continue
+            self.nulls[i] += autre.nulls[j]
+            if not autre._comparables[j]:
+                self._comparables[i] = False
+                self.minimums[i] = self.maximums[i] = None
+            self._borner(i, autre.minimums[j], autre.maximums[j])
+        return self
+
+    def vers_liste(self):
+        """Forme enregistrée dans le manifeste : une entrée par colonne."""
+        return [
+            {"nom": nom, "type": type_, "nulls": nulls, "min": minimum, "max": maximum}
+            for nom, type_, nulls, minimum, maximum in zip(
+                self.noms, self.types, self.nulls, self.minimums, self.maximums
+            )
+        ]
@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+"""
+Stockage des tables du data lake (staging et processed), en CSV ou en Parquet.
+
+Les étapes du pipeline n'écrivent et ne lisent plus leurs tables directement
+avec to_csv / read_csv mais par ce module : chemin_table donne le fichier
+d'une table dans le format du lac (LAC_FORMAT), ecrire_table et
+EcrivainTable l'écrivent (de façon atomique), lire_table le relit.
+
+- csv (défaut) : UTF-8 avec BOM, comme jusqu'ici ;
+- parquet : fichiers compressés (LAC_COMPRESSION, zstd par défaut) et typés :
+  entiers, montants et dates sont relus dans leur type, sans nouvelle
+  analyse du texte. La lecture ne décode que les colonnes demandées, et
+  les filtres de lignes (au format de pyarrow : [("colonne", "==", valeur)])
+  écartent les groupes de lignes (LAC_TAILLE_GROUPE_LIGNES) dont les
+  statistiques excluent toute correspondance.
+
+Les fichiers bruts suivent aussi LAC_FORMAT, sauf si EXTRACTION_FORMAT est
+précisé. Pour les utilisateurs qui ont besoin de CSV, les tables Parquet
+d'un dossier sont exportées à la demande :
+
+    python -m src.outils.stockage_lac data_lake/processed
+"""
+
+import operator
+import os
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+from src.outils.ecriture_atomique import ecriture_atomique
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # dépendance optionnelle : seul le format parquet en a besoin
+    pa = None
+    pq = None
+
+EXTENSIONS_LAC = {"csv": ".csv", "parquet": ".parquet"}
+
+format_lac = os.environ.get("LAC_FORMAT", "csv").lower()
+if format_lac not in EXTENSIONS_LAC:
+    raise ValueError(f"LAC_FORMAT inconnu : {format_lac} (csv ou parquet)")
+compression_parquet = os.environ.get("LAC_COMPRESSION", "zstd")
+taille_groupe_lignes = int(os.environ.get("LAC_TAILLE_GROUPE_LIGNES", "100000"))
+
+try:
+    from pandas._libs.parsers import STR_NA_VALUES as VALEURS_MANQUANTES_CSV
+except ImportError:
+    # na_values par défaut de pd.read_csv
+    VALEURS_MANQUANTES_CSV = frozenset({
+        "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND",
+        "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+    })
+
+OPERATEURS_FILTRE = {
+    "==": operator.eq, "=": operator.eq, "!=": operator.ne,
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+}
+
+
+def verifier_pyarrow(usage: str = "le format Parquet du data lake (LAC_FORMAT=parquet)"):
+    """
+    Lève une ImportError explicite si pyarrow n'est pas installé ; usage
+    décrit ce qui en a besoin. Seul contrôle de la dépendance optionnelle,
+    partagé avec src.extraction.export_arrow.
+    """
+    if pa is None:
+        raise ImportError(
+            f"pyarrow est requis pour {usage} "
+            "(pip install -r requirements/requirements_extraction.txt)"
+        )
+
+
+def chemin_table(dossier, nom: str, format_table: str = None) -> Path:
+    """Fichier de la table nom dans dossier, au format du lac (ou format_table)."""
+    return Path(dossier) / f"{nom}{EXTENSIONS_LAC[format_table or format_lac]}"
+
+
+def _est_parquet(chemin) -> bool:
+    return Path(chemin).suffix.lower() == EXTENSIONS_LAC["parquet"]
+
+
+def selectionner_colonnes(noms, colonnes):
+    """
+    Colonnes de noms retenues par colonnes (liste de noms ou fonction appelée
+    sur chaque nom, comme usecols de pd.read_csv), dans l'ordre de noms ;
+    None pour toutes.
+    """
+    if colonnes is None:
+        return None
+    if callable(colonnes):
+        return [nom for nom in noms if colonnes(nom)]
+    voulues = set(colonnes)
+    return [nom for nom in noms if nom in voulues]
+
+
+# --------------------------------------------------------------------
+# Écriture
+# --------------------------------------------------------------------
+def _vers_arrow(df: pd.DataFrame, schema=None):
+    """
+    Table Arrow de df (sans l'index), aux types de schema s'il est donné.
+    Une colonne texte qui mêle chaînes et nombres (numéro complété par une
+    expression régulière, par exemple) est écrite en texte, comme elle
+    l'aurait été dans un CSV, ou convertie en nombre si schema l'impose.
+    """
+    try:
+        return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        df = df.copy()
+        for colonne in df.columns:
+            if df[colonne].dtype != object:
+                continue
+            champ = schema.field(colonne) if schema is not None else None
+            if champ is not None and (pa.types.is_integer(champ.type)
+                                      or pa.types.is_floating(champ.type)):
+                df[colonne] = pd.to_numeric(df[colonne], errors="coerce")
+            else:
+                df[colonne] = df[colonne].where(df[colonne].isna(), df[colonne].astype(str))
+        return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+def _schema_ecriture(table):
+    """Schéma d'un fichier : une colonne sans aucune valeur est déclarée texte."""
+    return pa.schema([
+        champ.with_type(pa.string()) if pa.types.is_null(champ.type) else champ
+        for champ in table.schema
+    ], metadata=table.schema.metadata)
+
+
+class EcrivainTable:
+    """
+    Écrit une table morceau par morceau dans chemin, en CSV ou en Parquet
+    (format_table ; par défaut d'après l'extension de chemin). Le premier
+    morceau, même vide, fixe les colonnes et, en Parquet, leurs types ;
+    chaque morceau Parquet forme un ou plusieurs groupes de lignes.
+    """
+
+    def __init__(self, chemin, format_table: str = None):
+        self.chemin = Path(chemin)
+        self.parquet = (format_table == "parquet" if format_table else _est_parquet(chemin))
+        self.lignes = 0
+        self._entete_ecrit = False
+        self._schema = None
+        self._ecrivain = None
+        if self.parquet:
+            verifier_pyarrow()
+
+    def ajouter(self, df: pd.DataFrame) -> None:
+        if self.parquet:
+            table = _vers_arrow(df, self._schema)
+            if self._ecrivain is None:
+                self._schema = _schema_ecriture(table)
+                table = table.cast(self._schema)
+                self._ecrivain = pq.ParquetWriter(str(self.chemin), self._schema,
+                                                  compression=compression_parquet)
+            self._ecrivain.write_table(table, row_group_size=taille_groupe_lignes)
+        else:
+            premier = not self._entete_ecrit
+            df.to_csv(self.chemin, index=False, header=premier, mode="w" if premier else "a",
+                      encoding="utf-8-sig" if premier else "utf-8")
+            self._entete_ecrit = True
+        self.lignes += len(df)
+
+    def fermer(self) -> None:
+        if self._ecrivain is not None:
+            self._ecrivain.close()
+            self._ecrivain = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+
+
+def format_fichier(chemin) -> str:
+    """Format (csv ou parquet) d'un fichier du lac, d'après son extension."""
+    return "parquet" if _est_parquet(chemin) else "csv"
+
+
+def ecrire_table(df: pd.DataFrame, chemin) -> Path:
+    """Écrit df dans chemin (CSV ou Parquet selon l'extension), de façon atomique."""
+    chemin = Path(chemin)
+    chemin.parent.mkdir(parents=True, exist_ok=True)
+    with ecriture_atomique(chemin) as temporaire:
+        with EcrivainTable(temporaire, format_fichier(chemin)) as ecrivain:
+            ecrivain.ajouter(df)
+    return chemin
+
+
+# --------------------------------------------------------------------
+# Lecture
+# --------------------------------------------------------------------
+def _filtrer(df: pd.DataFrame, filtres) -> pd.DataFrame:
+    """Applique des filtres au format de pyarrow (conjonction de conditions) à df."""
+    masque = pd.Series(True, index=df.index)
+    for colonne, operateur, valeur in filtres:
+        if operateur == "in":
+            masque &= df[colonne].isin(valeur)
+        elif operateur == "not in":
+            masque &= ~df[colonne].isin(valeur)
+        else:
+            masque &= OPERATEURS_FILTRE[operateur](df[colonne], valeur).fillna(False).astype(bool)
+    return df.loc[masque].reset_index(drop=True)
+
+
+def _type_pandas(type_arrow):
+    """Entiers relus en entiers nullables (Int64...) plutôt qu'en flottants s'ils ont des manquants."""
+    if pa.types.is_integer(type_arrow):
+        return pd.api.types.pandas_dtype(str(type_arrow).replace("int", "Int").replace("uInt", "UInt"))
+    return None
+
+
+def _texte(serie: pd.Series) -> pd.Series:
+    """Valeurs de serie écrites comme dans un CSV, les manquantes restant manquantes."""
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        valides = serie.dropna()
+        format_date = "%Y-%m-%d" if (valides == valides.dt.normalize()).all() else "%Y-%m-%d %H:%M:%S"
+        texte = serie.dt.strftime(format_date)
+    else:
+        texte = serie.astype(object).map(str)
+    return texte.where(serie.notna(), None).astype(object)
+
+
+def _conformer(df: pd.DataFrame, schema, texte_par_defaut: bool, dayfirst=False) -> pd.DataFrame:
+    """
+    Donne aux colonnes d'une table Parquet les types qu'une lecture CSV avec
+    le même schéma (src.models.types_lecture) leur aurait donnés ; les dates
+    écrites en texte sont interprétées comme par read_csv (dayfirst).
+    """
+    for colonne in df.columns:
+        serie = df[colonne]
+        type_cible = schema.dtype.get(colonne) if schema is not None else None
+        if schema is not None and colonne in schema.dates:
+            if not pd.api.types.is_datetime64_any_dtype(serie):
+                df[colonne] = pd.to_datetime(serie, errors="coerce", dayfirst=dayfirst)
+        elif type_cible in ("Int64", "float64"):
+            if serie.dtype != type_cible:
+                df[colonne] = pd.to_numeric(serie, errors="coerce").astype(type_cible)
+        elif type_cible is str or (type_cible is None and texte_par_defaut
+                                   and not pd.api.types.is_datetime64_any_dtype(serie)):
+            if not pd.api.types.is_string_dtype(serie):
+                df[colonne] = _texte(serie)
+    return df
+
+
+def _texte_manquant(df: pd.DataFrame) -> pd.DataFrame:
+    """Comme à la relecture d'un CSV, les textes vides ou « nan », « NULL »… deviennent manquants."""
+    for colonne in df.columns:
+        serie = df[colonne]
+        if serie.dtype == object or pd.api.types.is_string_dtype(serie):
+            manquant = serie.isin(VALEURS_MANQUANTES_CSV)
+            if manquant.any():
+                df[colonne] = serie.mask(manquant)
+    return df
+
+
+def conformer_table(df: pd.DataFrame, schema=None, texte_par_defaut=False, dayfirst=False) -> pd.DataFrame:
+    """
+    Donne à une table produite en mémoire (modifiée en place) les valeurs et
+    les types qu'elle aurait après écriture puis relecture par lire_table
+    avec le même schéma : une étape peut ainsi passer ses tables à la
+    suivante sans les écrire.
+    """
+    df.reset_index(drop=True, inplace=True)
+    _texte_manquant(df)
+    if schema is not None or texte_par_defaut:
+        df = _conformer(df, schema, texte_par_defaut, dayfirst)
+    return df
+
+
+def lire_table(chemin, colonnes=None, filtres=None, schema=None, texte_par_defaut=False,
+               texte=False, **kwargs) -> pd.DataFrame:
+    """
+    Lit une table du lac (CSV ou Parquet selon l'extension de chemin).
+
+    - colonnes : liste de noms, ou fonction appelée sur chaque nom (les
+      colonnes absentes sont ignorées) ; None pour toutes ;
+    - filtres : conditions au format de pyarrow, toutes vérifiées
+      ([("colonne", "==", valeur), ("colonne", "in", [...])]) ; en Parquet,
+      les groupes de lignes exclus par leurs statistiques ne sont pas lus ;
+    - schema (SchemaLecture) et texte_par_defaut : types des colonnes, comme
+      pour src.models.types_lecture.lire_csv_type ;
+    - texte : toutes les colonnes en texte, comme pd.read_csv(dtype=str).
+
+    Les autres arguments nommés sont transmis à la lecture CSV (en Parquet,
+    seul dayfirst est repris, pour les dates écrites en texte).
+    """
+    chemin = Path(chemin)
+    if _est_parquet(chemin):
+        verifier_pyarrow()
+        noms = pq.read_schema(str(chemin)).names
+        df = pq.read_table(str(chemin), columns=selectionner_colonnes(noms, colonnes),
+                           filters=filtres or None).to_pandas(types_mapper=_type_pandas)
+        _texte_manquant(df)
+        if texte:
+            return pd.DataFrame({c: _texte(df[c]) for c in df.columns}, index=df.index)
+        if schema is not None or texte_par_defaut:
+            df = _conformer(df, schema, texte_par_defaut, kwargs.get("dayfirst", False))
+        return df
+
+    kwargs.setdefault("encoding", "utf-8-sig")
+    selection = None
+    if colonnes is not None:
+        selection = colonnes if callable(colonnes) else set(colonnes).__contains__
+        colonnes_filtres = {filtre[0] for filtre in filtres or ()}
+        kwargs["usecols"] = lambda nom: selection(nom) or nom in colonnes_filtres
+    if texte:
+        df = pd.read_csv(chemin, dtype=str, **kwargs)
+    elif schema is not None:
+        from src.models.types_lecture import lire_csv_type
+        df = lire_csv_type(chemin, schema, texte_par_defaut=texte_par_defaut, **kwargs)
+    else:
+        df = pd.read_csv(chemin, **kwargs)
+    if filtres:
+        df = _filtrer(df, filtres)
+        if selection is not None:
+            df = df[[nom for nom in df.columns if selection(nom)]]
+    return df
+
+
+# --------------------------------------------------------------------
+# Export CSV à la demande
+# --------------------------------------------------------------------
+def exporter_csv(chemin) -> Path:
+    """Écrit, à côté d'une table Parquet, sa copie CSV (UTF-8 avec BOM)."""
+    chemin = Path(chemin)
+    sortie = chemin.with_suffix(EXTENSIONS_LAC["csv"])
+    ecrire_table(lire_table(chemin), sortie)
+    return sortie
+
+
+def exporter_dossier_csv(dossier) -> list:
+    """Exporte en CSV toutes les tables Parquet de dossier et de ses sous-dossiers."""
+    return [exporter_csv(chemin) for chemin in sorted(Path(dossier).rglob("*.parquet"))]
+
+
+def main(dossiers):
+    from src.outils.chemins import dossier_datalake_processed
+    for dossier in dossiers or [dossier_datalake_processed]:
+        for sortie in exporter_dossier_csv(dossier):
+            print(f"Exporté : {sortie}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -3,10 +3,25 @@
 
 """
 Module de nettoyage des CSV bruts Sage et export vers CSV staging.
-Au lieu d’Excel, on génère <nom_table>_staging.csv dans data_lake/staging/sage/.
+Au lieu d’Excel, on génère <nom_table>_staging.csv (ou .parquet, selon
+LAC_FORMAT, voir src.outils.stockage_lac) dans data_lake/staging/sage/.
+Après une extraction multi-bases, les tables de même nom de toutes les bases
+sont nettoyées ensemble (colonne SOURCE_BASE).
+
+Les tables sont réparties entre STAGING_NB_WORKERS processus, les plus
+volumineuses d'abord ; le résultat de chacune (lignes lues, supprimées,
+écrites, erreur) est affiché d'un bloc à la fin de son nettoyage et repris
+dans data_lake/staging/sage/_rapport_staging.json.
+
+Avec PROJECTION_COLONNES=1, seules les colonnes et les lignes dont les
+étapes suivantes ont besoin (src.outils.besoins_colonnes) sont lues et
+conservées.
 """
 
-import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
 import pandas as pd
 from pathlib import Path
 import os
@@ -17,13 +32,38 @@ import os
 try:
     from src.outils.chemins import (
         dossier_datalake_raw_sage,
-        dossier_datalake_staging_sage
+        dossier_datalake_staging_sage,
+        chemin_etat_staging_sage,
+        chemin_rapport_staging_sage
+    )
+    from src.outils.ecriture_atomique import ecriture_atomique, ecrire_json_atomique
+    from src.outils.fichiers_bruts import iterer_table_bases, lister_tables_par_base, lire_table_bases
+    from src.outils.manifeste import SuiviEmpreintes, cle_source, empreintes_bases
+    from src.outils.besoins_colonnes import (
+        filtre_table, projection_active, selection_colonnes, signature_besoin
     )
+    from src.staging.regles_nettoyage import BilanNettoyage, appliquer_regles
+    from src.staging.regles_sage import regles_table
+    from src.outils.stockage_lac import EcrivainTable, chemin_table, ecrire_table, format_fichier
+    from src.models.types_lecture import schema_fichier
 except ImportError:
     # Fallback si exécuté hors du contexte src/
     projet_root = Path(__file__).resolve().parents[2]
+    sys.path.insert(0, str(projet_root))
+    from src.outils.ecriture_atomique import ecriture_atomique, ecrire_json_atomique
+    from src.outils.fichiers_bruts import iterer_table_bases, lister_tables_par_base, lire_table_bases
+    from src.outils.manifeste import SuiviEmpreintes, cle_source, empreintes_bases
+    from src.outils.besoins_colonnes import (
+        filtre_table, projection_active, selection_colonnes, signature_besoin
+    )
+    from src.staging.regles_nettoyage import BilanNettoyage, appliquer_regles
+    from src.staging.regles_sage import regles_table
+    from src.outils.stockage_lac import EcrivainTable, chemin_table, ecrire_table, format_fichier
+    from src.models.types_lecture import schema_fichier
     dossier_datalake_raw_sage     = projet_root / "data_lake" / "raw"     / "sage"
     dossier_datalake_staging_sage = projet_root / "data_lake" / "staging" / "sage"
+    chemin_etat_staging_sage      = dossier_datalake_staging_sage / "_etat_staging.json"
+    chemin_rapport_staging_sage   = dossier_datalake_staging_sage / "_rapport_staging.json"
 
 # --------------------------------------------------------------------
 # Vérification du dossier source et création du dossier de sortie
@@ -33,156 +73,313 @@ if not dossier_datalake_raw_sage.is_dir():
 
 dossier_datalake_staging_sage.mkdir(parents=True, exist_ok=True)
 
+# Nettoyage par morceaux : au-delà de ce volume de fichiers bruts (en octets ;
+# 0 pour toujours nettoyer d'un bloc), une table est traitée par morceaux de
+# STAGING_TAILLE_MORCEAU lignes
+seuil_morceaux_octets = int(os.environ.get("STAGING_SEUIL_MORCEAUX_OCTETS", str(256 * 1024 * 1024)))
+taille_morceau_staging = int(os.environ.get("STAGING_TAILLE_MORCEAU", "200000"))
+
+# Nombre de processus de nettoyage (1 : tables nettoyées l'une après l'autre
+# dans le processus courant)
+nb_workers_staging = int(os.environ.get("STAGING_NB_WORKERS", str(os.cpu_count() or 1)))
+
 # --------------------------------------------------------------------
-# Configuration des conversions de types et colonnes spécifiques
+# Règles de nettoyage par table (déclarées dans src.staging.regles_sage)
 # --------------------------------------------------------------------
-types_tables = {
-    "F_DOCENTETE": {
-        "DO_DATE": "datetime",
-        "DO_DATELIVR": "datetime",
-        "FNT_TOTALHT": "float"
-    },
-    "F_DOCLIGNE": {
-        "DL_DATEBL": "datetime",
-        "DL_DATEBC": "datetime",
-        "DL_DATEPL": "datetime",
-        "DL_QTE": "float",
-        "DL_PRIXUNITAIRE": "float",
-        "DL_MONTANTHT": "float"
-    }
-}
+def dtype_lecture(nom_table: str) -> dict:
+    """
+    Types imposés à la lecture des fichiers bruts CSV : les colonnes texte
+    de la table dans src/models/tables.py sont lues telles quelles (codes,
+    téléphones, numéros de pièce ne sont pas pris pour des nombres),
+    complétées par les types déclarés dans les règles de la table.
+    """
+    dtype = {colonne: str for colonne in schema_fichier(nom_table).colonnes_texte}
+    dtype.update(regles_table(nom_table).dtype_lecture or {})
+    return dtype or None
 
-colonnes_monnaie_tables = {
-    "F_DOCENTETE": ["FNT_TOTALHT"],
-    "F_DOCLIGNE": ["DL_PRIXUNITAIRE", "DL_MONTANTHT"]
-}
+def arguments_lecture(nom_table: str) -> dict:
+    """
+    Arguments de lecture des fichiers bruts de nom_table ; avec la
+    projection, seules les colonnes dont les étapes suivantes ont besoin.
+    """
+    lecture = {"encoding": "utf-8-sig", "dtype": dtype_lecture(nom_table), "low_memory": False}
+    if projection_active:
+        lecture["usecols"] = selection_colonnes(nom_table)
+    return lecture
+
+def nettoyer_dataframe(df: pd.DataFrame, nom_table: str, bilan: BilanNettoyage) -> pd.DataFrame:
+    """
+    Applique les règles de nettoyage de nom_table à df (la table entière ou
+    un morceau) et renvoie les lignes conservées ; avec la projection, les
+    lignes hors du filtre des étapes suivantes sont aussi écartées.
+    """
+    filtre = filtre_table(nom_table) if projection_active else None
+    return appliquer_regles(df, nom_table, regles_table(nom_table), bilan,
+                            [filtre] if filtre else [])
+
+
+# --------------------------------------------------------------------
+# Format des dates dans le CSV de sortie (un fichier Parquet garde les dates
+# dans leur type : rien à réaligner)
+# --------------------------------------------------------------------
+# to_csv choisit le format d'une colonne de dates d'après toutes ses valeurs
+# (date seule si elles sont toutes à minuit, sinon secondes, millisecondes…).
+# Écrite par morceaux, une colonne peut donc changer de format en cours de
+# fichier : le niveau de chaque morceau est relevé et, si besoin, la colonne
+# est réécrite au niveau le plus fin, comme l'aurait fait un export d'un bloc.
+LARGEURS_FRACTION = {2: 3, 3: 6, 4: 9}
+
+def niveau_format_dates(serie: pd.Series):
+    """Précision avec laquelle to_csv écrit la colonne (0 = date seule), ou None si vide."""
+    valeurs = serie.dropna()
+    if valeurs.empty:
+        return None
+    if (valeurs == valeurs.dt.normalize()).all():
+        return 0
+    if (valeurs.dt.nanosecond != 0).any():
+        return 4
+    if (valeurs.dt.microsecond % 1000 != 0).any():
+        return 3
+    if (valeurs.dt.microsecond != 0).any():
+        return 2
+    return 1
+
+def aligner_format_dates(textes: pd.Series, niveau: int) -> pd.Series:
+    """Réécrit des dates déjà formatées par to_csv au niveau de précision indiqué."""
+    presentes = textes != ""
+    alignees = textes.where(~(presentes & (textes.str.len() == 10)), textes + " 00:00:00")
+    if niveau in LARGEURS_FRACTION:
+        largeur = LARGEURS_FRACTION[niveau]
+        parties = alignees.str.split(".", n=1, expand=True).reindex(columns=[0, 1])
+        fraction = parties[1].fillna("").str.ljust(largeur, "0")
+        alignees = alignees.where(~presentes, parties[0] + "." + fraction)
+    return alignees
+
+def _reecrire_dates(chemin: Path, niveaux: dict, taille_morceau: int) -> None:
+    """Réécrit, morceau par morceau, les colonnes de dates au niveau indiqué."""
+    with ecriture_atomique(chemin) as temporaire:
+        with pd.read_csv(chemin, dtype=object, keep_default_na=False, encoding="utf-8-sig",
+                         chunksize=taille_morceau) as lecteur:
+            for i, morceau in enumerate(lecteur):
+                for colonne, niveau in niveaux.items():
+                    morceau[colonne] = aligner_format_dates(morceau[colonne], niveau)
+                morceau.to_csv(temporaire, index=False, header=(i == 0), mode="w" if i == 0 else "a",
+                               encoding="utf-8-sig" if i == 0 else "utf-8")
 
-dtype_tables = {
-    "F_DOCLIGNE": {
-        "AC_REFCLIENT": str,
-        "AF_REFFOURNISS": str
-    }
-}
 
 # --------------------------------------------------------------------
 # Fonction principale de nettoyage et export vers CSV
 # --------------------------------------------------------------------
+def chemin_sortie_staging(nom_table: str) -> Path:
+    return chemin_table(dossier_datalake_staging_sage, f"{nom_table}_staging")
 
-def nettoyer_et_exporter_csv(chemin_csv: Path, nom_table: str):
-    try:
-        dtype = dtype_tables.get(nom_table, None)
-        df = pd.read_csv(chemin_csv, encoding="utf-8-sig", dtype=dtype, low_memory=False)
-
-        # Suppression des lignes vides ou nulles globales
-        df_clean = df.dropna(how='all')
-        df_clean = df_clean.loc[~(df_clean.isna() | (df_clean == 0)).all(axis=1)]
-
-# --- Début de la correction ---
-
-        # Cas particulier : F_DOCLIGNE
-        if nom_table == "F_DOCLIGNE":
-            # On s'assure que les colonnes existent
-            if {"AC_REFCLIENT","AF_REFFOURNISS"}.issubset(df_clean.columns):
-                avant = len(df_clean)
-                # Condition de suppression : les deux champs simultanément manquants ou vides
-                mask_ref_vides = (
-                    (df_clean["AC_REFCLIENT"].isna() | (df_clean["AC_REFCLIENT"].astype(str).str.strip() == ""))
-                    &
-                    (df_clean["AF_REFFOURNISS"].isna() | (df_clean["AF_REFFOURNISS"].astype(str).str.strip() == ""))
-                )
-                df_clean = df_clean[~mask_ref_vides]
-                suppr = avant - len(df_clean)
-                print(f"{nom_table} : {suppr} ligne(s) sans AC_REFCLIENT ni AF_REFFOURNISS supprimée(s)")
-
-            # --- NOUVEAU : Conversion des colonnes en types numériques corrects ---
-            colonnes_a_convertir = {
-                'DL_QTE': 'Int64',
-                'DL_QTEBC': 'Int64',
-                'DL_PIECEBC': 'Int64', # Si ce sont des numéros, sinon commenter cette ligne
-                'DL_PIECEBL': 'Int64'  # Si ce sont des numéros, sinon commenter cette ligne
-                # Ajoutez d'autres colonnes numériques si nécessaire
-            }
-
-            print(f"Conversion des types pour {nom_table}...")
-            for col, type_cible in colonnes_a_convertir.items():
-                if col in df_clean.columns:
-                    # pd.to_numeric gère les chaînes de caractères comme "964.0"
-                    # errors='coerce' transforme les valeurs non-valides en NaT/NaN
-                    # .astype(type_cible) convertit au format entier de pandas qui supporte les nuls
-                    df_clean[col] = pd.to_numeric(df_clean[col], errors='coerce').astype(type_cible)
-                    print(f"  - Colonne '{col}' convertie en {type_cible}.")
-                else:
-                    print(f"  - AVERTISSEMENT : Colonne '{col}' non trouvée, conversion ignorée.")
-
-
-        # Cas particulier : F_ARTFOURNISS …
-        if nom_table == "F_ARTFOURNISS" and "AF_REFFOURNISS" in df_clean.columns:
-            avant = len(df_clean)
-            df_clean = df_clean[df_clean["AF_REFFOURNISS"].notna()]
-            print(f"{nom_table} : {avant - len(df_clean)} ligne(s) sans AF_REFFOURNISS supprimée(s)")
-
-        # Cas particulier : extraction de BL pour F_DOCLIGNE
-        if nom_table == "F_DOCLIGNE" and {"DL_PIECEBL", "DL_DESIGN"}.issubset(df_clean.columns):
-            import re
-
-            def extraire_bl(row):
-                val = row["DL_PIECEBL"]
-                texte = str(row["DL_DESIGN"]).replace('\xa0', ' ')
-                texte = re.sub(r"\s+", " ", texte).strip()
-                # Si DL_PIECEBL vide ou NaN, on cherche dans le texte
-                if pd.isna(val) or str(val).strip() == "":
-                    match = re.search(
-                        r"LIVREES?\s+PAR\s+BL\s*(?:N°?|N)?\s*(\d+)",
-                        texte,
-                        flags=re.IGNORECASE
-                    )
-                    if match:
-                        return match.group(1)
-                return val
-
-            ancienne = df_clean["DL_PIECEBL"].copy()
-            df_clean["DL_PIECEBL"] = df_clean.apply(extraire_bl, axis=1)
-            modif = (
-                (ancienne.isna() | (ancienne.astype(str).str.strip() == "")) &
-                (ancienne != df_clean["DL_PIECEBL"])
-            ).sum()
-            print(f"{nom_table} : {modif} ligne(s) mise(s) à jour dans DL_PIECEBL")
-
-
-        # Conversions de types …
-        conversions = types_tables.get(nom_table, {})
-        for col, dtype in conversions.items():
-            if col in df_clean.columns:
-                try:
-                    if dtype == "datetime":
-                        df_clean[col] = pd.to_datetime(df_clean[col], errors="coerce")
-                    else:
-                        df_clean[col] = df_clean[col].astype(dtype)
-                except Exception as e:
-                    print(f"Erreur conversion {nom_table}.{col} : {e}")
-
-        # Si vide après nettoyage, on ignore
-        if df_clean.empty:
-            print(f"Ignoré : {nom_table} (aucune ligne après nettoyage)")
-            return
-
-        # Export vers staging
-        fichier_sortie = dossier_datalake_staging_sage / f"{nom_table}_staging.csv"
-        df_clean.to_csv(fichier_sortie, index=False, encoding="utf-8-sig")
-        print(f"Exporté : {nom_table} → {fichier_sortie} ({len(df_clean)} lignes)")
+def taille_brute(chemins_par_base: dict) -> int:
+    """Taille en octets des fichiers bruts d'une table, toutes bases confondues."""
+    return sum(Path(c).stat().st_size for chemins in chemins_par_base.values() for c in chemins)
 
+def _exporter_en_memoire(chemins_par_base, nom_table, bilan, fichier_sortie) -> tuple:
+    """Nettoie la table d'un bloc ; renvoie les nombres de lignes lues et écrites."""
+    df = lire_table_bases(chemins_par_base, **arguments_lecture(nom_table))
+    df_clean = nettoyer_dataframe(df, nom_table, bilan)
+    if not df_clean.empty:
+        ecrire_table(df_clean, fichier_sortie)
+    return len(df), len(df_clean)
+
+class _TableVide(Exception):
+    """Aucune ligne après nettoyage : la sortie précédente est laissée en place."""
+
+    def __init__(self, lues):
+        super().__init__(lues)
+        self.lues = lues
+
+def _exporter_par_morceaux(chemins_par_base, nom_table, bilan, fichier_sortie,
+                           taille_morceau) -> tuple:
+    """
+    Nettoie la table morceau par morceau en ajoutant chaque morceau nettoyé
+    au fichier de sortie ; renvoie les nombres de lignes lues et écrites.
+    """
+    morceaux = iterer_table_bases(chemins_par_base, taille_morceau, **arguments_lecture(nom_table))
+    lues = 0
+    niveaux = {}
+    format_sortie = format_fichier(fichier_sortie)
+    with ecriture_atomique(fichier_sortie) as temporaire:
+        with EcrivainTable(temporaire, format_sortie) as ecrivain:
+            for morceau in morceaux:
+                lues += len(morceau)
+                morceau = nettoyer_dataframe(morceau, nom_table, bilan)
+                if morceau.empty:
+                    continue
+                for colonne in morceau.columns:
+                    if pd.api.types.is_datetime64_any_dtype(morceau[colonne]):
+                        niveau = niveau_format_dates(morceau[colonne])
+                        if niveau is not None:
+                            niveaux.setdefault(colonne, set()).add(niveau)
+                ecrivain.ajouter(morceau)
+        lignes = ecrivain.lignes
+        if lignes == 0:
+            raise _TableVide(lues)
+    a_realigner = {c: max(n) for c, n in niveaux.items() if len(n) > 1}
+    if a_realigner and format_sortie == "csv":
+        _reecrire_dates(fichier_sortie, a_realigner, taille_morceau)
+    return lues, lignes
+
+def nettoyer_table(chemins_par_base: dict, nom_table: str) -> dict:
+    """
+    Nettoie une table brute et l'exporte vers <nom_table>_staging.csv (ou .parquet), sans
+    rien afficher. chemins_par_base donne, pour chaque base, le fichier brut
+    (CSV, Parquet ou Arrow) ou la liste des parties et deltas de la table
+    (voir src.outils.fichiers_bruts.lister_tables_par_base).
+
+    Au-delà de STAGING_SEUIL_MORCEAUX_OCTETS de fichiers bruts, la table est
+    lue, nettoyée et écrite par morceaux de STAGING_TAILLE_MORCEAU lignes :
+    la mémoire utilisée ne dépend plus de la taille de la table, et le
+    fichier produit est identique. Le fichier de sortie n'est remplacé
+    qu'une fois entièrement écrit.
+
+    Renvoie le résultat du nettoyage : {"table", "statut" (exportee, vide ou
+    erreur), "octets_bruts", "lignes_lues", "lignes_supprimees",
+    "lignes_ecrites", "duree_s", "erreur", "messages"}.
+    """
+    bilan = BilanNettoyage()
+    debut = time.perf_counter()
+    resultat = {"table": nom_table, "statut": "erreur", "octets_bruts": None,
+                "lignes_lues": None, "lignes_supprimees": None, "lignes_ecrites": None,
+                "duree_s": None, "erreur": None, "messages": []}
+    try:
+        resultat["octets_bruts"] = octets = taille_brute(chemins_par_base)
+        fichier_sortie = chemin_sortie_staging(nom_table)
+        if 0 < seuil_morceaux_octets <= octets:
+            try:
+                lues, lignes = _exporter_par_morceaux(chemins_par_base, nom_table, bilan,
+                                                      fichier_sortie, taille_morceau_staging)
+            except _TableVide as vide:
+                lues, lignes = vide.lues, 0
+        else:
+            lues, lignes = _exporter_en_memoire(chemins_par_base, nom_table, bilan, fichier_sortie)
+        # Si vide après nettoyage, la table est ignorée
+        resultat.update(statut="exportee" if lignes else "vide", lignes_lues=lues,
+                        lignes_supprimees=lues - lignes, lignes_ecrites=lignes)
     except Exception as e:
-        print(f"Erreur pour {nom_table} : {e}")
+        resultat["erreur"] = f"{type(e).__name__}: {e}"
+    resultat["duree_s"] = round(time.perf_counter() - debut, 3)
+    resultat["messages"] = bilan.lignes()
+    return resultat
+
+def afficher_resultat(resultat: dict) -> None:
+    """Affiche d'un bloc les messages et le résultat du nettoyage d'une table."""
+    for message in resultat["messages"]:
+        print(message)
+    nom_table = resultat["table"]
+    if resultat["statut"] == "erreur":
+        print(f"Erreur pour {nom_table} : {resultat['erreur']}")
+    elif resultat["statut"] == "vide":
+        print(f"Ignoré : {nom_table} (aucune ligne après nettoyage)")
+    else:
+        print(f"Exporté : {nom_table} → {chemin_sortie_staging(nom_table)} "
+              f"({resultat['lignes_ecrites']} lignes, {resultat['lignes_supprimees']} supprimée(s), "
+              f"{resultat['duree_s']:.1f} s)")
+
+def nettoyer_et_exporter_csv(chemins_par_base: dict, nom_table: str) -> bool:
+    """
+    Nettoie et exporte une table (voir nettoyer_table) puis affiche son
+    résultat. Renvoie False si le nettoyage a échoué.
+    """
+    resultat = nettoyer_table(chemins_par_base, nom_table)
+    afficher_resultat(resultat)
+    return resultat["statut"] != "erreur"
+
+def nettoyer_tables_en_parallele(tables: dict, nb_workers: int = nb_workers_staging):
+    """
+    Nettoie les tables ({nom_table: chemins_par_base}) et renvoie leurs
+    résultats au fur et à mesure, dans l'ordre où elles se terminent.
+
+    Le nettoyage (lecture et conversions pandas) sollicite surtout le
+    processeur : les tables sont réparties entre nb_workers processus, les
+    plus volumineuses soumises en premier pour qu'une grosse table ne soit
+    pas commencée en dernier. Avec nb_workers = 1, elles sont nettoyées
+    dans le processus courant.
+    """
+    ordre = sorted(tables, key=lambda t: taille_brute(tables[t]), reverse=True)
+    if nb_workers <= 1 or len(ordre) <= 1:
+        for nom_table in ordre:
+            yield nettoyer_table(tables[nom_table], nom_table)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(nb_workers, len(ordre))) as executeur:
+        futures = {executeur.submit(nettoyer_table, tables[t], t): t for t in ordre}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                # Processus de nettoyage arrêté (mémoire insuffisante, etc.)
+                yield {"table": futures[future], "statut": "erreur", "octets_bruts": None,
+                       "lignes_lues": None, "lignes_supprimees": None, "lignes_ecrites": None,
+                       "duree_s": None, "erreur": f"{type(e).__name__}: {e}", "messages": []}
+
+def _totaux(resultats: dict) -> dict:
+    totaux = {statut: 0 for statut in ("exportee", "vide", "erreur", "inchangee")}
+    for resultat in resultats.values():
+        totaux[resultat["statut"]] += 1
+    for cle in ("lignes_lues", "lignes_supprimees", "lignes_ecrites"):
+        totaux[cle] = sum(r.get(cle) or 0 for r in resultats.values())
+    return totaux
 
 # --------------------------------------------------------------------
 # Exécution pour tous les CSV bruts du dossier raw/sage
+# (les tables dont l'empreinte n'a pas changé depuis le dernier nettoyage
+# réussi sont sautées, voir src.outils.manifeste)
 # --------------------------------------------------------------------
 def main():
-    fichiers = [f for f in dossier_datalake_raw_sage.iterdir() if f.suffix.lower() == ".csv"]
-    print(f"Détection de {len(fichiers)} fichiers CSV bruts dans {dossier_datalake_raw_sage}")
-    for fichier in fichiers:
-        nom_table = fichier.stem
-        nettoyer_et_exporter_csv(fichier, nom_table)
+    debut = time.perf_counter()
+    tables = lister_tables_par_base(dossier_datalake_raw_sage)
+    print(f"Détection de {len(tables)} tables brutes dans {dossier_datalake_raw_sage}")
+    empreintes = empreintes_bases(dossier_datalake_raw_sage)
+    sources = {
+        nom_table: [cle_source(nom_table, nom_base) for nom_base in chemins_par_base]
+        for nom_table, chemins_par_base in tables.items()
+    }
+    if projection_active:
+        # Le besoin des étapes suivantes est une source de plus : activer la
+        # projection ou changer sa déclaration fait retraiter la table
+        for nom_table in tables:
+            empreintes[f"_besoin/{nom_table}"] = signature_besoin(nom_table)
+            sources[nom_table].append(f"_besoin/{nom_table}")
+    suivi = SuiviEmpreintes(chemin_etat_staging_sage, empreintes)
+    resultats = {}
+    a_nettoyer = {}
+    for nom_table, chemins_par_base in tables.items():
+        if suivi.inchange(nom_table, sources[nom_table], [chemin_sortie_staging(nom_table)]):
+            resultats[nom_table] = {"table": nom_table, "statut": "inchangee"}
+        else:
+            a_nettoyer[nom_table] = chemins_par_base
+
+    nb_workers = max(1, nb_workers_staging)
+    if a_nettoyer:
+        print(f"Nettoyage de {len(a_nettoyer)} table(s) avec {min(nb_workers, len(a_nettoyer))} processus")
+    for resultat in nettoyer_tables_en_parallele(a_nettoyer, nb_workers):
+        nom_table = resultat["table"]
+        afficher_resultat(resultat)
+        if resultat["statut"] != "erreur":
+            suivi.enregistrer(nom_table, sources[nom_table])
+        resultats[nom_table] = resultat
+    suivi.sauver()
+
+    totaux = _totaux(resultats)
+    ecrire_json_atomique(chemin_rapport_staging_sage, {
+        "genere_le": datetime.now().isoformat(timespec="seconds"),
+        "nb_workers": nb_workers,
+        "duree_s": round(time.perf_counter() - debut, 3),
+        "totaux": totaux,
+        "tables": dict(sorted(resultats.items())),
+    })
+
+    if totaux["inchangee"]:
+        print(f"{totaux['inchangee']} table(s) inchangée(s) depuis le dernier nettoyage, non retraitée(s)")
+    print(f"\nStaging terminé en {time.perf_counter() - debut:.1f} s : "
+          f"{totaux['exportee']} table(s) exportée(s), {totaux['vide']} vide(s), "
+          f"{totaux['erreur']} erreur(s) ; {totaux['lignes_lues']} ligne(s) lue(s), "
+          f"{totaux['lignes_supprimees']} supprimée(s), {totaux['lignes_ecrites']} écrite(s)")
+    print(f"Rapport écrit dans : {chemin_rapport_staging_sage}")
 
 if __name__ == "__main__":
     main()
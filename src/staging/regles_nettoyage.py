@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Moteur de règles du nettoyage des tables brutes Sage.
+
+Le nettoyage d'une table est déclaré sous forme de données (ReglesTable) :
+lignes à supprimer, conversions de types, colonnes monétaires, colonnes
+complétées par une expression régulière, types imposés à la lecture. Une
+règle ne s'applique que si toutes les colonnes qu'elle utilise sont
+présentes. appliquer_regles exécute les règles d'une table en un nombre
+fixe de passes, quel que soit le nombre de règles déclarées :
+
+1. toutes les conditions de suppression (lignes vides comprises) sont
+   évaluées sur le même DataFrame et combinées en un seul masque, appliqué
+   en une seule sélection ;
+2. chaque colonne à convertir ou à compléter n'est reprise qu'une fois,
+   sur les seules lignes conservées ; un complément est une recherche
+   vectorisée (str.extract), limitée aux lignes où la colonne est vide.
+
+Ajouter une règle, ou les règles d'une nouvelle table, revient à compléter
+la déclaration, sans modifier ce moteur.
+"""
+
+import re
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from src.outils.fichiers_bruts import COLONNE_SOURCE_BASE
+
+
+# --------------------------------------------------------------------
+# Déclaration des règles
+# --------------------------------------------------------------------
+@dataclass
+class Suppression:
+    """
+    Supprime les lignes où toutes les colonnes sont manquantes ; avec
+    vides=True, une chaîne vide ou blanche compte aussi comme manquante.
+    """
+    colonnes: tuple
+    vides: bool = False
+
+    def masque(self, df: pd.DataFrame) -> pd.Series:
+        masque = pd.Series(True, index=df.index)
+        for colonne in self.colonnes:
+            manquantes = df[colonne].isna()
+            if self.vides:
+                manquantes |= df[colonne].astype(str).str.strip() == ""
+            masque &= manquantes
+        return masque
+
+    def message(self, nom_table: str) -> str:
+        return f"{nom_table} : {{}} ligne(s) sans {' ni '.join(self.colonnes)} supprimée(s)"
+
+
+@dataclass
+class Remplissage:
+    """
+    Complète colonne, là où elle est vide, par le premier groupe de motif
+    trouvé dans la colonne source (par exemple le numéro de BL cité dans la
+    désignation d'une ligne).
+    """
+    colonne: str
+    source: str
+    motif: re.Pattern
+
+    @property
+    def colonnes(self):
+        return (self.colonne, self.source)
+
+    def message(self, nom_table: str) -> str:
+        return f"{nom_table} : {{}} ligne(s) mise(s) à jour dans {self.colonne}"
+
+
+@dataclass
+class ReglesTable:
+    """
+    Règles de nettoyage d'une table, appliquées dans cet ordre :
+    - suppressions : Suppression, évaluées sur les valeurs brutes ;
+    - numeriques : {colonne: type}, converties par pd.to_numeric (valeurs
+      invalides → manquantes) puis vers le type ; une colonne absente est
+      signalée, et une conversion impossible met la table en erreur ;
+    - remplissages : Remplissage, sur les colonnes déjà converties ;
+    - conversions : {colonne: "datetime" ou type}, puis colonnes_monnaie
+      (montants, convertis en float) ; une conversion impossible est
+      signalée et ignorée.
+    dtype_lecture donne les types imposés à la lecture des fichiers bruts.
+    """
+    suppressions: list = field(default_factory=list)
+    numeriques: dict = field(default_factory=dict)
+    conversions: dict = field(default_factory=dict)
+    colonnes_monnaie: list = field(default_factory=list)
+    remplissages: list = field(default_factory=list)
+    dtype_lecture: dict = None
+
+    def colonnes(self) -> set:
+        """Colonnes lues ou modifiées par les règles de la table."""
+        colonnes = set(self.numeriques) | set(self.conversions) | set(self.colonnes_monnaie)
+        colonnes |= set(self.dtype_lecture or {})
+        for regle in self.suppressions + self.remplissages:
+            colonnes.update(regle.colonnes)
+        return colonnes
+
+    def conversions_finales(self) -> dict:
+        """Conversions déclarées, complétées par celles des colonnes monétaires."""
+        conversions = dict(self.conversions)
+        for colonne in self.colonnes_monnaie:
+            conversions.setdefault(colonne, "float")
+        return conversions
+
+
+# --------------------------------------------------------------------
+# Bilan des règles appliquées
+# --------------------------------------------------------------------
+class BilanNettoyage:
+    """
+    Messages du nettoyage d'une table. Les comptages sont cumulés d'un
+    morceau à l'autre et chaque message n'est affiché qu'une fois, à la fin,
+    dans l'ordre de sa première apparition.
+    """
+
+    def __init__(self):
+        self.messages = {}
+
+    def noter(self, message: str) -> None:
+        self.messages.setdefault(message, None)
+
+    def compter(self, modele: str, nombre: int) -> None:
+        """modele contient {} à la place du nombre cumulé."""
+        self.messages[modele] = (self.messages.get(modele) or 0) + int(nombre)
+
+    def lignes(self) -> list:
+        return [message if nombre is None else message.format(nombre)
+                for message, nombre in self.messages.items()]
+
+    def afficher(self) -> None:
+        for ligne in self.lignes():
+            print(ligne)
+
+
+# --------------------------------------------------------------------
+# Application des règles
+# --------------------------------------------------------------------
+def _applicable(regle, df: pd.DataFrame) -> bool:
+    return set(regle.colonnes).issubset(df.columns)
+
+
+def _lignes_vides(df: pd.DataFrame) -> pd.Series:
+    """Lignes entièrement nulles ou à zéro (la base d'origine n'est pas une donnée de la ligne)."""
+    donnees = df.drop(columns=[COLONNE_SOURCE_BASE], errors="ignore")
+    return (donnees.isna() | (donnees == 0)).all(axis=1)
+
+
+def _supprimer(df, nom_table, regles, bilan, filtres=()) -> pd.DataFrame:
+    """
+    Évalue toutes les suppressions sur df et les applique en une sélection.
+    Chaque suppression est créditée des lignes qu'aucune suppression
+    précédente n'a déjà retirées. Les lignes exclues par filtres (lignes
+    dont aucune étape suivante n'a besoin) sont retirées dans la même
+    sélection.
+    """
+    supprimees = _lignes_vides(df)
+    for suppression in regles.suppressions:
+        if not _applicable(suppression, df):
+            continue
+        masque = suppression.masque(df)
+        bilan.compter(suppression.message(nom_table), (masque & ~supprimees).sum())
+        supprimees |= masque
+    for filtre in filtres:
+        if filtre.colonne not in df.columns:
+            continue
+        masque = ~filtre.masque(df)
+        bilan.compter(f"{nom_table} : {{}} ligne(s) hors du filtre {filtre.description()} écartée(s)",
+                      (masque & ~supprimees).sum())
+        supprimees |= masque
+    return df.loc[~supprimees].copy()
+
+
+def _convertir_numeriques(df, nom_table, regles, bilan) -> None:
+    if not regles.numeriques:
+        return
+    bilan.noter(f"Conversion des types pour {nom_table}...")
+    for colonne, type_cible in regles.numeriques.items():
+        if colonne in df.columns:
+            # pd.to_numeric gère les chaînes comme "964.0" ; les valeurs
+            # invalides deviennent manquantes avant la conversion en type
+            # entier de pandas (qui accepte les nuls)
+            df[colonne] = pd.to_numeric(df[colonne], errors="coerce").astype(type_cible)
+            bilan.noter(f"  - Colonne '{colonne}' convertie en {type_cible}.")
+        else:
+            bilan.noter(f"  - AVERTISSEMENT : Colonne '{colonne}' non trouvée, conversion ignorée.")
+
+
+def _remplir(df, nom_table, regles, bilan) -> None:
+    for remplissage in regles.remplissages:
+        if not _applicable(remplissage, df):
+            continue
+        ancienne = df[remplissage.colonne]
+        vides = ancienne.isna() | (ancienne.astype(str).str.strip() == "")
+        nouvelle = ancienne.astype(object)
+        trouves = df.loc[vides, remplissage.source].astype(str).str.extract(
+            remplissage.motif, expand=False
+        )
+        trouves = trouves[trouves.notna()]
+        nouvelle.loc[trouves.index] = trouves
+        df[remplissage.colonne] = nouvelle
+        # Comparaison en object : une valeur manquante compte comme
+        # différente, y compris pour une colonne Int64 (pd.NA)
+        modifiees = (vides & (ancienne.astype(object) != nouvelle)).sum()
+        bilan.compter(remplissage.message(nom_table), modifiees)
+
+
+def _convertir(df, nom_table, regles, bilan) -> None:
+    for colonne, type_cible in regles.conversions_finales().items():
+        if colonne not in df.columns:
+            continue
+        try:
+            if type_cible == "datetime":
+                df[colonne] = pd.to_datetime(df[colonne], errors="coerce")
+            else:
+                df[colonne] = df[colonne].astype(type_cible)
+        except Exception as e:
+            bilan.noter(f"Erreur conversion {nom_table}.{colonne} : {e}")
+
+
+def appliquer_regles(df: pd.DataFrame, nom_table: str, regles: ReglesTable,
+                     bilan: BilanNettoyage, filtres=()) -> pd.DataFrame:
+    """
+    Applique les règles de nom_table à df (la table entière ou un morceau)
+    et renvoie les lignes conservées. Chaque règle ne dépend que de la ligne
+    traitée : nettoyer la table par morceaux donne les mêmes lignes que la
+    nettoyer d'un bloc. filtres (voir src.outils.besoins_colonnes) écarte
+    en plus les lignes dont les étapes suivantes n'ont pas besoin.
+    """
+    df = _supprimer(df, nom_table, regles, bilan, filtres)
+    _convertir_numeriques(df, nom_table, regles, bilan)
+    _remplir(df, nom_table, regles, bilan)
+    _convertir(df, nom_table, regles, bilan)
+    return df
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Règles de nettoyage des tables Sage, appliquées au staging par
+src.staging.regles_nettoyage. Ce module ne fait que les déclarer : il est
+aussi lu par l'extraction et le staging pour connaître les colonnes dont
+les règles ont besoin (voir src.outils.besoins_colonnes).
+"""
+
+import re
+
+from src.staging.regles_nettoyage import Remplissage, ReglesTable, Suppression
+
+regles_tables = {
+    "F_DOCENTETE": ReglesTable(
+        conversions={
+            "DO_DATE": "datetime",
+            "DO_DATELIVR": "datetime",
+        },
+        colonnes_monnaie=["FNT_TOTALHT"],
+    ),
+    "F_DOCLIGNE": ReglesTable(
+        # Lignes sans référence client ni fournisseur
+        suppressions=[Suppression(("AC_REFCLIENT", "AF_REFFOURNISS"), vides=True)],
+        numeriques={
+            "DL_QTE": "Int64",
+            "DL_QTEBC": "Int64",
+            "DL_PIECEBC": "Int64",  # Si ce sont des numéros, sinon retirer cette ligne
+            "DL_PIECEBL": "Int64",  # Si ce sont des numéros, sinon retirer cette ligne
+        },
+        # Numéro de BL cité dans la désignation (« LIVREES PAR BL N° 1234 »),
+        # pour les lignes dont DL_PIECEBL est vide
+        remplissages=[Remplissage("DL_PIECEBL", "DL_DESIGN", re.compile(
+            r"LIVREES?\s+PAR\s+BL\s*(?:N°?|N)?\s*(\d+)", flags=re.IGNORECASE
+        ))],
+        conversions={
+            "DL_DATEBL": "datetime",
+            "DL_DATEBC": "datetime",
+            "DL_DATEPL": "datetime",
+            "DL_QTE": "float",
+        },
+        colonnes_monnaie=["DL_PRIXUNITAIRE", "DL_MONTANTHT"],
+        dtype_lecture={
+            "AC_REFCLIENT": str,
+            "AF_REFFOURNISS": str
+        },
+    ),
+    "F_ARTFOURNISS": ReglesTable(
+        suppressions=[Suppression(("AF_REFFOURNISS",))],
+    ),
+}
+
+
+def regles_table(nom_table: str) -> ReglesTable:
+    """Règles de nom_table ; une table sans règle n'est débarrassée que de ses lignes vides."""
+    return regles_tables.get(nom_table) or ReglesTable()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Construction des dimensions du modèle en étoile par factorisation de la clé
+naturelle.
+
+pd.factorize numérote les valeurs distinctes de la clé naturelle d'une
+table générale, dans leur ordre d'apparition (ou dans l'ordre croissant,
+pour les dates) ; la clé de substitution d'un membre est ce numéro + 2, l'ID
+1 étant réservé au membre « Inconnu ». Le même passage donne, pour chaque
+ligne de la table générale, la clé étrangère de la table de faits (tableau
+int32, ID_INCONNU pour une clé manquante) : les faits se construisent sans
+jointure sur la table générale.
+
+Avec un registre de clés (src.transformation.registre_cles), les membres
+reçoivent les IDs que le registre leur a déjà attribués lors des générations
+précédentes, et les nouveaux membres les IDs suivants ; sans registre, ils
+sont numérotés comme ci-dessus. Le premier passage avec un registre vide
+donne donc les mêmes IDs que sans registre.
+
+Les attributs d'un membre sont ceux de la première ligne où sa clé apparaît,
+comme avec drop_duplicates(keep="first").
+"""
+
+import numpy as np
+import pandas as pd
+
+ID_INCONNU = 1
+
+
+class Dimension:
+    """
+    Dimension construite à partir des colonnes d'une table générale df.
+
+    - colonnes : {colonne de df : colonne de la dimension}, la première étant
+      la clé naturelle ;
+    - nom_id : colonne de la clé de substitution (dernière colonne) ;
+    - valeurs_inconnues : attributs du membre Inconnu (ID 1), dans l'ordre
+      des colonnes de la dimension ;
+    - trier : membres dans l'ordre croissant de la clé plutôt que dans leur
+      ordre d'apparition ;
+    - registre : registre des clés de la dimension (ClesDimension), pour des
+      IDs stables d'une génération à l'autre.
+
+    Attributs : table (DataFrame de la dimension), ids (clé de substitution
+    de chaque ligne de df, int32) et premieres (position dans df de la
+    première ligne de chaque membre).
+    """
+
+    def __init__(self, df: pd.DataFrame, colonnes: dict, nom_id: str, valeurs_inconnues: dict,
+                 trier: bool = False, registre=None):
+        cle = next(iter(colonnes))
+        codes, uniques = pd.factorize(df[cle], sort=trier)
+        membres, premieres = np.unique(codes, return_index=True)
+        self.premieres = premieres[membres >= 0]
+
+        if registre is None:
+            ids_membres = np.arange(2, len(uniques) + 2, dtype=np.int32)
+        else:
+            ids_membres = registre.attribuer(uniques)
+        self.ids = np.full(len(codes), ID_INCONNU, dtype=np.int32)
+        self.ids[codes >= 0] = ids_membres[codes[codes >= 0]]
+
+        base = df[list(colonnes)].iloc[self.premieres].rename(columns=colonnes)
+        self.table = pd.concat([pd.DataFrame([valeurs_inconnues]), base], ignore_index=True)
+        self.table[nom_id] = np.concatenate([np.array([ID_INCONNU], dtype=np.int32), ids_membres])
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def attribut_par_membre(self, valeurs, valeur_inconnu=ID_INCONNU) -> np.ndarray:
+        """
+        Valeur, pour chaque membre, d'un tableau aligné sur les lignes de df
+        (par exemple les ids d'une autre dimension) : celle de la première
+        ligne du membre, valeur_inconnu pour le membre Inconnu.
+        """
+        valeurs = np.asarray(valeurs)
+        return np.concatenate([np.array([valeur_inconnu], dtype=valeurs.dtype), valeurs[self.premieres]])
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Historisation des dimensions du modèle en étoile (dimension à évolution lente
+de type 2).
+
+Sans historisation, une dimension ne décrit que l'état courant de ses
+membres : un fournisseur qui déménage ou un article qui change de famille
+prend ses nouveaux attributs pour tous ses faits, y compris les anciens.
+Historisée, une dimension garde une version par état d'un membre, avec ses
+dates de validité : une empreinte de chaque ligne (hachage vectorisé des
+attributs suivis) est comparée à celle de la version courante du membre,
+enregistrée dans le registre des clés (src.transformation.registre_cles) ;
+seuls les membres dont l'empreinte a changé reçoivent une nouvelle version
+(nouvel ID, valide à partir de la date de génération), la précédente étant
+close à cette date.
+
+La première version d'un membre garde l'ID du membre et est valide depuis
+DEBUT_HISTORIQUE. Chaque ligne de fait reçoit la version valide à sa date.
+Les versions créées ou closes depuis le dernier chargement réussi (celles que
+src.chargement.vers_bdd n'a pas encore marquées chargées dans le registre)
+forment le delta de la dimension, seul rechargé dans la base : plusieurs
+générations successives sans chargement n'en perdent aucune.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from src.transformation.dimensions import ID_INCONNU
+
+DEBUT_HISTORIQUE = pd.Timestamp("1900-01-01")
+COLONNES_VALIDITE = ["date_debut_validite", "date_fin_validite", "version_courante"]
+
+
+def empreintes_lignes(df: pd.DataFrame, colonnes: list) -> np.ndarray:
+    """Empreinte (int64) des valeurs des colonnes de chaque ligne de df."""
+    textes = df[colonnes].astype("string").fillna("")
+    return pd.util.hash_pandas_object(textes, index=False).to_numpy().view(np.int64)
+
+
+def _version_par_date(versions: pd.DataFrame, membres: np.ndarray, dates: pd.Series) -> np.ndarray:
+    """
+    ID de la version valide à chaque date pour chaque membre (celle dont le
+    début est le plus récent avant la date ; la version courante pour une
+    date manquante) ; ID_INCONNU pour le membre Inconnu.
+    """
+    resultat = np.full(len(membres), ID_INCONNU, dtype=np.int32)
+    connus = membres != ID_INCONNU
+    dates = pd.to_datetime(pd.Series(dates).reset_index(drop=True)).astype("datetime64[ns]")
+    lignes = pd.DataFrame({
+        "membre": membres[connus].astype(np.int64),
+        "date": dates[connus].fillna(pd.Timestamp.max).to_numpy(),
+        "position": np.flatnonzero(connus),
+    }).sort_values("date", kind="stable")
+    debuts = versions[["membre", "id", "debut"]].astype({"membre": np.int64, "debut": "datetime64[ns]"})
+    debuts = debuts.sort_values(["debut", "id"], kind="stable")
+    trouvees = pd.merge_asof(lignes, debuts, left_on="date", right_on="debut", by="membre", direction="backward")
+    # date antérieure à toutes les versions : première version (ID du membre)
+    resultat[trouvees["position"].to_numpy()] = trouvees["id"].fillna(trouvees["membre"]).to_numpy(np.int32)
+    return resultat
+
+
+class DimensionHistorisee:
+    """
+    Historisation d'une table de dimension (membre Inconnu en première ligne,
+    colonne nom_id des IDs des membres) dans le registre de la dimension
+    (ClesDimension).
+
+    - ids : ID du membre de chaque ligne de la table générale (Dimension.ids) ;
+    - dates : date de chaque ligne de la table générale, pour choisir la
+      version de ses faits ;
+    - attributs : colonnes suivies (par défaut, toutes sauf nom_id).
+
+    Attributs : table (toutes les versions, avec COLONNES_VALIDITE), ids
+    (version de chaque ligne de la table générale) et delta (versions pas
+    encore chargées dans la base, avec le membre Inconnu tant qu'aucune ne
+    l'a été).
+    """
+
+    def __init__(self, registre, table: pd.DataFrame, nom_id: str, ids, dates,
+                 attributs=None, date_generation=None):
+        if attributs is None:
+            attributs = [c for c in table.columns if c != nom_id]
+        date_generation = pd.Timestamp(date_generation or pd.Timestamp.today()).normalize()
+        registre_complet, nom = registre.registre, registre.nom
+
+        membres = table.iloc[1:]
+        ids_membres = membres[nom_id].to_numpy()
+        empreintes = empreintes_lignes(membres, attributs)
+
+        anciennes = registre_complet.versions(nom)
+        ouvertes = anciennes[anciennes["fin"].isna()]
+        positions = pd.Index(ouvertes["membre"]).get_indexer(ids_membres)
+        nouveaux = positions < 0
+        modifies = np.zeros(len(positions), dtype=bool)
+        modifies[~nouveaux] = ouvertes["empreinte"].to_numpy()[positions[~nouveaux]] != empreintes[~nouveaux]
+
+        a_enregistrer = np.flatnonzero(nouveaux | modifies)
+        valeurs = json.loads(membres[attributs].iloc[a_enregistrer].to_json(orient="records", date_format="iso"))
+        fermetures = [(i, date_generation) for i in ouvertes["id"].to_numpy()[positions[modifies]]]
+        nouvelles = [
+            (ids_membres[i], empreintes[i], date_generation if modifies[i] else DEBUT_HISTORIQUE, v, bool(modifies[i]))
+            for i, v in zip(a_enregistrer, valeurs)
+        ]
+        registre_complet.enregistrer_versions(nom, fermetures, nouvelles)
+
+        versions = registre_complet.versions(nom)
+        courantes = versions[versions["fin"].isna()].set_index("membre")
+        positions = courantes.index.get_indexer(ids_membres)
+
+        # versions courantes des membres présents : attributs de la table
+        lignes_courantes = membres.copy()
+        lignes_courantes[nom_id] = courantes["id"].to_numpy()[positions]
+        lignes_courantes[COLONNES_VALIDITE[0]] = courantes["debut"].to_numpy()[positions]
+        # autres versions (closes, ou de membres absents) : attributs enregistrés
+        autres = versions[~versions["id"].isin(lignes_courantes[nom_id])]
+        lignes_autres = pd.DataFrame(list(autres["attributs"]), columns=attributs)
+        for colonne in attributs:
+            lignes_autres[colonne] = self._type_de(lignes_autres[colonne], table[colonne])
+        lignes_autres[nom_id] = autres["id"].to_numpy()
+        lignes_autres[COLONNES_VALIDITE[0]] = autres["debut"].to_numpy()
+        lignes_autres[COLONNES_VALIDITE[1]] = autres["fin"].to_numpy()
+
+        inconnu = table.iloc[:1].copy()
+        inconnu[COLONNES_VALIDITE[0]] = DEBUT_HISTORIQUE
+        colonnes = list(table.columns) + COLONNES_VALIDITE
+        self.table = pd.concat([inconnu, lignes_courantes, lignes_autres], ignore_index=True)
+        self.table[COLONNES_VALIDITE[1]] = pd.to_datetime(self.table.get(COLONNES_VALIDITE[1]))
+        self.table[COLONNES_VALIDITE[2]] = self.table[COLONNES_VALIDITE[1]].isna()
+        self.table = self.table[colonnes]
+
+        a_charger = set(versions.loc[~versions["chargee"], "id"].tolist())
+        if not versions["chargee"].any():
+            a_charger.add(ID_INCONNU)
+        self.delta = self.table[self.table[nom_id].isin(a_charger)].reset_index(drop=True)
+        self.nouvelles_versions = int(modifies.sum())
+        self.ids = _version_par_date(versions, np.asarray(ids), dates)
+
+    @staticmethod
+    def _type_de(valeurs: pd.Series, modele: pd.Series) -> pd.Series:
+        """Valeurs relues du registre, converties si possible au type de la colonne modele."""
+        if pd.api.types.is_datetime64_any_dtype(modele):
+            return pd.to_datetime(valeurs, errors="coerce")
+        try:
+            return valeurs.astype(modele.dtype)
+        except (TypeError, ValueError):
+            return valeurs
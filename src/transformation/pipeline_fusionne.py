@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Transformation fusionnée : tables générales et modèle en étoile dans le même
+processus.
+
+Les tables générales construites par src.chargement.vers_csv sont passées
+directement, en mémoire, aux constructeurs du modèle en étoile de
+src.transformation.structuration_etoile, sans être écrites puis relues (et
+leurs dates et nombres ré-analysés). Elles reçoivent les valeurs et les
+types qu'une relecture leur aurait donnés : le modèle en étoile est le même
+qu'avec les deux étapes séparées.
+
+Avec TABLES_GENERALES_DEBUG=1, les tables générales sont aussi écrites dans
+data_lake/processed, pour inspection.
+
+Un modèle n'est reconstruit que si les tables de staging dont il dépend, ou
+les paramètres de génération (REGISTRE_CLES, DIMENSIONS_HISTORISEES), ont
+changé depuis sa dernière génération.
+
+    python -m src.transformation.pipeline_fusionne
+"""
+
+import logging
+import os
+
+from src.outils.chemins import (
+    chemin_etat_modele_etoile, chemin_etat_staging_sage, chemin_etat_tables_generales
+)
+from src.outils.manifeste import SuiviEmpreintes, empreintes_etape
+from src.chargement.vers_csv import (
+    cache_staging, construire_achats_simplifie, construire_ventes_simplifie,
+    ecrire_achats_simplifie, ecrire_ventes_simplifie, precharger_staging,
+    tables_sources_generales,
+)
+from src.transformation.structuration_etoile import (
+    SOURCE_PARAMETRES, generer_csv_achats_star, generer_csv_ventes_star, signature_parametres,
+    sorties_modele
+)
+
+# Écriture des tables générales, pour inspection uniquement
+ecrire_tables_generales = os.environ.get("TABLES_GENERALES_DEBUG", "0") == "1"
+
+
+def main():
+    empreintes_staging = empreintes_etape(chemin_etat_staging_sage)
+    empreintes_modele = dict(empreintes_staging, **{SOURCE_PARAMETRES: signature_parametres()})
+    suivi = SuiviEmpreintes(chemin_etat_modele_etoile, empreintes_modele)
+    suivi_generales = SuiviEmpreintes(chemin_etat_tables_generales, empreintes_staging)
+    modeles = [
+        ("ventes", "tabla_generale_ventes", construire_ventes_simplifie, ecrire_ventes_simplifie,
+         generer_csv_ventes_star),
+        ("achats", "tabla_generale_achats", construire_achats_simplifie, ecrire_achats_simplifie,
+         generer_csv_achats_star),
+    ]
+
+    a_generer = []
+    for modele in modeles:
+        libelle, cle = modele[:2]
+        sources = tables_sources_generales[cle] + [SOURCE_PARAMETRES]
+        if suivi.inchange(libelle, sources, sorties_modele(libelle)):
+            logging.info(f"Modèle {libelle.upper()} inchangé (tables de staging et paramètres identiques), génération sautée.")
+        else:
+            a_generer.append(modele)
+
+    precharger_staging([cle for _, cle, _, _, _ in a_generer])
+    try:
+        for i, (libelle, cle, construire, ecrire, generer_etoile) in enumerate(a_generer):
+            if i:
+                print("-" * 60)
+            sources = tables_sources_generales[cle]
+            try:
+                df = construire()
+                if ecrire_tables_generales:
+                    ecrire(df)
+                    suivi_generales.enregistrer(cle, sources)
+                if generer_etoile(df):
+                    suivi.enregistrer(libelle, sources + [SOURCE_PARAMETRES])
+            except Exception as e:
+                logging.error(f"Erreur lors de la génération du modèle {libelle.upper()} : {e}", exc_info=True)
+    finally:
+        cache_staging.fermer()
+        cache_staging.vider()
+        suivi.sauver()
+        if ecrire_tables_generales:
+            suivi_generales.sauver()
+    logging.info("Toutes les opérations sont terminées.")
+
+
+if __name__ == "__main__":
+    main()
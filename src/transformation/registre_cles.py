@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Registre persistant des clés de substitution des dimensions.
+
+Sans registre, les membres d'une dimension sont renumérotés à chaque
+génération du modèle en étoile : un nouvel article ou une nouvelle date
+décale les IDs de tous les membres suivants, et chaque chargement réécrit
+toutes les lignes des dimensions et des faits. Le registre (une base SQLite,
+data_lake/processed/_registre_cles.sqlite) garde, pour chaque dimension, la
+correspondance clé naturelle → ID : un membre déjà connu garde son ID, seuls
+les nouveaux membres en reçoivent un (à la suite du plus grand ID attribué).
+L'ID 1 reste réservé au membre « Inconnu ».
+
+Le registre peut être amorcé avec les IDs déjà présents dans la base cible
+(python -m src.chargement.vers_bdd --amorcer-registre), pour que les
+prochaines générations reprennent ces IDs.
+
+Les clés sont enregistrées sous forme de texte : les dates sous la forme
+AAAA-MM-JJ (AAAA-MM-JJTHH:MM:SS si elles ont une heure).
+
+Le registre garde aussi les versions des dimensions historisées (voir
+src.transformation.historisation) : les IDs de leurs versions sont pris dans
+la même suite que ceux des membres. Une version est marquée chargée une fois
+envoyée dans la base (src.chargement.vers_bdd) ; elle redevient à charger
+quand elle est close.
+"""
+
+import json
+import sqlite3
+from contextlib import closing
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from src.transformation.dimensions import ID_INCONNU
+
+
+def texte_cle(valeur) -> str:
+    """Forme texte, enregistrée dans le registre, d'une clé naturelle."""
+    if isinstance(valeur, (pd.Timestamp, datetime)):
+        valeur = pd.Timestamp(valeur)
+        if valeur == valeur.normalize():
+            return valeur.strftime("%Y-%m-%d")
+        return valeur.isoformat()
+    if isinstance(valeur, date):
+        return valeur.isoformat()
+    if isinstance(valeur, (float, np.floating)) and float(valeur).is_integer():
+        return str(int(valeur))
+    return str(valeur)
+
+
+class RegistreCles:
+    """Correspondances clé naturelle → ID de toutes les dimensions, dans le fichier chemin."""
+
+    def __init__(self, chemin):
+        self.chemin = chemin
+
+    def _connexion(self) -> sqlite3.Connection:
+        connexion = sqlite3.connect(str(self.chemin))
+        connexion.execute(
+            "CREATE TABLE IF NOT EXISTS cles ("
+            " dimension TEXT NOT NULL, cle TEXT NOT NULL, id INTEGER NOT NULL,"
+            " PRIMARY KEY (dimension, cle))"
+        )
+        connexion.execute("CREATE UNIQUE INDEX IF NOT EXISTS cles_id ON cles (dimension, id)")
+        connexion.execute(
+            "CREATE TABLE IF NOT EXISTS versions ("
+            " dimension TEXT NOT NULL, id INTEGER NOT NULL, membre INTEGER NOT NULL,"
+            " empreinte INTEGER NOT NULL, debut TEXT NOT NULL, fin TEXT, attributs TEXT NOT NULL,"
+            " chargee INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (dimension, id))"
+        )
+        colonnes = [ligne[1] for ligne in connexion.execute("PRAGMA table_info(versions)")]
+        if "chargee" not in colonnes:
+            # Registre antérieur au suivi des chargements : toutes ses versions sont à charger
+            connexion.execute("ALTER TABLE versions ADD COLUMN chargee INTEGER NOT NULL DEFAULT 0")
+        return connexion
+
+    @staticmethod
+    def _id_suivant(connexion: sqlite3.Connection, nom: str) -> int:
+        """Premier ID libre de la dimension nom (membres et versions)."""
+        ids = [ID_INCONNU]
+        for table in ("cles", "versions"):
+            maximum = connexion.execute(f"SELECT MAX(id) FROM {table} WHERE dimension = ?", (nom,)).fetchone()[0]
+            if maximum is not None:
+                ids.append(maximum)
+        return max(ids) + 1
+
+    def dimension(self, nom: str) -> "ClesDimension":
+        """Registre d'une dimension (nom : schema.table, par exemple ventes.dim_client)."""
+        return ClesDimension(self, nom)
+
+    def correspondances(self, nom: str) -> dict:
+        """Clé (texte) → ID des membres enregistrés de la dimension nom."""
+        with closing(self._connexion()) as connexion:
+            return dict(connexion.execute("SELECT cle, id FROM cles WHERE dimension = ?", (nom,)))
+
+    def attribuer(self, nom: str, cles) -> np.ndarray:
+        """
+        IDs (int32) des clés naturelles cles de la dimension nom (valeurs
+        distinctes, non manquantes) ; les clés inconnues du registre y sont
+        ajoutées avec de nouveaux IDs.
+        """
+        textes = [texte_cle(c) for c in cles]
+        with closing(self._connexion()) as connexion, connexion:
+            connues = dict(connexion.execute("SELECT cle, id FROM cles WHERE dimension = ?", (nom,)))
+            suivant = self._id_suivant(connexion, nom)
+            nouvelles = []
+            for texte in textes:
+                if texte not in connues:
+                    connues[texte] = suivant
+                    nouvelles.append((nom, texte, suivant))
+                    suivant += 1
+            connexion.executemany("INSERT INTO cles (dimension, cle, id) VALUES (?, ?, ?)", nouvelles)
+        return np.array([connues[t] for t in textes], dtype=np.int32)
+
+    def amorcer(self, nom: str, cles, ids) -> int:
+        """
+        Enregistre les correspondances cles → ids de la dimension nom lues
+        dans la base cible, qui font foi : elles remplacent celles des mêmes
+        clés, et celles d'autres clés ayant reçu les mêmes IDs. Le membre
+        Inconnu (ID 1) est ignoré. Renvoie le nombre de correspondances
+        enregistrées.
+        """
+        paires = {}
+        for cle, id_ in zip(cles, ids):
+            if cle is None or pd.isna(cle) or id_ is None or pd.isna(id_) or int(id_) == ID_INCONNU:
+                continue
+            paires[texte_cle(cle)] = int(id_)
+        lignes = [(nom, texte, id_) for texte, id_ in paires.items()]
+        with closing(self._connexion()) as connexion, connexion:
+            connexion.executemany("DELETE FROM cles WHERE dimension = ? AND (cle = ? OR id = ?)", lignes)
+            connexion.executemany("INSERT OR REPLACE INTO cles (dimension, cle, id) VALUES (?, ?, ?)", lignes)
+        return len(lignes)
+
+    def versions(self, nom: str) -> pd.DataFrame:
+        """
+        Versions enregistrées de la dimension nom : id, membre (ID du membre),
+        empreinte, debut, fin (NaT pour la version courante), attributs
+        (dictionnaire) et chargee (vrai si la version est à jour dans la base).
+        """
+        with closing(self._connexion()) as connexion:
+            lignes = connexion.execute(
+                "SELECT id, membre, empreinte, debut, fin, attributs, chargee FROM versions"
+                " WHERE dimension = ? ORDER BY id", (nom,)
+            ).fetchall()
+        versions = pd.DataFrame(lignes, columns=["id", "membre", "empreinte", "debut", "fin", "attributs", "chargee"])
+        versions["debut"] = pd.to_datetime(versions["debut"])
+        versions["fin"] = pd.to_datetime(versions["fin"])
+        versions["attributs"] = [json.loads(a) for a in versions["attributs"]]
+        versions["chargee"] = versions["chargee"].astype(bool)
+        return versions
+
+    def enregistrer_versions(self, nom: str, fermetures, nouvelles) -> np.ndarray:
+        """
+        Clôt les versions fermetures ((id, fin)) de la dimension nom (qui
+        redeviennent à charger) et ajoute
+        les versions nouvelles ((membre, empreinte, debut, attributs, nouvel_id)) :
+        une nouvelle version garde l'ID du membre si nouvel_id est faux, et
+        reçoit sinon le premier ID libre. Renvoie les IDs des nouvelles
+        versions.
+        """
+        ids = []
+        with closing(self._connexion()) as connexion, connexion:
+            connexion.executemany(
+                "UPDATE versions SET fin = ?, chargee = 0 WHERE dimension = ? AND id = ?",
+                [(texte_cle(fin), nom, int(id_)) for id_, fin in fermetures],
+            )
+            suivant = self._id_suivant(connexion, nom)
+            lignes = []
+            for membre, empreinte, debut, attributs, nouvel_id in nouvelles:
+                if nouvel_id:
+                    id_, suivant = suivant, suivant + 1
+                else:
+                    id_ = int(membre)
+                ids.append(id_)
+                lignes.append((nom, id_, int(membre), int(empreinte), texte_cle(debut),
+                               json.dumps(attributs, ensure_ascii=False, default=str)))
+            connexion.executemany(
+                "INSERT INTO versions (dimension, id, membre, empreinte, debut, fin, attributs)"
+                " VALUES (?, ?, ?, ?, ?, NULL, ?)", lignes
+            )
+        return np.array(ids, dtype=np.int32)
+
+    def marquer_chargees(self, nom: str, ids) -> None:
+        """Marque chargées dans la base les versions ids de la dimension nom."""
+        with closing(self._connexion()) as connexion, connexion:
+            connexion.executemany(
+                "UPDATE versions SET chargee = 1 WHERE dimension = ? AND id = ?",
+                [(nom, int(id_)) for id_ in ids]
+            )
+
+
+class ClesDimension:
+    """Registre d'une seule dimension, passé à Dimension (src.transformation.dimensions)."""
+
+    def __init__(self, registre: RegistreCles, nom: str):
+        self.registre = registre
+        self.nom = nom
+
+    def attribuer(self, cles) -> np.ndarray:
+        return self.registre.attribuer(self.nom, cles)
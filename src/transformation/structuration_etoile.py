@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import json
 import logging
 import pandas as pd
 import os
@@ -8,12 +9,32 @@ import sys
 
 # Assurez-vous que le chemin vers src est correct
 try:
-    from src.outils.chemins import dossier_datalake_processed
+    from src.outils.chemins import (
+        dossier_datalake_processed, chemin_etat_tables_generales, chemin_etat_modele_etoile,
+        chemin_registre_cles
+    )
+    from src.outils.manifeste import SuiviEmpreintes, empreintes_etape
+    from src.models.types_lecture import schema_fichier
+    from src.outils.stockage_lac import chemin_table, conformer_table, ecrire_table, lire_table
+    from src.outils.partitions import ecrire_faits, sortie_faits
+    from src.transformation.dimensions import Dimension
+    from src.transformation.registre_cles import RegistreCles
+    from src.transformation.historisation import DimensionHistorisee
 except ImportError:
     # Chemin de repli si le script est exécuté depuis un autre répertoire
     projet_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     sys.path.insert(0, projet_root)
-    from src.outils.chemins import dossier_datalake_processed
+    from src.outils.chemins import (
+        dossier_datalake_processed, chemin_etat_tables_generales, chemin_etat_modele_etoile,
+        chemin_registre_cles
+    )
+    from src.outils.manifeste import SuiviEmpreintes, empreintes_etape
+    from src.models.types_lecture import schema_fichier
+    from src.outils.stockage_lac import chemin_table, conformer_table, ecrire_table, lire_table
+    from src.outils.partitions import ecrire_faits, sortie_faits
+    from src.transformation.dimensions import Dimension
+    from src.transformation.registre_cles import RegistreCles
+    from src.transformation.historisation import DimensionHistorisee
 
 # Configuration du logger
 logging.basicConfig(
@@ -23,7 +44,8 @@ logging.basicConfig(
 )
 
 # --- CONSTANTES POUR LA GESTION DES VALEURS INCONNUES (en français) ---
-ID_INCONNU = 1
+# (l'ID du membre Inconnu de chaque dimension, 1, est ID_INCONNU de
+# src/transformation/dimensions.py)
 VALEUR_TEXTE_INCONNU = "Inconnu"
 VALEUR_CODE_INCONNU = "INC" # Pour "Inconnu"
 DATE_INCONNUE = pd.Timestamp('1900-01-01')
@@ -35,15 +57,80 @@ ACHATS_DIR = os.path.join(dossier_datalake_processed, "achats")
 os.makedirs(VENTES_DIR, exist_ok=True)
 os.makedirs(ACHATS_DIR, exist_ok=True)
 
+# IDs des dimensions conservés d'une génération à l'autre (REGISTRE_CLES=0 :
+# membres renumérotés à chaque génération)
+utiliser_registre_cles = os.environ.get("REGISTRE_CLES", "1") == "1"
+
+def registre_dimension(nom):
+    """Registre des clés de la dimension nom (schema.table), ou None sans registre."""
+    if not utiliser_registre_cles:
+        return None
+    return RegistreCles(chemin_registre_cles).dimension(nom)
+
+# Versions des clients, fournisseurs et articles conservées (SCD de type 2),
+# avec leurs dates de validité ; nécessite le registre des clés
+historiser_dimensions = os.environ.get("DIMENSIONS_HISTORISEES", "0") == "1"
+if historiser_dimensions and not utiliser_registre_cles:
+    logging.warning("DIMENSIONS_HISTORISEES=1 nécessite REGISTRE_CLES=1 : dimensions non historisées.")
+    historiser_dimensions = False
+
+# Dimensions historisées de chaque modèle (leurs <table>_delta sont des sorties du modèle)
+DIMENSIONS_HISTORISEES = {
+    "ventes": ["ventes.dim_client", "ventes.dim_article"],
+    "achats": ["achats.dim_article", "achats.dim_fournisseur"],
+}
+
+# Paramètres de génération, source de plus de chaque modèle : changer
+# REGISTRE_CLES ou DIMENSIONS_HISTORISEES fait régénérer les modèles
+SOURCE_PARAMETRES = "_parametres/modele_etoile"
+
+def signature_parametres():
+    """Signature des paramètres dont dépend le contenu du modèle en étoile."""
+    return json.dumps({"registre_cles": utiliser_registre_cles,
+                       "dimensions_historisees": historiser_dimensions}, sort_keys=True)
+
+def sorties_modele(libelle):
+    """Sorties attendues du modèle libelle (ventes ou achats)."""
+    dossier = VENTES_DIR if libelle == "ventes" else ACHATS_DIR
+    sorties = [sortie_faits(dossier, f"fact_{libelle}")]
+    if historiser_dimensions:
+        for nom in DIMENSIONS_HISTORISEES[libelle]:
+            schema, nom_table = nom.split('.')
+            sorties.append(chemin_table(os.path.join(dossier_datalake_processed, schema), f"{nom_table}_delta"))
+    return sorties
+
+def historiser(nom, table, nom_id, ids, dates):
+    """
+    Avec DIMENSIONS_HISTORISEES=1, historise la dimension nom (schema.table),
+    écrit ses versions pas encore chargées dans la base (<table>_delta) et renvoie la table
+    de toutes ses versions et la version de chaque ligne de la table
+    générale, choisie d'après dates. Sinon, renvoie table et ids.
+    """
+    if not historiser_dimensions:
+        return table, ids
+    schema, nom_table = nom.split('.')
+    dimension = DimensionHistorisee(registre_dimension(nom), table, nom_id, ids, dates)
+    ecrire_table(dimension.delta, chemin_table(os.path.join(dossier_datalake_processed, schema), f"{nom_table}_delta"))
+    logging.info(f"{nom} : {len(dimension.delta)} versions à charger "
+                 f"({dimension.nouvelles_versions} membres modifiés).")
+    return dimension.table, dimension.ids
+
 # --- Fonctions Utilitaires ---
-def charger_et_nettoyer_csv(chemin_fichier, dates_a_parser=None, dayfirst_format=False):
-    """Charge un CSV, normalise les noms de colonnes et gère les erreurs."""
+def charger_et_nettoyer_csv(chemin_fichier, dayfirst_format=False):
+    """
+    Charge une table générale (CSV ou Parquet, voir src.outils.stockage_lac),
+    normalise les noms de colonnes et gère les erreurs. Les colonnes sont
+    lues dans les types des colonnes du modèle dont elles proviennent
+    (src.models.types_lecture), les autres en texte ; dayfirst_format ne
+    concerne que la lecture des dates d'un CSV.
+    """
+    nom = os.path.splitext(os.path.basename(chemin_fichier))[0]
     try:
-        df = pd.read_csv(
+        df = lire_table(
             chemin_fichier,
-            parse_dates=dates_a_parser,
+            schema=schema_fichier(nom),
+            texte_par_defaut=True,
             encoding='utf-8-sig',
-            low_memory=False,
             dayfirst=dayfirst_format
         )
         df.columns = df.columns.str.strip()
@@ -53,221 +140,204 @@ def charger_et_nettoyer_csv(chemin_fichier, dates_a_parser=None, dayfirst_format
         logging.error(f"Le fichier '{os.path.basename(chemin_fichier)}' n'a pas été trouvé. Processus interrompu.")
         return None
 
-def creer_dimension_avec_inconnu(df_base, nom_id, valeurs_inconnues):
+def preparer_table_generale(df, nom, dayfirst_format=False):
     """
-    Ajoute une ligne 'Inconnu' à un DataFrame de dimension et lui assigne un ID.
+    Prépare une table générale construite en mémoire (pipeline fusionné,
+    voir src.transformation.pipeline_fusionne) : elle reçoit les valeurs et
+    les types qu'elle aurait eus après écriture puis charger_et_nettoyer_csv.
     """
-    df_inconnu = pd.DataFrame([valeurs_inconnues])
-    df_final = pd.concat([df_inconnu, df_base], ignore_index=True)
-    df_final[nom_id] = df_final.index + 1
-    return df_final
+    df = conformer_table(df, schema_fichier(nom), texte_par_defaut=True, dayfirst=dayfirst_format)
+    logging.info(f"Table générale '{nom}' reçue en mémoire avec {len(df)} lignes.")
+    return df
 
 # =============================================================================
 # MODÈLE EN ÉTOILE POUR LES VENTES
 # =============================================================================
-def generer_csv_ventes_star():
+def generer_csv_ventes_star(df=None):
+    """
+    Modèle en étoile des ventes, à partir du fichier de la table générale ou
+    de la table df construite en mémoire.
+    """
     logging.info("Génération du modèle en étoile pour les VENTES...")
-    df = charger_et_nettoyer_csv(os.path.join(dossier_datalake_processed, 'tabla_generale_ventes.csv'), dates_a_parser=['Date BL', 'date facture'])
-    if df is None: return
+    if df is None:
+        df = charger_et_nettoyer_csv(chemin_table(dossier_datalake_processed, 'tabla_generale_ventes'))
+    else:
+        df = preparer_table_generale(df, 'tabla_generale_ventes')
+    if df is None: return False
 
     # --- 1. Dimension: dim_famillesarticles ---
     logging.info("Création de ventes/dim_famillesarticles.csv")
-    dim_fam_base = df[['Code Famille', 'famille article libellé', 'sous-famille article libellé']].rename(columns={'Code Famille': 'code_famille', 'famille article libellé': 'libelle_famille', 'sous-famille article libellé': 'libelle_sous_famille'}).dropna(subset=['code_famille']).drop_duplicates(subset=['code_famille']).reset_index(drop=True)
     valeurs_inconnues_fam = {'code_famille': VALEUR_CODE_INCONNU, 'libelle_famille': VALEUR_TEXTE_INCONNU, 'libelle_sous_famille': VALEUR_TEXTE_INCONNU}
-    dim_fam = creer_dimension_avec_inconnu(dim_fam_base, 'id_famille', valeurs_inconnues_fam)
-    dim_fam.to_csv(os.path.join(VENTES_DIR, 'dim_famillesarticles.csv'), index=False, encoding='utf-8-sig')
+    dim_fam = Dimension(df, {'Code Famille': 'code_famille', 'famille article libellé': 'libelle_famille', 'sous-famille article libellé': 'libelle_sous_famille'}, 'id_famille', valeurs_inconnues_fam,
+                        registre=registre_dimension('ventes.dim_famillesarticles'))
+    ecrire_table(dim_fam.table, chemin_table(VENTES_DIR, 'dim_famillesarticles'))
 
     # --- 2. Dimension: dim_article (dépend de dim_famillesarticles) ---
     logging.info("Création de ventes/dim_article.csv")
-    dim_article_base = df[['code article', 'Désignation', 'Code Famille']].rename(columns={'code article': 'code_article', 'Désignation': 'designation', 'Code Famille': 'code_famille'}).dropna(subset=['code_article']).drop_duplicates(subset=['code_article']).reset_index(drop=True)
-    dim_article_base = dim_article_base.merge(dim_fam[['code_famille', 'id_famille']], on='code_famille', how='left')
-    dim_article_base['id_famille'].fillna(ID_INCONNU, inplace=True) # Gérer les articles sans famille
-    
-    valeurs_inconnues_art = {'code_article': VALEUR_CODE_INCONNU, 'designation': VALEUR_TEXTE_INCONNU, 'id_famille': ID_INCONNU}
-    dim_article = creer_dimension_avec_inconnu(dim_article_base.drop(columns=['code_famille']), 'dim_article_id', valeurs_inconnues_art)
-    dim_article['id_famille'] = dim_article['id_famille'].astype('Int64')
-    dim_article[['dim_article_id', 'code_article', 'designation', 'id_famille']].to_csv(os.path.join(VENTES_DIR, 'dim_article.csv'), index=False, encoding='utf-8-sig')
+    valeurs_inconnues_art = {'code_article': VALEUR_CODE_INCONNU, 'designation': VALEUR_TEXTE_INCONNU}
+    dim_article = Dimension(df, {'code article': 'code_article', 'Désignation': 'designation'}, 'dim_article_id', valeurs_inconnues_art,
+                            registre=registre_dimension('ventes.dim_article'))
+    # Famille de la première ligne de chaque article (Inconnu pour les articles sans famille)
+    dim_article.table['id_famille'] = dim_article.attribut_par_membre(dim_fam.ids)
+    table_article, ids_article = historiser('ventes.dim_article', dim_article.table[['dim_article_id', 'code_article', 'designation', 'id_famille']],
+                                            'dim_article_id', dim_article.ids, df['Date BL'])
+    ecrire_table(table_article, chemin_table(VENTES_DIR, 'dim_article'))
 
     # --- 3. Dimension: dim_client ---
     logging.info("Création de ventes/dim_client.csv")
-    dim_client_base = df[['Code client', 'Raison sociale']].rename(columns={'Code client': 'code_client', 'Raison sociale': 'raison_sociale'}).dropna(subset=['code_client']).drop_duplicates(subset=['code_client']).reset_index(drop=True)
     valeurs_inconnues_cli = {'code_client': VALEUR_CODE_INCONNU, 'raison_sociale': VALEUR_TEXTE_INCONNU, 'famille_client': VALEUR_TEXTE_INCONNU, 'responsable_dossier': VALEUR_TEXTE_INCONNU, 'representant': VALEUR_TEXTE_INCONNU}
-    for col in valeurs_inconnues_cli.keys():
-        if col not in dim_client_base.columns:
-            dim_client_base[col] = pd.NA
-    dim_client = creer_dimension_avec_inconnu(dim_client_base, 'dim_client_id', valeurs_inconnues_cli)
-    dim_client.to_csv(os.path.join(VENTES_DIR, 'dim_client.csv'), index=False, encoding='utf-8-sig')
+    dim_client = Dimension(df, {'Code client': 'code_client', 'Raison sociale': 'raison_sociale'}, 'dim_client_id', valeurs_inconnues_cli,
+                           registre=registre_dimension('ventes.dim_client'))
+    table_client, ids_client = historiser('ventes.dim_client', dim_client.table, 'dim_client_id', dim_client.ids, df['Date BL'])
+    ecrire_table(table_client, chemin_table(VENTES_DIR, 'dim_client'))
 
     # --- 4. Dimension: dim_temps ---
     logging.info("Création de ventes/dim_temps.csv")
-    dates = pd.to_datetime(df['Date BL'], errors='coerce').dropna().unique()
-    dim_temps_base = pd.DataFrame({'date_cle': dates}).sort_values('date_cle').reset_index(drop=True)
     valeurs_inconnues_tps = {'date_cle': DATE_INCONNUE}
-    dim_temps = creer_dimension_avec_inconnu(dim_temps_base, 'dim_temps_id', valeurs_inconnues_tps)
-    dim_temps['annee'] = dim_temps['date_cle'].dt.year
-    dim_temps['mois'] = dim_temps['date_cle'].dt.month
-    dim_temps['jour'] = dim_temps['date_cle'].dt.day
-    dim_temps.to_csv(os.path.join(VENTES_DIR, 'dim_temps.csv'), index=False, encoding='utf-8-sig')
+    dim_temps = Dimension(df, {'Date BL': 'date_cle'}, 'dim_temps_id', valeurs_inconnues_tps, trier=True,
+                          registre=registre_dimension('ventes.dim_temps'))
+    dim_temps.table['annee'] = dim_temps.table['date_cle'].dt.year
+    dim_temps.table['mois'] = dim_temps.table['date_cle'].dt.month
+    dim_temps.table['jour'] = dim_temps.table['date_cle'].dt.day
+    ecrire_table(dim_temps.table, chemin_table(VENTES_DIR, 'dim_temps'))
 
     # --- Table des Faits : Ventes ---
+    # Les clés étrangères sont celles calculées avec les dimensions : ni
+    # jointure ni copie de la table générale
     logging.info("Construction de fact_ventes...")
-    fact = df.copy()
-    fact = fact.merge(dim_client[['code_client', 'dim_client_id']], left_on='Code client', right_on='code_client', how='left')
-    fact = fact.merge(dim_article[['code_article', 'dim_article_id']], left_on='code article', right_on='code_article', how='left')
-    fact = fact.merge(dim_temps[['date_cle', 'dim_temps_id']], left_on='Date BL', right_on='date_cle', how='left')
-    
-    fact['dim_client_id'].fillna(ID_INCONNU, inplace=True)
-    fact['dim_article_id'].fillna(ID_INCONNU, inplace=True)
-    fact['dim_temps_id'].fillna(ID_INCONNU, inplace=True)
-    
-    fact_ventes = fact.rename(columns={
-        'N° Ligne doc': 'dl_no', 'N° Cde': 'num_cde', 'Date BL': 'date_bl',
-        'N° BL': 'num_bl', 'Qté fact': 'qte_vendue', 'Prix Unitaire': 'prix_unitaire',
-        'Tot HT': 'montant_ht'
+    fact_ventes_final = pd.DataFrame({
+        'dl_no': pd.to_numeric(df['N° Ligne doc'], errors='coerce').astype('Int64'),
+        'num_cde': pd.to_numeric(df['N° Cde'], errors='coerce').astype('Int64'),
+        'date_bl': df['Date BL'],
+        'num_bl': df['N° BL'],
+        'qte_vendue': df['Qté fact'],
+        'prix_unitaire': df['Prix Unitaire'],
+        'montant_ht': df['Tot HT'],
+        'dim_client_id': ids_client,
+        'dim_article_id': ids_article,
+        'dim_temps_id': dim_temps.ids,
     })
     
-    colonnes_int = ['dl_no', 'num_cde', 'dim_client_id', 'dim_article_id', 'dim_temps_id']
-    for col in colonnes_int:
-        if col in fact_ventes.columns:
-            fact_ventes[col] = pd.to_numeric(fact_ventes[col], errors='coerce').astype('Int64')
-
-    final_cols = ['dl_no', 'num_cde', 'date_bl', 'num_bl', 'qte_vendue', 'prix_unitaire', 'montant_ht', 'dim_client_id', 'dim_article_id', 'dim_temps_id']
-    fact_ventes_final = fact_ventes[[col for col in final_cols if col in fact_ventes.columns]]
-    
-    fact_ventes_final.to_csv(os.path.join(VENTES_DIR, 'fact_ventes.csv'), index=False, encoding='utf-8-sig')
+    ecrire_faits(fact_ventes_final, df['Date BL'], VENTES_DIR, 'fact_ventes')
     logging.info(f"fact_ventes.csv généré avec {len(fact_ventes_final)} lignes.")
+    return True
 
 # =============================================================================
 # MODÈLE EN ÉTOILE POUR LES ACHATS
 # =============================================================================
-def generer_csv_achats_star():
+def generer_csv_achats_star(df=None):
+    """
+    Modèle en étoile des achats, à partir du fichier de la table générale ou
+    de la table df construite en mémoire.
+    """
     logging.info("Début de la génération du modèle en étoile pour les ACHATS.")
-    df = charger_et_nettoyer_csv(os.path.join(dossier_datalake_processed, 'tabla_generale_achats.csv'), dates_a_parser=['date achat'], dayfirst_format=True)
-    if df is None: return
+    if df is None:
+        df = charger_et_nettoyer_csv(chemin_table(dossier_datalake_processed, 'tabla_generale_achats'), dayfirst_format=True)
+    else:
+        df = preparer_table_generale(df, 'tabla_generale_achats', dayfirst_format=True)
+    if df is None: return False
 
     # --- 1. Dimension: dim_famille_article (Achats) ---
     logging.info("Création de achats/dim_famille_article.csv")
-    dim_fam_achats_base = df[['Code Famille', 'famille article libellé', 'sous-famille article libellé']].rename(columns={'Code Famille': 'fa_codef', 'famille article libellé': 'fa_central', 'sous-famille article libellé': 'fa_intitule'}).dropna(subset=['fa_codef']).drop_duplicates(subset=['fa_codef']).reset_index(drop=True)
     valeurs_inconnues_fam_a = {'fa_codef': VALEUR_CODE_INCONNU, 'fa_central': VALEUR_TEXTE_INCONNU, 'fa_intitule': VALEUR_TEXTE_INCONNU}
-    dim_fam_achats = creer_dimension_avec_inconnu(dim_fam_achats_base, 'famille_id', valeurs_inconnues_fam_a)
-    dim_fam_achats.to_csv(os.path.join(ACHATS_DIR, 'dim_famille_article.csv'), index=False, encoding='utf-8-sig')
+    dim_fam_achats = Dimension(df, {'Code Famille': 'fa_codef', 'famille article libellé': 'fa_central', 'sous-famille article libellé': 'fa_intitule'}, 'famille_id', valeurs_inconnues_fam_a,
+                               registre=registre_dimension('achats.dim_famille_article'))
+    ecrire_table(dim_fam_achats.table, chemin_table(ACHATS_DIR, 'dim_famille_article'))
 
     # --- 2. Dimension: dim_article (Achats) ---
     logging.info("Création de achats/dim_article.csv")
-
-    # ÉTAPE 1: Sélectionner toutes les colonnes nécessaires depuis la table générale
-    colonnes_article = [
-        'code article', 
-        'Désignation',
-        'Code Famille',
-    ]
-    colonnes_a_garder = [col for col in colonnes_article if col in df.columns]
-
-    # CORRECTION 1: On ajoute .copy() pour garantir qu'on travaille sur un nouveau DataFrame
-    dim_art_achats_base = df[colonnes_a_garder].copy()
-
-    # ÉTAPE 2: Nettoyer et dédoublonner
-    dim_art_achats_base = dim_art_achats_base.dropna(subset=['code article'])
-    dim_art_achats_base = dim_art_achats_base.drop_duplicates(subset=['code article'], keep='first').reset_index(drop=True)
-
-    # ÉTAPE 3: Renommer les colonnes
-    dim_art_achats_base = dim_art_achats_base.rename(columns={
-        'code article': 'ar_ref',
-        'Désignation': 'ar_designation',
-        'Code Famille': 'fa_codef',
-    })
-
-    # ÉTAPE 4: Joindre avec la dimension famille et GÉRER LES NULS de manière robuste
-    dim_art_achats_base = dim_art_achats_base.merge(dim_fam_achats[['fa_codef', 'famille_id']], on='fa_codef', how='left')
-
-    # CORRECTION 2: Remplacer les nuls de manière sûre, sans 'inplace=True'
-    dim_art_achats_base['famille_id'] = dim_art_achats_base['famille_id'].fillna(ID_INCONNU)
-
-    # ÉTAPE 5: Ajouter la ligne "Inconnu" et créer la clé primaire "article_id"
-    valeurs_inconnues_art_a = {
-        'ar_ref': VALEUR_CODE_INCONNU, 
-        'ar_designation': 'Inconnu',
-        # CORRECTION 3: La ligne "inconnu" doit aussi avoir une 'famille_id'
-        'famille_id': ID_INCONNU 
-    }
-    # On retire fa_codef qui n'est plus utile avant de créer la dimension finale
-    dim_article_achats = creer_dimension_avec_inconnu(
-        dim_art_achats_base.drop(columns=['fa_codef']), 
-        'article_id', 
-        valeurs_inconnues_art_a
-    )
-    dim_article_achats['famille_id'] = dim_article_achats['famille_id'].astype('Int64')
-
-    # ÉTAPE 6: Sélectionner les colonnes finales et sauvegarder
-    dim_article_achats_final = dim_article_achats[[
+    valeurs_inconnues_art_a = {'ar_ref': VALEUR_CODE_INCONNU, 'ar_designation': 'Inconnu'}
+    dim_article_achats = Dimension(df, {'code article': 'ar_ref', 'Désignation': 'ar_designation'}, 'article_id', valeurs_inconnues_art_a,
+                                   registre=registre_dimension('achats.dim_article'))
+    # Famille de la première ligne de chaque article ; le membre Inconnu a aussi une famille_id
+    dim_article_achats.table['famille_id'] = dim_article_achats.attribut_par_membre(dim_fam_achats.ids)
+    dim_article_achats_final = dim_article_achats.table[[
         'article_id', 
         'ar_ref', 
         'ar_designation',
         'famille_id'
     ]]
-    dim_article_achats_final.to_csv(os.path.join(ACHATS_DIR, 'dim_article.csv'), index=False, encoding='utf-8-sig')
+    dim_article_achats_final, ids_article_achats = historiser('achats.dim_article', dim_article_achats_final, 'article_id',
+                                                              dim_article_achats.ids, df['date achat'])
+    ecrire_table(dim_article_achats_final, chemin_table(ACHATS_DIR, 'dim_article'))
 
     logging.info(f"Fichier achats/dim_article.csv créé avec {len(dim_article_achats_final)} lignes et les colonnes descriptives.")
 
     # --- 3. Dimension: dim_fournisseur ---
     logging.info("Création de achats/dim_fournisseur.csv")
-    dim_fourn_cols = ['Code fournisseur', 'Raison sociale', 'Contact', 'Adresse', 'Complement adresse', 'Code postal', 'Ville', 'N° telephone', 'N° fax']
-    dim_fourn_base = df[dim_fourn_cols].rename(columns={'Code fournisseur': 'ct_numpayeur', 'Raison sociale': 'raison_sociale', 'Contact': 'contact', 'Adresse': 'adresse', 'Complement adresse': 'complement', 'Code postal': 'code_postal', 'Ville': 'ville', 'N° telephone': 'telephone', 'N° fax': 'fax'}).dropna(subset=['ct_numpayeur']).drop_duplicates(subset=['ct_numpayeur']).reset_index(drop=True)
+    colonnes_fourn = {'Code fournisseur': 'ct_numpayeur', 'Raison sociale': 'raison_sociale', 'Contact': 'contact', 'Adresse': 'adresse', 'Complement adresse': 'complement', 'Code postal': 'code_postal', 'Ville': 'ville', 'N° telephone': 'telephone', 'N° fax': 'fax'}
     valeurs_inconnues_fourn = {'ct_numpayeur': VALEUR_CODE_INCONNU, 'raison_sociale': VALEUR_TEXTE_INCONNU, 'contact': VALEUR_TEXTE_INCONNU, 'adresse': VALEUR_TEXTE_INCONNU, 'complement': '', 'code_postal': '', 'ville': VALEUR_TEXTE_INCONNU, 'telephone': '', 'fax': ''}
-    dim_fourn = creer_dimension_avec_inconnu(dim_fourn_base, 'fournisseur_id', valeurs_inconnues_fourn)
-    dim_fourn.to_csv(os.path.join(ACHATS_DIR, 'dim_fournisseur.csv'), index=False, encoding='utf-8-sig')
+    dim_fourn = Dimension(df, colonnes_fourn, 'fournisseur_id', valeurs_inconnues_fourn,
+                          registre=registre_dimension('achats.dim_fournisseur'))
+    table_fourn, ids_fourn = historiser('achats.dim_fournisseur', dim_fourn.table, 'fournisseur_id', dim_fourn.ids, df['date achat'])
+    ecrire_table(table_fourn, chemin_table(ACHATS_DIR, 'dim_fournisseur'))
 
     # --- 4. Dimension: dim_date (Achats) ---
     logging.info("Création de achats/dim_date.csv")
-    dates_achats = pd.to_datetime(df['date achat'], errors='coerce').dropna().unique()
-    dim_date_base = pd.DataFrame({'date_full': dates_achats}).sort_values('date_full').reset_index(drop=True)
     valeurs_inconnues_date_a = {'date_full': DATE_INCONNUE}
-    dim_date = creer_dimension_avec_inconnu(dim_date_base, 'date_id', valeurs_inconnues_date_a)
-    dim_date['annee'] = dim_date['date_full'].dt.year
-    dim_date['mois'] = dim_date['date_full'].dt.month
-    dim_date['jour'] = dim_date['date_full'].dt.day
-    dim_date['trimestre'] = dim_date['date_full'].dt.quarter
-    dim_date.to_csv(os.path.join(ACHATS_DIR, 'dim_date.csv'), index=False, encoding='utf-8-sig')
+    dim_date = Dimension(df, {'date achat': 'date_full'}, 'date_id', valeurs_inconnues_date_a, trier=True,
+                         registre=registre_dimension('achats.dim_date'))
+    dim_date.table['annee'] = dim_date.table['date_full'].dt.year
+    dim_date.table['mois'] = dim_date.table['date_full'].dt.month
+    dim_date.table['jour'] = dim_date.table['date_full'].dt.day
+    dim_date.table['trimestre'] = dim_date.table['date_full'].dt.quarter
+    ecrire_table(dim_date.table, chemin_table(ACHATS_DIR, 'dim_date'))
     
     # --- 5. Dimension: dim_mode_expedition ---
     logging.info("Création de achats/dim_mode_expedition.csv")
-    dim_mode_base = df[['Mode d\'expedition']].rename(columns={'Mode d\'expedition': 'libelle'}).dropna(subset=['libelle']).drop_duplicates(subset=['libelle']).reset_index(drop=True)
     valeurs_inconnues_mode = {'libelle': VALEUR_TEXTE_INCONNU}
-    dim_mode = creer_dimension_avec_inconnu(dim_mode_base, 'mode_id', valeurs_inconnues_mode)
-    dim_mode['code_expedit'] = dim_mode['libelle'].str.upper().str.replace(' ', '_').str.slice(0, 20)
-    dim_mode_final = dim_mode[['mode_id', 'code_expedit', 'libelle']]
-    dim_mode_final.to_csv(os.path.join(ACHATS_DIR, 'dim_mode_expedition.csv'), index=False, encoding='utf-8-sig')
+    dim_mode = Dimension(df, {'Mode d\'expedition': 'libelle'}, 'mode_id', valeurs_inconnues_mode,
+                         registre=registre_dimension('achats.dim_mode_expedition'))
+    dim_mode.table['code_expedit'] = dim_mode.table['libelle'].str.upper().str.replace(' ', '_').str.slice(0, 20)
+    dim_mode_final = dim_mode.table[['mode_id', 'code_expedit', 'libelle']]
+    ecrire_table(dim_mode_final, chemin_table(ACHATS_DIR, 'dim_mode_expedition'))
 
     # --- Table des Faits : Achats ---
     logging.info("Construction de fact_achats...")
-    fact = df.copy()
-    fact = fact.merge(dim_date[['date_full', 'date_id']], left_on='date achat', right_on='date_full', how='left')
-    fact = fact.merge(dim_fourn[['ct_numpayeur', 'fournisseur_id']], left_on='Code fournisseur', right_on='ct_numpayeur', how='left')
-    fact = fact.merge(dim_article_achats[['ar_ref', 'article_id']], left_on='code article', right_on='ar_ref', how='left')
-    fact = fact.merge(dim_mode[['libelle', 'mode_id']], left_on='Mode d\'expedition', right_on='libelle', how='left')
-
-    fact['date_id'].fillna(ID_INCONNU, inplace=True)
-    fact['fournisseur_id'].fillna(ID_INCONNU, inplace=True)
-    fact['article_id'].fillna(ID_INCONNU, inplace=True)
-    fact['mode_id'].fillna(ID_INCONNU, inplace=True)
-
-    for col in ['date_id', 'fournisseur_id', 'article_id', 'mode_id']:
-        fact[col] = fact[col].astype('Int64')
-
-    fact_achats = fact.rename(columns={'Bon de commande': 'bon_de_commande', 'Qté fact': 'qte_fact', 'Total TVA': 'total_tva', 'Total HT': 'total_ht', 'Total TTC': 'total_ttc', 'NET A PAYER': 'net_a_payer', 'Reference achat': 'do_ref'})
-    
-    final_cols = ['date_id', 'fournisseur_id', 'article_id', 'mode_id', 'do_ref', 'bon_de_commande', 'qte_fact', 'total_tva', 'total_ht', 'total_ttc', 'net_a_payer']
-    fact_achats_final = fact_achats[[col for col in final_cols if col in fact_achats.columns]]
+    fact_achats_final = pd.DataFrame({
+        'date_id': dim_date.ids,
+        'fournisseur_id': ids_fourn,
+        'article_id': ids_article_achats,
+        'mode_id': dim_mode.ids,
+        'do_ref': df['Reference achat'],
+        'bon_de_commande': df['Bon de commande'],
+        'qte_fact': df['Qté fact'],
+        'total_tva': df['Total TVA'],
+        'total_ht': df['Total HT'],
+        'total_ttc': df['Total TTC'],
+        'net_a_payer': df['NET A PAYER'],
+    })
     
-    fact_achats_final.to_csv(os.path.join(ACHATS_DIR, 'fact_achats.csv'), index=False, encoding='utf-8-sig')
+    ecrire_faits(fact_achats_final, df['date achat'], ACHATS_DIR, 'fact_achats')
     logging.info("Processus ACHATS terminé.")
+    return True
 
 # --- Point d'entrée principal ---
 def main():
-    """Exécute la génération des modèles en étoile pour les ventes et les achats."""
-    generer_csv_ventes_star()
-    print("-" * 60)
-    generer_csv_achats_star()
+    """
+    Exécute la génération des modèles en étoile pour les ventes et les achats.
+    Un modèle n'est régénéré que si sa table générale ou les paramètres de
+    génération (REGISTRE_CLES, DIMENSIONS_HISTORISEES) ont changé depuis.
+    """
+    empreintes = empreintes_etape(chemin_etat_tables_generales)
+    empreintes[SOURCE_PARAMETRES] = signature_parametres()
+    suivi = SuiviEmpreintes(chemin_etat_modele_etoile, empreintes)
+    modeles = [
+        ("ventes", generer_csv_ventes_star),
+        ("achats", generer_csv_achats_star),
+    ]
+    try:
+        for i, (libelle, generer) in enumerate(modeles):
+            if i:
+                print("-" * 60)
+            sources = [f"tabla_generale_{libelle}", SOURCE_PARAMETRES]
+            if suivi.inchange(libelle, sources, sorties_modele(libelle)):
+                logging.info(f"Modèle {libelle.upper()} inchangé (table générale et paramètres identiques), génération sautée.")
+                continue
+            if generer():
+                suivi.enregistrer(libelle, sources)
+    finally:
+        suivi.sauver()
     logging.info("Toutes les opérations sont terminées.")
 
 if __name__ == "__main__":
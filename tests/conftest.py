@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+# Racine du projet dans le chemin d'import, pour « from src... »
+projet_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, projet_root)
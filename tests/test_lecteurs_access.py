@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Lecteurs de base Access (src.extraction.lecteurs_access) sur la base de test
+tests/fixtures/base_test.mdb : les fichiers bruts exportés par les lecteurs
+odbc et mdbtools doivent être identiques.
+
+Les tests qui lisent la base sont sautés si mdb-export n'est pas dans le
+PATH (paquet mdbtools), et la comparaison si le pilote Microsoft Access n'est
+pas installé.
+"""
+
+import shutil
+from pathlib import Path
+
+import pytest
+
+from src.extraction.lecteurs_access import LecteurMdbTools, LecteurODBC
+
+BASE_TEST = Path(__file__).resolve().parent / "fixtures" / "base_test.mdb"
+TABLE_TEST = "merchant_taylors"
+
+mdbtools_absent = pytest.mark.skipif(
+    shutil.which("mdb-export") is None, reason="mdb-export (mdbtools) absent du PATH"
+)
+
+
+def _pilote_access_present():
+    try:
+        import pyodbc
+    except ImportError:
+        return False
+    return any(pilote.startswith("Microsoft Access Driver") for pilote in pyodbc.drivers())
+
+
+pilote_access_absent = pytest.mark.skipif(
+    not _pilote_access_present(), reason="pilote ODBC Microsoft Access non installé"
+)
+
+
+@pytest.fixture
+def extraction(tmp_path, monkeypatch):
+    """Module d'extraction, avec ses fichiers bruts dans un dossier temporaire."""
+    monkeypatch.setenv("EXTRACTION_DOSSIER_SORTIE", str(tmp_path / "raw"))
+    from src.extraction import extraction_complete_access
+    return extraction_complete_access
+
+
+def _exporter(extraction, classe, dossier, format_fichier):
+    """Exporte toutes les tables de la base de test avec un lecteur de classe."""
+    lecteur = classe(BASE_TEST)
+    extension = ".csv" if format_fichier == "csv" else f".{format_fichier}"
+    dossier.mkdir(parents=True)
+    try:
+        for nom_table in lecteur.lister_tables():
+            extraction.exporter_lecture(lecteur, nom_table, dossier / f"{nom_table}{extension}",
+                                        format_fichier=format_fichier)
+    finally:
+        lecteur.close()
+    return sorted(dossier.iterdir())
+
+
+def test_mdbtools_refuse_les_filtres():
+    lecteur = LecteurMdbTools(BASE_TEST)
+    with pytest.raises(ValueError, match="ne filtre pas les lignes"):
+        lecteur.executer(TABLE_TEST, "[Id No] > ?", [0])
+    with pytest.raises(ValueError, match="ne filtre pas les lignes"):
+        lecteur.lire_filigrane(TABLE_TEST, "Id No")
+    with pytest.raises(ValueError, match="ne filtre pas les lignes"):
+        lecteur.calculer_plages(TABLE_TEST, "Id No", 4)
+
+
+@mdbtools_absent
+def test_mdbtools_lit_la_base(extraction, tmp_path):
+    lecteur = LecteurMdbTools(BASE_TEST)
+    assert TABLE_TEST in lecteur.lister_tables()
+    assert "Surname" in lecteur.lire_colonnes(TABLE_TEST)
+
+    stats = extraction.exporter_lecture(lecteur, TABLE_TEST, tmp_path / "table.csv", format_fichier="csv")
+    assert stats.lignes == lecteur.compter_lignes(TABLE_TEST) > 0
+
+    # projection : colonnes demandées seulement, dans l'ordre demandé
+    resultat = lecteur.executer(TABLE_TEST, colonnes=["Surname", "Id No"])
+    try:
+        assert [col[0] for col in resultat.description] == ["Surname", "Id No"]
+        assert all(isinstance(ligne[1], int) for ligne in resultat.fetchmany(10))
+    finally:
+        resultat.close()
+
+
+@mdbtools_absent
+@pilote_access_absent
+@pytest.mark.parametrize("format_fichier", ["csv", "parquet"])
+def test_fichiers_bruts_identiques(extraction, tmp_path, format_fichier):
+    if format_fichier != "csv":
+        pytest.importorskip("pyarrow")
+    fichiers_odbc = _exporter(extraction, LecteurODBC, tmp_path / "odbc", format_fichier)
+    fichiers_mdb = _exporter(extraction, LecteurMdbTools, tmp_path / "mdbtools", format_fichier)
+
+    assert [f.name for f in fichiers_odbc] == [f.name for f in fichiers_mdb]
+    for odbc, mdb in zip(fichiers_odbc, fichiers_mdb):
+        if format_fichier == "csv":
+            assert odbc.read_bytes() == mdb.read_bytes(), odbc.name
+        else:
+            import pyarrow.parquet as pq
+            assert pq.read_table(odbc).equals(pq.read_table(mdb)), odbc.name